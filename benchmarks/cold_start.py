@@ -0,0 +1,127 @@
+"""Benchmark cold start: create_app() time and time to the first /graphs response.
+
+    python -m benchmarks.cold_start [--before REF] [--after REF] [--runs N]
+
+Each ref is checked out into a temporary git worktree with its own copy of
+the source data, its artifacts are built the way a deployment would
+(untimed), and every run starts a fresh interpreter with an empty chart
+cache. By default "before" is the tree just ahead of the lazy analytics
+load and "after" is HEAD. For trees that render charts in the background,
+the time until /graphs/status reports them ready is reported as well.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+# Inputs the app reads from data/; everything else there is derived
+SOURCE_FILES = ['restaurant_data.csv', 'zipcode_border_data.geojson', 'zipcode_border_grades.geojson']
+
+MEASURE = r'''
+import json, sys, time
+started = time.perf_counter()
+from main_app import create_app
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+response = client.get('/graphs')
+first = time.perf_counter()
+result = {
+    'create_app': created - started,
+    'first_graphs': first - created,
+    'graphs_status': response.status_code,
+    'graphs_bytes': len(response.data),
+    'charts_ready': None,
+}
+if any(rule.rule == '/graphs/status' for rule in app.url_map.iter_rules()):
+    while time.perf_counter() - first < 300:
+        if client.get('/graphs/status').get_json()['ready']:
+            result['charts_ready'] = time.perf_counter() - created
+            break
+        time.sleep(0.05)
+print('RESULT ' + json.dumps(result))
+'''
+
+
+def lazy_load_parent():
+    """Return the commit just before AnalyticsService was introduced."""
+    commits = subprocess.run(
+        ['git', 'log', '--reverse', '--format=%H', '-S', 'class AnalyticsService', '--', 'main_app/plots.py'],
+        cwd=REPO, check=True, capture_output=True, text=True
+    ).stdout.split()
+    if not commits:
+        sys.exit("Could not find the lazy analytics commit; pass --before")
+    return f"{commits[0]}~1"
+
+
+def prepare(ref, root):
+    """Check out ref under root with a fresh copy of the source data and build its artifacts."""
+    tree = root / ref.replace('/', '_').replace('~', '_')
+    subprocess.run(['git', 'worktree', 'add', '--detach', str(tree), ref], cwd=REPO, check=True, capture_output=True)
+    (tree / 'data').mkdir(exist_ok=True)
+    for name in SOURCE_FILES:
+        if (REPO / 'data' / name).exists():
+            shutil.copy2(REPO / 'data' / name, tree / 'data' / name)
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'main_app', 'build-artifacts'],
+        cwd=tree, env=environment(tree, root), capture_output=True
+    )
+    return tree
+
+
+def environment(tree, root):
+    """Environment of a measured process: the tree on the path, no reload watcher, an empty chart cache."""
+    chart_cache = Path(tempfile.mkdtemp(dir=root, prefix='chart-cache-'))
+    return {
+        **os.environ,
+        'PYTHONPATH': str(tree),
+        'CHART_CACHE_DIR': str(chart_cache),
+        'DATA_RELOAD_INTERVAL': '0',
+        'ANALYTICS_WARM_UP': 'false',
+    }
+
+
+def measure(tree, root):
+    """Run one cold start of tree in a new interpreter."""
+    completed = subprocess.run(
+        [sys.executable, '-c', MEASURE], cwd=tree, env=environment(tree, root),
+        check=True, capture_output=True, text=True
+    )
+    line = next(line for line in completed.stdout.splitlines() if line.startswith('RESULT '))
+    return json.loads(line[len('RESULT '):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--before', help='ref to measure before the change (default: before the lazy load)')
+    parser.add_argument('--after', default='HEAD')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='cold-start-'))
+    trees = []
+    try:
+        for label, ref in (('before', args.before or lazy_load_parent()), ('after', args.after)):
+            tree = prepare(ref, root)
+            trees.append(tree)
+            runs = [measure(tree, root) for _ in range(args.runs)]
+            print(f"{label} ({ref}), median of {args.runs} runs:")
+            for key in ('create_app', 'first_graphs', 'charts_ready'):
+                values = [run[key] for run in runs if run[key] is not None]
+                if values:
+                    print(f"  {key:<14} {statistics.median(values):8.3f} s")
+            print(f"  /graphs        HTTP {runs[0]['graphs_status']}, {runs[0]['graphs_bytes'] / 1024:.1f} KB")
+    finally:
+        for tree in trees:
+            subprocess.run(['git', 'worktree', 'remove', '--force', str(tree)], cwd=REPO, capture_output=True)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Measure what the graphs page costs a browser before it is interactive.
+
+    python -m benchmarks.graphs_page [--before REF] [--after REF] [--runs N] [--mbps BANDWIDTH]
+
+For each ref (checked out as in benchmarks.cold_start) the charts are
+rendered first, then /graphs is requested and timed, and each chart
+placeholder's figure JSON is fetched the way static/js/graphs.js does.
+Reported per ref: the HTML size and time, the separately served plotly.js
+bundle, the number of charts loaded separately with their JSON latency
+(median and slowest) and total size, and an estimate of time to
+interactive on a first visit over a --mbps link: HTML, then plotly.js,
+then the chart JSON fetched in parallel (server time plus transfer).
+By default "before" is the tree just ahead of per-chart JSON and "after"
+is HEAD.
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from benchmarks.cold_start import REPO, environment, prepare
+
+MEASURE = r'''
+import json, re, statistics, sys, time
+from main_app import create_app
+app = create_app()
+client = app.test_client()
+client.get('/graphs')
+if any(rule.rule == '/graphs/status' for rule in app.url_map.iter_rules()):
+    deadline = time.perf_counter() + 300
+    while not client.get('/graphs/status').get_json()['ready'] and time.perf_counter() < deadline:
+        time.sleep(0.05)
+
+runs = int(sys.argv[1])
+html_times, chart_times = [], {}
+for _ in range(runs):
+    started = time.perf_counter()
+    page = client.get('/graphs')
+    html_times.append(time.perf_counter() - started)
+    charts = re.findall(r'data-chart="([^"]+)" data-version="([^"]*)"', page.get_data(as_text=True))
+    scripts = re.findall(r'src="(/graphs/plotly[^"]*)"', page.get_data(as_text=True))
+    script_bytes = sum(len(client.get(src).data) for src in scripts)
+    sizes = {}
+    for name, version in charts:
+        started = time.perf_counter()
+        figure = client.get(f'/graphs/{name}.json' + (f'?v={version}' if version else ''))
+        chart_times.setdefault(name, []).append(time.perf_counter() - started)
+        sizes[name] = len(figure.data)
+
+medians = {name: statistics.median(times) for name, times in chart_times.items()}
+print('RESULT ' + json.dumps({
+    'html_bytes': len(page.data),
+    'html_seconds': statistics.median(html_times),
+    'script_bytes': script_bytes,
+    'charts': len(charts),
+    'chart_median_seconds': statistics.median(medians.values()) if medians else None,
+    'chart_max_seconds': max(medians.values()) if medians else None,
+    'chart_bytes': sum(sizes.values()),
+}))
+'''
+
+
+def per_chart_json_parent():
+    """Return the commit just before charts were served as separate JSON."""
+    commits = subprocess.run(
+        ['git', 'log', '--reverse', '--format=%H', '-S', 'def graph_json', '--', 'main_app/routes.py'],
+        cwd=REPO, check=True, capture_output=True, text=True
+    ).stdout.split()
+    if not commits:
+        sys.exit("Could not find the per-chart JSON commit; pass --before")
+    return f"{commits[0]}~1"
+
+
+def measure(tree, root, runs):
+    """Measure the graphs page of tree in a new interpreter."""
+    completed = subprocess.run(
+        [sys.executable, '-c', MEASURE, str(runs)], cwd=tree, env=environment(tree, root),
+        check=True, capture_output=True, text=True
+    )
+    line = next(line for line in completed.stdout.splitlines() if line.startswith('RESULT '))
+    return json.loads(line[len('RESULT '):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--before', help='ref to measure before the change (default: before per-chart JSON)')
+    parser.add_argument('--after', default='HEAD')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--mbps', type=float, default=50, help='link bandwidth for transfer times')
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='graphs-page-'))
+    trees = []
+    try:
+        for label, ref in (('before', args.before or per_chart_json_parent()), ('after', args.after)):
+            tree = prepare(ref, root)
+            trees.append(tree)
+            result = measure(tree, root, args.runs)
+            print(f"{label} ({ref}), median of {args.runs} loads:")
+            print(f"  /graphs HTML       {result['html_bytes'] / 1024:10.1f} KB in {result['html_seconds'] * 1000:.1f} ms")
+            if result['script_bytes']:
+                print(f"  plotly.js          {result['script_bytes'] / 1024:10.1f} KB (browser-cached after the first visit)")
+            if result['charts']:
+                print(f"  chart JSON         {result['charts']} charts, {result['chart_bytes'] / 1024:.1f} KB, "
+                      f"median {result['chart_median_seconds'] * 1000:.1f} ms, "
+                      f"slowest {result['chart_max_seconds'] * 1000:.1f} ms")
+            transfer = 8 / (args.mbps * 1e6)
+            interactive = (
+                result['html_seconds'] + (result['html_bytes'] + result['script_bytes']) * transfer
+                + (result['chart_max_seconds'] or 0) + result['chart_bytes'] * transfer
+            )
+            print(f"  time to interactive ~{interactive:.2f} s at {args.mbps:g} Mbit/s")
+    finally:
+        for tree in trees:
+            subprocess.run(['git', 'worktree', 'remove', '--force', str(tree)], cwd=REPO, capture_output=True)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark radius search: the KD-tree and vectorized distances against a geodesic scan.
+
+    python -m benchmarks.radius_search [--restaurants N] [--radius MILES] [--queries Q]
+
+Restaurants are spread uniformly over the five boroughs' bounding box and
+searched around random origins inside it.
+"""
+import argparse
+import time
+import numpy as np
+from geopy.distance import geodesic
+from main_app.utils.spatial_index import RestaurantIndex
+
+# South-west and north-east corners of New York City
+NYC_BOUNDS = ((40.49, -74.26), (40.92, -73.70))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--restaurants', type=int, default=30000)
+    parser.add_argument('--radius', type=float, default=1.0)
+    parser.add_argument('--queries', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    (south, west), (north, east) = NYC_BOUNDS
+    lats = rng.uniform(south, north, args.restaurants)
+    lons = rng.uniform(west, east, args.restaurants)
+    origins = np.column_stack([rng.uniform(south, north, args.queries), rng.uniform(west, east, args.queries)])
+
+    started = time.perf_counter()
+    index = RestaurantIndex(np.arange(args.restaurants).astype(str), lats, lons)
+    print(f"index build: {(time.perf_counter() - started) * 1000:.1f} ms for {args.restaurants} restaurants")
+
+    started = time.perf_counter()
+    indexed = [np.sort(index.query_radius(lat, lon, args.radius)[0]) for lat, lon in origins]
+    indexed_ms = (time.perf_counter() - started) * 1000 / args.queries
+
+    started = time.perf_counter()
+    scanned = [
+        np.flatnonzero([geodesic((lat, lon), point).miles <= args.radius for point in zip(lats, lons)])
+        for lat, lon in origins
+    ]
+    scan_ms = (time.perf_counter() - started) * 1000 / args.queries
+
+    matches = sum(np.array_equal(a, b) for a, b in zip(indexed, scanned))
+    found = np.mean([len(result) for result in indexed])
+    print(f"radius {args.radius} mi, {found:.0f} restaurants per query on average")
+    print(f"indexed search: {indexed_ms:.2f} ms/query")
+    print(f"geodesic scan:  {scan_ms:.2f} ms/query ({scan_ms / indexed_ms:.0f}x slower)")
+    print(f"identical results: {matches}/{args.queries}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,19 @@
 """Flask application factory."""
+import click
 from flask import Flask
 from flask_cors import CORS
 from main_app.config import FlaskConfig
 from main_app.utils.data_loader import DataService
+from main_app.utils.artifacts import MANIFEST_FILE, build_artifacts
+from main_app.utils.ingest import run as run_ingest
 from main_app.utils.json_encoder import SafeEncoder
-from main_app.utils.data_loader import DataService
 from main_app.utils.geocoder import GeoService
+from main_app.utils.local_geocoder import LocalGeocoder
+from main_app.utils.snapshots import SnapshotManager
+from main_app.utils.chart_cache import ChartCache, source_fingerprint
+from main_app.utils.chart_warmup import ChartWarmUp
+from main_app.utils.search_cache import SearchCache
+from pathlib import Path
 import logging
 
 def create_app():
@@ -14,7 +22,6 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(FlaskConfig)
     app.json = SafeEncoder(app)
-    app.data_service = data_service
     
     logging.basicConfig(
         level=logging.INFO,
@@ -23,9 +30,62 @@ def create_app():
     
     CORS(app)
     # Initialize services at startup
-    app.extensions['data_service'] = DataService()
-    app.extensions['geo_service'] = GeoService()
+    snapshots = SnapshotManager(data_service, loader=DataService)
+    snapshots.init_app(app)
+    geo_service = GeoService(local=LocalGeocoder(data_service.history.latest))
+    app.extensions['geo_service'] = geo_service
+    app.extensions['search_cache'] = SearchCache(
+        app.config['SEARCH_CACHE_CELL_MILES'], app.config['SEARCH_CACHE_MAX_BYTES']
+    )
+    app.extensions['chart_cache'] = ChartCache(
+        FlaskConfig.CHART_CACHE_DIR,
+        salt=source_fingerprint(
+            Path(__file__).parent / 'plots.py',
+            Path(__file__).parent / 'templates' / 'graphs.html'
+        )
+    )
+    app.extensions['chart_warm_up'] = ChartWarmUp(
+        app.extensions['chart_cache'], workers=app.config['CHART_WARM_UP_WORKERS'], snapshots=snapshots,
+        retry_delay=app.config['CHART_WARM_UP_RETRY_DELAY'], max_retry_delay=app.config['CHART_WARM_UP_RETRY_MAX_DELAY']
+    )
 
-    from .routes import bp
+    from .routes import bp, warm_up_graphs
     app.register_blueprint(bp)
+
+    @app.cli.command('build-artifacts')
+    @click.option('--force', is_flag=True, help='Rebuild even if inputs are unchanged.')
+    def build_artifacts_command(force):
+        """Build derived data artifacts from the source files."""
+        manifest, built = build_artifacts(DataService(load=False), force=force)
+        status = 'Built' if built else 'Up to date'
+        click.echo(f"{status}: artifacts for inputs {manifest['inputs_hash'][:16]}")
+
+    @app.cli.command('ingest')
+    @click.option('--since', type=click.DateTime(), help='Fetch records inspected on or after this date.')
+    @click.option('--lookback-days', type=int, default=FlaskConfig.INGEST_LOOKBACK_DAYS,
+                  help='Days before the newest stored inspection to fetch again.')
+    def ingest_command(since, lookback_days):
+        """Ingest new inspection records from NYC Open Data."""
+        manifest, count = run_ingest(DataService(load=False), since=since, lookback_days=lookback_days)
+        if manifest is None:
+            click.echo("No new records")
+        else:
+            click.echo(f"Ingested {count} records: artifacts for inputs {manifest['inputs_hash'][:16]}")
+
+    from .plots import analytics
+    analytics.bind(data_service)
+    if app.config['ANALYTICS_WARM_UP']:
+        warm_up_graphs(app)
+
+    # New snapshots get their own address index and analytics before requests see them,
+    # cached search candidates of older ones are dropped, and their charts start
+    # rendering in the background
+    snapshots.listeners.append(lambda service: setattr(geo_service, 'local', LocalGeocoder(service.history.latest)))
+    snapshots.listeners.append(lambda service: app.extensions['search_cache'].invalidate(service.version))
+    snapshots.listeners.append(analytics.bind)
+    snapshots.listeners.append(lambda service: warm_up_graphs(app))
+    if app.config['DATA_RELOAD_INTERVAL'] > 0:
+        snapshots.watch(Path(data_service.artifact_dir) / MANIFEST_FILE, app.config['DATA_RELOAD_INTERVAL'])
+    if app.config['DATA_RELOAD_SIGNAL']:
+        snapshots.handle_signal(app.config['DATA_RELOAD_SIGNAL'])
     return app
\ No newline at end of file
@@ -10,4 +10,76 @@ class FlaskConfig:
     BASE_DIR = Path(__file__).parent.parent
     DATA_DIR = BASE_DIR / "data"
     MAPBOX_TOKEN = os.getenv('MAPBOX_TOKEN')
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
\ No newline at end of file
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
+
+    # Derived data built offline by `flask build-artifacts`
+    ARTIFACT_DIR = Path(os.getenv('ARTIFACT_DIR', DATA_DIR / "artifacts"))
+    ARTIFACT_KEEP = int(os.getenv('ARTIFACT_KEEP', 2))
+
+    # Swap in new dataset snapshots without restarting: poll the artifact
+    # manifest every DATA_RELOAD_INTERVAL seconds (0 disables) or send the signal
+    DATA_RELOAD_INTERVAL = float(os.getenv('DATA_RELOAD_INTERVAL', 10))
+    DATA_RELOAD_SIGNAL = os.getenv('DATA_RELOAD_SIGNAL', 'SIGUSR2')
+
+    # Incremental ingestion from NYC Open Data (DOHMH restaurant inspections)
+    DELTA_DIR = Path(os.getenv('DELTA_DIR', DATA_DIR / "deltas"))
+    SOCRATA_DOMAIN = os.getenv('SOCRATA_DOMAIN', 'data.cityofnewyork.us')
+    SOCRATA_DATASET = os.getenv('SOCRATA_DATASET', '43nn-pn8j')
+    SOCRATA_APP_TOKEN = os.getenv('SOCRATA_APP_TOKEN')
+    INGEST_PAGE_SIZE = int(os.getenv('INGEST_PAGE_SIZE', 50000))
+    INGEST_LOOKBACK_DAYS = int(os.getenv('INGEST_LOOKBACK_DAYS', 7))
+
+    # 'mmap' maps artifacts so all workers share one copy through the page cache
+    DATA_STORE = os.getenv('DATA_STORE', 'memory')
+
+    # Browser cache lifetime of the pre-serialized dataset payloads
+    PAYLOAD_MAX_AGE = int(os.getenv('PAYLOAD_MAX_AGE', 300))
+
+    # Heat map viewport: clusters up to this zoom, individual restaurants above it
+    VIEWPORT_CLUSTER_MAX_ZOOM = float(os.getenv('VIEWPORT_CLUSTER_MAX_ZOOM', 13))
+    VIEWPORT_MAX_POINTS = int(os.getenv('VIEWPORT_MAX_POINTS', 2000))
+
+    # Geocode cache shared by all workers
+    GEOCODE_CACHE_PATH = Path(os.getenv('GEOCODE_CACHE_PATH', DATA_DIR / "geocode_cache.sqlite3"))
+    GEOCODE_CACHE_HIT_TTL = int(os.getenv('GEOCODE_CACHE_HIT_TTL', 30 * 86400))
+    GEOCODE_CACHE_MISS_TTL = int(os.getenv('GEOCODE_CACHE_MISS_TTL', 86400))
+    GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv('GEOCODE_CACHE_MAX_ENTRIES', 100000))
+
+    # Upstream geocoding dispatch
+    GEOCODE_MIN_DELAY = float(os.getenv('GEOCODE_MIN_DELAY', 1.0))
+    GEOCODE_WAIT_TIMEOUT = float(os.getenv('GEOCODE_WAIT_TIMEOUT', 5.0))
+    GEOCODE_QUEUE_SIZE = int(os.getenv('GEOCODE_QUEUE_SIZE', 32))
+
+    # Search radius in miles (capped per request) and restaurants per page of results
+    SEARCH_DEFAULT_RADIUS = float(os.getenv('SEARCH_DEFAULT_RADIUS', 1))
+    SEARCH_MAX_RADIUS = float(os.getenv('SEARCH_MAX_RADIUS', 5))
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 50))
+    SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', 200))
+
+    # Bulk search: items per request and seconds of upstream geocoding per request
+    BATCH_SEARCH_MAX_ITEMS = int(os.getenv('BATCH_SEARCH_MAX_ITEMS', 10000))
+    BATCH_SEARCH_GEOCODE_BUDGET = float(os.getenv('BATCH_SEARCH_GEOCODE_BUDGET', 30))
+
+    # Search candidates cached per SEARCH_CACHE_CELL_MILES square of search origins,
+    # evicting the least recently used beyond SEARCH_CACHE_MAX_BYTES per worker
+    SEARCH_CACHE_CELL_MILES = float(os.getenv('SEARCH_CACHE_CELL_MILES', 0.25))
+    SEARCH_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+    # Most restaurants a name search or autocomplete request returns
+    NAME_SEARCH_MAX_LIMIT = int(os.getenv('NAME_SEARCH_MAX_LIMIT', 50))
+
+    # Render the graphs page charts in the background at startup
+    ANALYTICS_WARM_UP = os.getenv('ANALYTICS_WARM_UP', 'false').lower() == 'true'
+
+    # Rendered chart cache for the graphs page
+    CHART_CACHE_DIR = Path(os.getenv('CHART_CACHE_DIR', DATA_DIR / "chart_cache"))
+
+    # Processes rendering the graphs page charts in the background, one per
+    # spare CPU by default (0 renders on a thread)
+    CHART_WARM_UP_WORKERS = int(os.getenv('CHART_WARM_UP_WORKERS', min(4, (os.cpu_count() or 1) - 1)))
+    # Seconds before a failed warm-up of a version is retried, doubling per failure up to the max
+    CHART_WARM_UP_RETRY_DELAY = float(os.getenv('CHART_WARM_UP_RETRY_DELAY', 5))
+    CHART_WARM_UP_RETRY_MAX_DELAY = float(os.getenv('CHART_WARM_UP_RETRY_MAX_DELAY', 600))
+
+    # 'json' renders charts client-side from /graphs/<chart>.json, 'html' embeds them
+    GRAPHS_MODE = os.getenv('GRAPHS_MODE', 'json')
@@ -1,63 +1,295 @@
+"""Inspection analytics and chart rendering for the graphs page."""
+from datetime import datetime, timezone
+from functools import cached_property
+import hashlib
+import logging
+import threading
 import pandas as pd
 import plotly.io as pio
 import plotly.express as px
 import plotly.graph_objects as go
+from main_app.config import FlaskConfig
+from main_app.utils.analytics_cube import AnalyticsCube
 
 
+CHART_CONFIG = {'displayModeBar': False}
 
-restaurant_data = 'data/restaurant_data.csv'
-df = pd.read_csv(restaurant_data)
-# Save as Parquet
-df.to_parquet('data/restaurant_data.parquet')
-# Load from Parquet
-df = pd.read_parquet('data/restaurant_data.parquet')
+custom_colors = ['#2B7CCC', '#FFAC24', '#45D05E', '#7b6f2b', '#394C54', '#DBCFC6']
 
 
-custom_colors = ['#2B7CCC', '#FFAC24', '#45D05E', '#7b6f2b', '#394C54', '#DBCFC6']
+groups = {
+    'American': ['Tex-Mex', 'American', 'Chicken', 'Hamburgers', 'Hotdogs', 'Hotdogs/Pretzels',
+                 'Sandwiches', 'Hawaiian', 'Barbecue', 'Bagels/Pretzels', 'Soul Food',
+                 'Steakhouse', 'Pancakes/Waffles', 'Sandwiches/Salads/Mixed Buffet', 'New American', 'Californian'],
+    'Cafe & Desserts': ['Donuts', 'Coffee/Tea', 'Bakery Products/Desserts', 'Bottled Beverages', 'Nuts/Confectionary'],
+    'Juice/Smoothies/Ice-Cream/Fruit Salads/Yogurt': ['Frozen Desserts', 'Juice, Smoothies, Fruit Salads'],
+    'South Asian(Indian, Pakistani, Afghan, etc)': ['Indian', 'Bangladeshi', 'Pakistani'],
+    'Southeast Asian(Thai, Viet, Malaysia, etc)': ['Thai', 'Southeast Asian', 'Filipino', 'Indonesian'],
+    'Mediterranean': ['Greek', 'Turkish', 'Moroccan'],
+    'European(Irish, English, German, etc)': ['Portuguese', 'Irish', 'Continental', 'Russian', 'Polish',
+                                              'Eastern European', 'English', 'German', 'Czech', 'Scandinavian', 'Basque'],
+    'Fusion': ['Creole', 'Fusion', 'Creole/Cajun', 'Cajun', 'Haute Cuisine'],
+    'Vegetarian/Vegan': ['Vegetarian', 'Vegan', 'Salads', 'Fruits/Vegetables'],
+    'Latin': ['Latin American', 'Peruvian', 'Brazilian', 'Chilean', 'Chimichurri'],
+    'Spanish': ['Spanish', 'Tapas'],
+    'Middle Eastern': ['Middle Eastern', 'Afghan', 'Armenian', 'Egyptian', 'Iranian'],
+    'Specialties': ['Soups', 'Soups/Salads/Sandwiches'],
+    'Chinese': ['Chinese', 'Chinese/Cuban'],
+    'Asian': ['Chinese/Japanese'],
+    'French': ['French', 'New French']
+}
 
-# Removing unecessary columns
-new_df = df.drop(['Community Board', 'Council District', 'Census Tract','BIN','BBL', 'NTA', 'Location Point1'], axis=1)
-# Drop rows where the 'DBA' (restaurant name) is NaN
-new_df = new_df.dropna(subset=['DBA'])
-# Drop rows if both 'SCORE' and 'GRADE' are NaN
-new_df = new_df.dropna(subset=['GRADE', 'SCORE'], how='all')
+# Add individual items that don't belong to a group
+individual = {
+    'Pizza': 'Pizza',
+    'Italian': 'Italian',
+    'Japanese': 'Japanese',
+    'Jewish/Kosher': 'Jewish/Kosher',
+    'Korean': 'Korean',
+    'Caribbean': 'Caribbean',
+    'African': 'African',
+    'Australian': 'Australian',
+    'Not Listed/Not Applicable': 'Not Listed/Not Applicable',
+    'Other': 'Other'
+}
 
+# Create a mapping from individual cuisines to their groups
+cuisine_mapping = {c: group for group, cuisines in groups.items() for c in cuisines}
+cuisine_mapping.update(individual)
 
-# Convert 'INSPECTION DATE', 'ZIPCODE' and 'RECORD DATE' to numeric
-new_df['INSPECTION DATE'] = pd.to_datetime(new_df['INSPECTION DATE'])
-new_df['RECORD DATE'] = pd.to_datetime(new_df['RECORD DATE'])
-new_df['ZIPCODE'] = new_df['ZIPCODE'].astype('Int64')  # Nullable int, preserves NaNs
-new_df['SCORE'] = new_df['SCORE'].astype('Int64')
 
+class AnalyticsService:
+    """Inspection data and aggregates for the graphs page, computed on first use.
+
+    Importing this module does no I/O; the dataset is read the first time a
+    chart needs it, or earlier from a background warm_up().
+    """
+
+    AGGREGATES = ('cube', 'grade_count_per_cuisine', 'total_violations_per_cuisine',
+                  'lastest_violations_per_cuisine', 'violations', 'violation_counts')
+
+    def __init__(self, data_path=None):
+        """Initialize with optional data path override."""
+        self.data_path = data_path or (FlaskConfig.DATA_DIR / "restaurant_data.csv")
+        self._lock = threading.RLock()
+        self._version = None
+        self.data_service = None
+
+    def bind(self, data_service):
+        """Read the shared dataset of a DataService instead of the file."""
+        self.data_service = data_service
+        self.data_path = data_service.data_path
+
+    def load(self, cube):
+        """Answer every aggregate from a prebuilt cube instead of reading the dataset."""
+        with self._lock:
+            for name in self.AGGREGATES:
+                self.__dict__.pop(name, None)
+            self.__dict__['cube'] = cube
+
+    def data_version(self):
+        """Return (version, last_modified) of the dataset, dropping stale aggregates."""
+        if self.data_service is not None:
+            version, last_modified = self.data_service.version, self.data_service.last_modified
+        else:
+            path = self._source_path()
+            stat = path.stat()
+            version = hashlib.sha1(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+            last_modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        with self._lock:
+            if self._version != version:
+                for name in self.AGGREGATES:
+                    self.__dict__.pop(name, None)
+                self._version = version
+        return version, last_modified
+
+    def warm_up(self):
+        """Compute all aggregates on a background thread."""
+        thread = threading.Thread(target=self._compute_all, name='analytics-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def _compute_all(self):
+        """Touch every aggregate so later requests find them ready."""
+        try:
+            for name in self.AGGREGATES:
+                getattr(self, name)
+        except Exception as e:
+            logging.error(f"Analytics warm-up failed: {str(e)}")
+
+    def _source_path(self):
+        """Return the parquet copy of the dataset if present, else the CSV."""
+        parquet_path = self.data_path.with_suffix('.parquet')
+        return parquet_path if parquet_path.exists() else self.data_path
+
+    def _inspections(self):
+        """Clean the dataset into rows with grouped cuisines and imputed grades."""
+        df = self._read()
+
+        # Removing unecessary columns
+        new_df = df.drop(['Community Board', 'Council District', 'Census Tract','BIN','BBL', 'NTA', 'Location Point1'], axis=1, errors='ignore')
+        # Drop rows where the 'DBA' (restaurant name) is NaN
+        new_df = new_df.dropna(subset=['DBA'])
+        # Drop rows if both 'SCORE' and 'GRADE' are NaN
+        new_df = new_df.dropna(subset=['GRADE', 'SCORE'], how='all')
+
+        # Convert 'INSPECTION DATE', 'ZIPCODE' and 'RECORD DATE' to numeric
+        new_df['INSPECTION DATE'] = pd.to_datetime(new_df['INSPECTION DATE'])
+        new_df['RECORD DATE'] = pd.to_datetime(new_df['RECORD DATE'])
+        new_df['ZIPCODE'] = new_df['ZIPCODE'].astype('Int64')  # Nullable int, preserves NaNs
+        new_df['SCORE'] = new_df['SCORE'].astype('Int64')
+
+        # Use conditional updates for missing grades 
+        if isinstance(new_df['GRADE'].dtype, pd.CategoricalDtype):
+            new_df['GRADE'] = new_df['GRADE'].cat.add_categories(
+                [g for g in ['A', 'B', 'C'] if g not in new_df['GRADE'].cat.categories]
+            )
+        new_df.loc[(new_df['GRADE'].isna()) & (new_df['SCORE'] >= 0) & (new_df['SCORE'] <= 13),'GRADE'] = 'A'
+        new_df.loc[(new_df['GRADE'].isna()) & (new_df['SCORE'] >= 14) & (new_df['SCORE'] <= 27),'GRADE'] = 'B'
+        new_df.loc[(new_df['GRADE'].isna()) & (new_df['SCORE'] >= 28), 'GRADE'] = 'C'
+
+        # Apply mapping and clean up
+        new_df['GROUPED_CUISINE'] = (
+            new_df['CUISINE DESCRIPTION']
+            .astype(object)
+            .map(cuisine_mapping)
+            .fillna('Other')
+            .str.strip()
+            .str.title()
+            .astype('category')
+        )
+        return new_df
+
+    def _read(self):
+        """Read the restaurant dataset without writing anything back."""
+        if self.data_service is not None:
+            return self.data_service.data
+        path = self._source_path()
+        if path.suffix == '.parquet':
+            return pd.read_parquet(path)
+        return pd.read_csv(path)
+
+    @cached_property
+    def cube(self):
+        """Aggregate cube every chart and headline number is answered from."""
+        with self._lock:
+            if 'cube' in self.__dict__:
+                return self.__dict__['cube']
+            return AnalyticsCube.from_frame(self._inspections())
+
+    @cached_property
+    def grade_count_per_cuisine(self):
+        cells = self.cube.cells
+        filtered_cuisine_cube = self.cube.where(
+            ~cells['GROUPED_CUISINE'].isin([
+                'Not Listed/Not Applicable',
+                'Other',
+                'Unknown',
+                'Specialties'
+            ])
+            & cells['GRADE'].isin(['A', 'B', 'C'])
+        )
+
+        grade_count_per_cuisine = (
+            filtered_cuisine_cube.totals(['GRADE', 'GROUPED_CUISINE'])
+            .rename(columns={'ROWS': 'Count'})[['GRADE', 'GROUPED_CUISINE', 'Count']]
+            .sort_values(by='Count', ascending=False)
+        )
+
+        # Get total count per cuisine
+        grade_count_per_cuisine['Total Per Cuisine'] = grade_count_per_cuisine.groupby('GROUPED_CUISINE', observed=True)['Count'].transform('sum')
+        # Compute the percentage each grade makes up within its cuisine
+        grade_count_per_cuisine['Percentage'] = (grade_count_per_cuisine['Count'] / grade_count_per_cuisine['Total Per Cuisine']) * 100
+        return grade_count_per_cuisine
+
+    @cached_property
+    def total_violations_per_cuisine(self):
+        violations_per_cuisine = self.cube.totals(['GROUPED_CUISINE'])
+        violations_per_cuisine = violations_per_cuisine[violations_per_cuisine['VIOLATIONS'] > 0]
+        violations_per_cuisine = violations_per_cuisine[violations_per_cuisine['GROUPED_CUISINE'] != 'Not Listed/Not Applicable']
+        violations_per_cuisine = violations_per_cuisine[violations_per_cuisine['GROUPED_CUISINE'] != 'Other']
+        return violations_per_cuisine[['GROUPED_CUISINE', 'VIOLATIONS']].rename(columns={'VIOLATIONS': 'Violation Count'}).reset_index(drop=True)
+
+    @cached_property
+    def lastest_violations_per_cuisine(self):
+        # Violations on the latest inspection date per cuisine
+        latest_inspections = self.cube.latest(['GROUPED_CUISINE'])
+        latest_inspections = latest_inspections[latest_inspections['LAST_VIOLATIONS'] > 0]
+        latest_inspections = latest_inspections[latest_inspections['GROUPED_CUISINE'] != 'Not Listed/Not Applicable']
+        latest_inspections = latest_inspections[latest_inspections['GROUPED_CUISINE'] != 'Other']
+        return latest_inspections[['GROUPED_CUISINE', 'LAST_VIOLATIONS']].rename(columns={'LAST_VIOLATIONS': 'Latest Violations'}).reset_index(drop=True)
+
+    @cached_property
+    def violations(self):
+        # Count violations (rows) and unique inspections (CAMIS)
+        violations = (
+            self.cube.totals(['GROUPED_CUISINE', 'BORO'])
+            .rename(columns={'VIOLATIONS': 'Total_Violations', 'RESTAURANTS': 'Total_Inspections'})
+            [['GROUPED_CUISINE', 'BORO', 'Total_Violations', 'Total_Inspections']]
+        )
+
+        violations['Average_Violations_Per_Inspection'] = (violations['Total_Violations'] / violations['Total_Inspections']).round(2)
+        violations = violations[violations['GROUPED_CUISINE'] != 'Not Listed/Not Applicable']
+        return violations[violations['GROUPED_CUISINE'] != 'Other']
+
+    @cached_property
+    def violation_counts(self):
+        violation_counts = self.cube.violations
+        return violation_counts.groupby(['VIOLATION CODE'], observed=True)['ROWS'].sum().reset_index(name='Count')
+
+analytics = AnalyticsService()
+
+
+def chart_html(fig):
+    """Render a figure as an HTML fragment that uses the page's shared plotly.js."""
+    return pio.to_html(fig, full_html=False, include_plotlyjs=False, config=CHART_CONFIG)
+
+
+def chart_json(fig):
+    """Serialize a figure as compact JSON for client-side rendering."""
+    return pio.to_json(fig, validate=False, pretty=False)
+
+
+def render_chart(create, mode):
+    """Build a chart and serialize it as the graphs page serves it in mode."""
+    fig = create()
+    return chart_json(fig).encode('utf-8') if mode == 'json' else chart_html(fig)
+
+
+def init_chart_worker(cube):
+    """Prepare a chart rendering process to draw from a prebuilt cube."""
+    analytics.load(cube)
 
-# Use conditional updates for missing grades 
-new_df.loc[(new_df['GRADE'].isna()) & (new_df['SCORE'] >= 0) & (new_df['SCORE'] <= 13),'GRADE'] = 'A'
-new_df.loc[(new_df['GRADE'].isna()) & (new_df['SCORE'] >= 14) & (new_df['SCORE'] <= 27),'GRADE'] = 'B'
-new_df.loc[(new_df['GRADE'].isna()) & (new_df['SCORE'] >= 28), 'GRADE'] = 'C'
 
 def total_inspections():
-    return len(new_df)
+    return int(analytics.cube.cells['ROWS'].sum())
 
 def critical_violations():
-    filtered_df = new_df.dropna(subset=['CRITICAL FLAG'])
-    return len(filtered_df[filtered_df['CRITICAL FLAG'] == 'Critical'])
+    cells = analytics.cube.cells
+    return int(cells.loc[cells['CRITICAL FLAG'] == 'Critical', 'ROWS'].sum())
 
 def average_score():
-    filtered_df = new_df[new_df['SCORE'].notna()]
-    return filtered_df['SCORE'].mean().round(2)
+    cells = analytics.cube.cells
+    return (cells['SCORE_SUM'].sum() / cells['SCORED'].sum()).round(2)
+
+
+def _average_scores(by):
+    """Mean SCORE per group of the cube, for groups with scored rows."""
+    totals = analytics.cube.totals(by)
+    totals = totals[totals['SCORED'] > 0]
+    return totals[by].assign(SCORE=totals['SCORE_SUM'] / totals['SCORED'])
 
 
 def worst_borough():
-    avg_scores = new_df.groupby('BORO')['SCORE'].mean().reset_index()
+    avg_scores = _average_scores(['BORO'])
     worst = avg_scores.sort_values(by='SCORE', ascending=False).iloc[0]
     return worst['BORO']
 
 
 # Create a pie chart
 def create_grade_pie_chart():
-    # Remove rows with NaN in 'GRADE' column
-    filtered_df = new_df.dropna(subset=['GRADE'])
-    grade_count = filtered_df.groupby('GRADE').size().reset_index(name='Count')
+    # Rows with NaN in 'GRADE' fall out of the grouping
+    grade_count = analytics.cube.totals(['GRADE']).rename(columns={'ROWS': 'Count'})[['GRADE', 'Count']]
     grade_count.sort_values(by='GRADE', ascending=True)
     fig = px.pie(
         grade_count,
@@ -72,12 +304,11 @@ def create_grade_pie_chart():
     margin=dict(t=100, b=50, l=50, r=50)
     )
 
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
+    return fig
 
 # Create a bar chart
 def create_grade_bar_chart():
-    filtered_df = new_df.dropna(subset=['GRADE'])
-    grade_count = filtered_df.groupby('GRADE').size().reset_index(name='Count')
+    grade_count = analytics.cube.totals(['GRADE']).rename(columns={'ROWS': 'Count'})[['GRADE', 'Count']]
     grade_count.sort_values(by='GRADE', ascending=True)
     fig = px.bar(
         grade_count.head(3), 
@@ -90,13 +321,12 @@ def create_grade_bar_chart():
         height=600,
         color_discrete_map = {'A': '#2B7CCC', 'B': '#45D05E', 'C': '#FFAC24'}
     )
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
+    return fig
 
 
 
 def create_grade_boro_bar_chart():
-    filtered_df = new_df.dropna(subset=['GRADE', 'BORO'])
-    grade_count_per_boro = filtered_df.groupby(['GRADE', 'BORO']).size().reset_index(name='Count')
+    grade_count_per_boro = analytics.cube.totals(['GRADE', 'BORO']).rename(columns={'ROWS': 'Count'})[['GRADE', 'BORO', 'Count']]
     grade_count_per_boro = grade_count_per_boro[grade_count_per_boro['GRADE'].isin(['A', 'B', 'C'])]
     fig = px.bar(
         grade_count_per_boro.sort_values(by='BORO', ascending=True), 
@@ -108,13 +338,12 @@ def create_grade_boro_bar_chart():
         color_discrete_map = {'A': '#2B7CCC', 'B': '#45D05E', 'C': '#FFAC24'},
         barmode='group',
     )
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
+    return fig
 
 
 
 def create_average_score_boro():
-    filtered_df = new_df.dropna(subset=['SCORE', 'BORO'])
-    avg_scores = filtered_df.groupby('BORO')['SCORE'].mean().reset_index()
+    avg_scores = _average_scores(['BORO'])
     avg_scores['SCORE'] = avg_scores['SCORE'].round(2)
 
     fig = px.bar(
@@ -130,13 +359,12 @@ def create_average_score_boro():
         yaxis_title='Average Score',
         showlegend=False
     )
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
+    return fig
 
 
 def create_critical_boro_bar_chart():
-    filtered_df = new_df[new_df['CRITICAL FLAG'] != 'Not Applicable']
-    filtered_df = filtered_df.dropna(subset=['CRITICAL FLAG', 'BORO'])
-    critical_count_per_boro = filtered_df.groupby(['CRITICAL FLAG', 'BORO']).size().reset_index(name='Count')
+    filtered_cube = analytics.cube.where(analytics.cube.cells['CRITICAL FLAG'] != 'Not Applicable')
+    critical_count_per_boro = filtered_cube.totals(['CRITICAL FLAG', 'BORO']).rename(columns={'ROWS': 'Count'})[['CRITICAL FLAG', 'BORO', 'Count']]
     fig = px.bar(
         critical_count_per_boro.sort_values(by='BORO', ascending=True), 
         x='Count',
@@ -147,81 +375,14 @@ def create_critical_boro_bar_chart():
         color_discrete_map = {'Critical': '#ef4444', 'Not Critical': '#f59e0c'},
         barmode='group',
     )
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
-
-
-
-groups = {
-    'American': ['Tex-Mex', 'American', 'Chicken', 'Hamburgers', 'Hotdogs', 'Hotdogs/Pretzels',
-                 'Sandwiches', 'Hawaiian', 'Barbecue', 'Bagels/Pretzels', 'Soul Food',
-                 'Steakhouse', 'Pancakes/Waffles', 'Sandwiches/Salads/Mixed Buffet', 'New American', 'Californian'],
-    'Cafe & Desserts': ['Donuts', 'Coffee/Tea', 'Bakery Products/Desserts', 'Bottled Beverages', 'Nuts/Confectionary'],
-    'Juice/Smoothies/Ice-Cream/Fruit Salads/Yogurt': ['Frozen Desserts', 'Juice, Smoothies, Fruit Salads'],
-    'South Asian(Indian, Pakistani, Afghan, etc)': ['Indian', 'Bangladeshi', 'Pakistani'],
-    'Southeast Asian(Thai, Viet, Malaysia, etc)': ['Thai', 'Southeast Asian', 'Filipino', 'Indonesian'],
-    'Mediterranean': ['Greek', 'Turkish', 'Moroccan'],
-    'European(Irish, English, German, etc)': ['Portuguese', 'Irish', 'Continental', 'Russian', 'Polish',
-                                              'Eastern European', 'English', 'German', 'Czech', 'Scandinavian', 'Basque'],
-    'Fusion': ['Creole', 'Fusion', 'Creole/Cajun', 'Cajun', 'Haute Cuisine'],
-    'Vegetarian/Vegan': ['Vegetarian', 'Vegan', 'Salads', 'Fruits/Vegetables'],
-    'Latin': ['Latin American', 'Peruvian', 'Brazilian', 'Chilean', 'Chimichurri'],
-    'Spanish': ['Spanish', 'Tapas'],
-    'Middle Eastern': ['Middle Eastern', 'Afghan', 'Armenian', 'Egyptian', 'Iranian'],
-    'Specialties': ['Soups', 'Soups/Salads/Sandwiches'],
-    'Chinese': ['Chinese', 'Chinese/Cuban'],
-    'Asian': ['Chinese/Japanese'],
-    'French': ['French', 'New French']
-}
-
-# Add individual items that don't belong to a group
-individual = {
-    'Pizza': 'Pizza',
-    'Italian': 'Italian',
-    'Japanese': 'Japanese',
-    'Jewish/Kosher': 'Jewish/Kosher',
-    'Korean': 'Korean',
-    'Caribbean': 'Caribbean',
-    'African': 'African',
-    'Australian': 'Australian',
-    'Not Listed/Not Applicable': 'Not Listed/Not Applicable',
-    'Other': 'Other'
-}
+    return fig
 
-# Create a mapping from individual cuisines to their groups
-cuisine_mapping = {c: group for group, cuisines in groups.items() for c in cuisines}
-cuisine_mapping.update(individual)
-
-# Apply mapping and clean up
-new_df['GROUPED_CUISINE'] = (
-    new_df['CUISINE DESCRIPTION']
-    .map(cuisine_mapping)
-    .fillna('Other')
-    .str.strip()
-    .str.title()
-)
-
-filtered_cuisine_df = new_df[
-    ~new_df['GROUPED_CUISINE'].isin([
-        'Not Listed/Not Applicable',
-        'Other',
-        'Unknown',
-        'Specialties'
-    ])
-]
-
-grade_count_per_cuisine = (
-    filtered_cuisine_df[filtered_cuisine_df['GRADE'].isin(['A', 'B', 'C'])]
-    .groupby(['GRADE', 'GROUPED_CUISINE'])
-    .size()
-    .reset_index(name='Count')
-    .sort_values(by='Count', ascending=False)
-)
 
 
 # Create a bar chart for cuisines
 def create_cuisines_chart():
     fig = px.bar(    
-        grade_count_per_cuisine.sort_values(by='Count', ascending=False),
+        analytics.grade_count_per_cuisine.sort_values(by='Count', ascending=False),
         x='Count',
         y='GROUPED_CUISINE',
         color='GRADE',
@@ -231,20 +392,14 @@ def create_cuisines_chart():
         width=1100,  
         height=800   
     )   
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
-
+    return fig
 
 
-# Get total count per cuisine
-grade_count_per_cuisine['Total Per Cuisine'] = grade_count_per_cuisine.groupby('GROUPED_CUISINE')['Count'].transform('sum')
-# Compute the percentage each grade makes up within its cuisine
-grade_count_per_cuisine['Percentage'] = (grade_count_per_cuisine['Count'] / grade_count_per_cuisine['Total Per Cuisine']) * 100
-
 
 # # Create a bar chart for cuisine by percentage
 def create_cuisines_percentage_chart():
     fig = px.bar(
-        grade_count_per_cuisine.sort_values(by='Percentage', ascending=True),
+        analytics.grade_count_per_cuisine.sort_values(by='Percentage', ascending=True),
         y='GROUPED_CUISINE',
         x='Percentage',
         color='GRADE',
@@ -258,21 +413,13 @@ def create_cuisines_percentage_chart():
         width=1100,
         height=800
     )
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
-
-
-
-# Step 1: Group by cuisine and violation
-violations_per_cuisine = new_df.groupby(['GROUPED_CUISINE', 'VIOLATION DESCRIPTION']).size().reset_index(name='Violation Count')
-violations_per_cuisine = violations_per_cuisine[violations_per_cuisine['GROUPED_CUISINE'] != 'Not Listed/Not Applicable']
-violations_per_cuisine = violations_per_cuisine[violations_per_cuisine['GROUPED_CUISINE'] != 'Other']
-total_violations_per_cuisine = violations_per_cuisine.groupby('GROUPED_CUISINE')['Violation Count'].sum().reset_index()
+    return fig
 
 
 # bar chart of violation per cuisine
 def create_violations_per_cuisine_chart():
     fig = px.bar(
-        total_violations_per_cuisine.sort_values(by='Violation Count', ascending=True),
+        analytics.total_violations_per_cuisine.sort_values(by='Violation Count', ascending=True),
         x='Violation Count',
         y='GROUPED_CUISINE',
         labels={'Violation Count': 'Number of Violations', 'GROUPED_CUISINE': 'Cuisine'},
@@ -281,27 +428,13 @@ def create_violations_per_cuisine_chart():
         height=800,
         color_discrete_sequence=['#8B0000']
     )
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
-
-
-# Get latest inspection date per cuisine
-latest_dates_by_cuisine = new_df.groupby('GROUPED_CUISINE')['INSPECTION DATE'].max().reset_index()
-latest_dates_by_cuisine = latest_dates_by_cuisine[latest_dates_by_cuisine['GROUPED_CUISINE'] != 'Not Listed/Not Applicable']
-latest_dates_by_cuisine = latest_dates_by_cuisine[latest_dates_by_cuisine['GROUPED_CUISINE'] != 'Other']
-latest_inspections = pd.merge(
-    new_df,
-    latest_dates_by_cuisine,
-    on=['GROUPED_CUISINE', 'INSPECTION DATE']
-)
-# Keep only rows with real violations
-latest_inspections = latest_inspections.dropna(subset=['VIOLATION DESCRIPTION'])
-# Count total violations per cuisine
-lastest_violations_per_cuisine = latest_inspections.groupby('GROUPED_CUISINE').size().reset_index(name='Latest Violations')
+    return fig
+
 
 # Bar chart of latest violations per cuisine
 def create_latest_violations_per_cuisine_chart():
     fig = px.bar(
-        lastest_violations_per_cuisine.sort_values(by='Latest Violations', ascending=True),
+        analytics.lastest_violations_per_cuisine.sort_values(by='Latest Violations', ascending=True),
         x='Latest Violations',
         y='GROUPED_CUISINE',
         labels={'Latest Violations': 'Number of Violations', 'GROUPED_CUISINE': 'Cuisine'},
@@ -310,35 +443,13 @@ def create_latest_violations_per_cuisine_chart():
         height=800,
         color_discrete_sequence=['#8B0000']
     )
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
-
-
-cuisine_violation_per_boro = (new_df
-    .dropna(subset=['VIOLATION DESCRIPTION'])  # Only actual violations
-    .groupby(['GROUPED_CUISINE', 'BORO'])['VIOLATION DESCRIPTION']
-    .count()
-    .reset_index(name='Violation Count')
-)
-
-# Count violations (rows) and unique inspections (CAMIS)
-violations = (
-    new_df
-    .groupby(['GROUPED_CUISINE', 'BORO'])
-    .agg(
-        Total_Violations=('VIOLATION DESCRIPTION', 'count'),
-        Total_Inspections=('CAMIS', 'nunique')
-    )
-    .reset_index()
-)
+    return fig
 
-violations['Average_Violations_Per_Inspection'] = (violations['Total_Violations'] / violations['Total_Inspections']).round(2)
-violations = violations[violations['GROUPED_CUISINE'] != 'Not Listed/Not Applicable']
-violations = violations[violations['GROUPED_CUISINE'] != 'Other']
 
 # Create a bar chart for violations per cuisine and borough
 def create_avg_violations_by_cuisine_and_borough_chart():
     fig = px.bar(
-        violations.sort_values(by='Average_Violations_Per_Inspection', ascending=True),
+        analytics.violations.sort_values(by='Average_Violations_Per_Inspection', ascending=True),
         x='Average_Violations_Per_Inspection',
         y='GROUPED_CUISINE',
         color_discrete_sequence=['#8B0000'],
@@ -367,19 +478,16 @@ def create_avg_violations_by_cuisine_and_borough_chart():
         align='center'
     )
 
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
+    return fig
 
 
-violation_counts = new_df.dropna(subset=['VIOLATION CODE'])
-violation_counts = violation_counts.groupby(['VIOLATION CODE']).size().reset_index(name='Count')
-
 # Create violation code distribution treemap
 def create_violation_code_treemap():
     fig = go.Figure(go.Treemap(
-        labels=violation_counts['VIOLATION CODE'],
-        parents=[""] * len(violation_counts),  # Flat structure (no hierarchy)
-        values=violation_counts['Count'],
-        marker=dict(colors=violation_counts['Count'], colorscale='RdBu'),
+        labels=analytics.violation_counts['VIOLATION CODE'],
+        parents=[""] * len(analytics.violation_counts),  # Flat structure (no hierarchy)
+        values=analytics.violation_counts['Count'],
+        marker=dict(colors=analytics.violation_counts['Count'], colorscale='RdBu'),
         hovertemplate='<b>Code:</b> %{label}<br><b>Count:</b> %{value}<extra></extra>'
     ))
 
@@ -389,32 +497,35 @@ def create_violation_code_treemap():
         font=dict(size=14)
     )
 
-    return pio.to_html(fig, full_html=False, config={'displayModeBar': False})
+    return fig
+
 
 
+def _most_common_violation(critical_flag):
+    """Violation description recorded most often with the given critical flag."""
+    violations = analytics.cube.violations
+    violations = violations[violations['CRITICAL FLAG'] == critical_flag]
+    return violations.groupby('VIOLATION DESCRIPTION', observed=True)['ROWS'].sum().idxmax()
 
 def create_most_critical_violation():
-    filtered_df = new_df.dropna(subset=['CRITICAL FLAG', 'VIOLATION DESCRIPTION'])
-    most_common_critical = filtered_df[filtered_df['CRITICAL FLAG'] == 'Critical']['VIOLATION DESCRIPTION'].value_counts().idxmax()
+    most_common_critical = _most_common_violation('Critical')
     return most_common_critical
 
 def create_most_non_critical_violation():
-    filtered_df = new_df.dropna(subset=['CRITICAL FLAG', 'VIOLATION DESCRIPTION'])
-    most_non_common_critical = filtered_df[filtered_df['CRITICAL FLAG'] == 'Not Critical']['VIOLATION DESCRIPTION'].value_counts().idxmax()
+    most_non_common_critical = _most_common_violation('Not Critical')
     return most_non_common_critical
 
 def create_worst_month_for_violations():
-    filtered_df = new_df.dropna(subset=['INSPECTION DATE', 'VIOLATION DESCRIPTION'])
-    # Extract full month name
-    filtered_df['Month'] = filtered_df['INSPECTION DATE'].dt.strftime('%B')
+    cells = analytics.cube.cells
+    cells = cells[cells['VIOLATIONS'] > 0].dropna(subset=['MONTH'])
 
-    # Group by month and count violations
-    monthly_counts = filtered_df.groupby('Month')['VIOLATION DESCRIPTION'].size()
+    # Group by calendar month and count violations
+    monthly_counts = cells.groupby(cells['MONTH'].dt.month)['VIOLATIONS'].sum()
 
     # Reorder months
     month_order = ['January', 'February', 'March', 'April', 'May', 'June',
                 'July', 'August', 'September', 'October', 'November', 'December']
-    monthly_counts = monthly_counts.reindex(month_order)
+    monthly_counts = monthly_counts.reindex(range(1, 13)).set_axis(month_order)
 
     # Calculate worst month
     avg = monthly_counts.mean()
@@ -434,23 +545,21 @@ def create_worst_month_for_violations():
 #     return top_5_safest_cuisines
 
 def create_top_5_safest_cuisines():
-    filtered_df = new_df.dropna(subset=['GROUPED_CUISINE', 'SCORE'])
+    grouped = _average_scores(['GROUPED_CUISINE'])
 
      # Exclude cuisines that are "Not Listed/Not Applicable"
-    filtered_df = filtered_df[filtered_df['GROUPED_CUISINE'] != 'Not Listed/Not Applicable']
-    filtered_df = filtered_df[filtered_df['GROUPED_CUISINE'] != 'Specialties']
-    filtered_df = filtered_df[filtered_df['GROUPED_CUISINE'] != 'Other']
+    grouped = grouped[grouped['GROUPED_CUISINE'] != 'Not Listed/Not Applicable']
+    grouped = grouped[grouped['GROUPED_CUISINE'] != 'Specialties']
+    grouped = grouped[grouped['GROUPED_CUISINE'] != 'Other']
 
-    grouped = filtered_df.groupby('GROUPED_CUISINE')['SCORE'].mean().reset_index()
     safest = grouped.sort_values(by='SCORE').head(5)
     return safest.to_dict(orient='records')
 
 
 
 def create_worse_restaurant_boro_chart():
-    filtered_df = new_df.dropna(subset=['BORO', 'DBA', 'SCORE'])
-    filtered_df = filtered_df[filtered_df['GRADE'].isin(['A', 'B', 'C'])]
-    worst_per_boro = filtered_df.sort_values(by='SCORE', ascending=False).groupby('BORO').head(1)
+    filtered_cube = analytics.cube.where(analytics.cube.cells['GRADE'].isin(['A', 'B', 'C']))
+    worst_per_boro = filtered_cube.worst(['BORO']).rename(columns={'WORST_DBA': 'DBA', 'WORST_SCORE': 'SCORE'})
     worst_per_boro = worst_per_boro[['DBA', 'BORO', 'SCORE']].reset_index(drop=True)
     return worst_per_boro.to_dict(orient='records')
 
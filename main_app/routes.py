@@ -1,9 +1,22 @@
 """Flask route handlers for the application."""
-from flask import Blueprint, render_template, request, current_app, jsonify, send_from_directory
-from main_app.utils.search import search_restaurants
+from flask import Blueprint, render_template, request, current_app, jsonify, send_from_directory, make_response, stream_with_context, redirect, url_for
+from main_app.utils.search import search_restaurants, search_batch, search_names, restaurant_history, encode_cursor, decode_cursor
+from main_app.utils.dispatcher import GeocoderBusyError
+from main_app.utils.filters import parse_filters
+from main_app.utils.density import density_level_for_zoom
+from main_app.utils.geometry import level_for_zoom
+from main_app.utils.snapshots import current_data_service
+from pathlib import Path
+import json
 import logging
+import math
+import plotly
 
 # Data analysis and visualization imports
+from main_app.plots import analytics
+from main_app.plots import chart_html
+from main_app.plots import render_chart
+from main_app.plots import init_chart_worker
 from main_app.plots import total_inspections
 from main_app.plots import critical_violations
 from main_app.plots import average_score
@@ -28,6 +41,9 @@ from main_app.plots import create_top_5_safest_cuisines
 
 bp = Blueprint('main', __name__)
 
+# Request fields of a search that its cursor carries to the following pages
+SEARCH_PARAMS = ['address', 'nearest', 'radius', 'page_size', 'filters']
+
 
 
 @bp.route('/', methods=['GET', 'POST'])
@@ -39,14 +55,35 @@ def search():
             return jsonify({'error': 'Content-Type must be application/json'}), 400
             
         data = request.get_json()
-        address = data.get('address', '').strip()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
         
         try:
-            response_data = search_restaurants(address)
+            # A cursor carries the original search parameters and where its next page starts
+            cursor = data.get('cursor')
+            state = decode_cursor(cursor) if cursor is not None else {'params': data}
+            params = {name: state['params'][name] for name in SEARCH_PARAMS if name in state['params']}
+            address = str(params.get('address', '')).strip()
+            nearest = params.get('nearest')
+            if nearest is not None:
+                nearest = _positive_int(nearest, 'nearest')
+            radius = _search_radius(params)
+            page_size = _positive_int(params.get('page_size', current_app.config['SEARCH_PAGE_SIZE']), 'page_size')
+            if page_size > current_app.config['SEARCH_MAX_PAGE_SIZE']:
+                raise ValueError(f"page_size must be between 1 and {current_app.config['SEARCH_MAX_PAGE_SIZE']}")
+            filters = parse_filters(params.get('filters'))
+            response_data = search_restaurants(
+                address, nearest=nearest, filters=filters, radius=radius, page_size=page_size,
+                location=state.get('location'), after=state.get('after')
+            )
+            following = response_data.pop('next')
+            response_data['next_cursor'] = encode_cursor({'params': params, **following}) if following else None
             return current_app.response_class(
                 response=current_app.json.dumps(response_data),
                 mimetype='application/json'
             )
+        except GeocoderBusyError as e:
+            return jsonify({'error': str(e)}), 503
         except ValueError as e:
             return jsonify({'error': str(e)}), 400
         except Exception as e:
@@ -56,6 +93,104 @@ def search():
     elif request.method == 'GET':
         return render_template('search.html', mapbox_token=current_app.config['MAPBOX_TOKEN'])
     
+@bp.route('/search/batch', methods=['POST'])
+def batch_search():
+    """Stream search results for a list of addresses or coordinates as NDJSON."""
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
+    
+    data = request.get_json()
+    try:
+        items = data.get('items')
+        if not isinstance(items, list):
+            raise ValueError("items must be a list of addresses or coordinates")
+        if len(items) > current_app.config['BATCH_SEARCH_MAX_ITEMS']:
+            raise ValueError(f"At most {current_app.config['BATCH_SEARCH_MAX_ITEMS']} items per request")
+        nearest = data.get('nearest')
+        if nearest is not None:
+            nearest = _positive_int(nearest, 'nearest')
+        radius = _search_radius(data)
+        filters = parse_filters(data.get('filters'))
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        lines = search_batch(items, nearest=nearest, filters=filters, radius=radius)
+        # Keep the request's dataset snapshot pinned until the last line is sent
+        return current_app.response_class(stream_with_context(lines), mimetype='application/x-ndjson')
+    except Exception as e:
+        logging.error(f"Batch search error: {str(e)}")
+        return jsonify({'error': 'Batch search failed'}), 500
+    
+def _positive_int(value, name):
+    """Return a request field as a positive integer, raising ValueError otherwise."""
+    try:
+        # int() would take true and false as 1 and 0
+        if isinstance(value, bool):
+            raise TypeError
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a positive integer")
+    if value <= 0:
+        raise ValueError(f"{name} must be a positive integer")
+    return value
+
+
+def _search_radius(params):
+    """Return the requested search radius in miles, raising ValueError past the server cap."""
+    try:
+        radius = params.get('radius', current_app.config['SEARCH_DEFAULT_RADIUS'])
+        if isinstance(radius, bool):
+            raise TypeError
+        radius = float(radius)
+    except (TypeError, ValueError):
+        raise ValueError("radius must be a number")
+    if not 0 < radius <= current_app.config['SEARCH_MAX_RADIUS']:
+        raise ValueError(f"radius must be more than 0 and at most {current_app.config['SEARCH_MAX_RADIUS']} miles")
+    return radius
+    
+@bp.route('/restaurant/<camis>/history')
+def restaurant_inspections(camis):
+    """Return one restaurant's inspection history, newest first."""
+    try:
+        history = restaurant_history(camis)
+    except Exception as e:
+        logging.error(f"History error: {str(e)}")
+        return jsonify({'error': 'Fetching inspection history failed'}), 500
+    if history is None:
+        return jsonify({'error': 'Unknown restaurant'}), 404
+    return current_app.response_class(
+        response=current_app.json.dumps(history),
+        mimetype='application/json'
+    )
+    
+@bp.route('/search/stats')
+def search_stats():
+    """Report this worker's search candidate and geocode cache hit rates."""
+    return jsonify({
+        'search_cache': current_app.extensions['search_cache'].stats(),
+        'geocode_cache': current_app.extensions['geo_service'].cache.stats(),
+    })
+    
+@bp.route('/search/name')
+def name_search():
+    """Autocomplete and fuzzy search of restaurants by name."""
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 10, type=int)
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    if not 0 < limit <= current_app.config['NAME_SEARCH_MAX_LIMIT']:
+        return jsonify({'error': f"limit must be between 1 and {current_app.config['NAME_SEARCH_MAX_LIMIT']}"}), 400
+    
+    try:
+        return current_app.response_class(
+            response=current_app.json.dumps(search_names(query, limit=limit)),
+            mimetype='application/json'
+        )
+    except Exception as e:
+        logging.error(f"Name search error: {str(e)}")
+        return jsonify({'error': 'Name search failed'}), 500
+    
 @bp.route('/heatmap')
 def heatmap():
     """Render the main search page"""
@@ -66,22 +201,39 @@ def about():
     """Render the about page."""
     return render_template('about.html')
     
+def _payload_response(name):
+    """Serve a pre-serialized dataset payload."""
+    payload = current_data_service().payloads[name]
+    return payload.respond(request, max_age=current_app.config['PAYLOAD_MAX_AGE'])
+
 @bp.route('/fetch_geoms', methods=['POST', 'GET'])
 def fetch_geoms():
+    """Serve zipcode geometries simplified for ?zoom=, or merged with grades without it."""
+    zoom = request.args.get('zoom', type=float)
     try:
-        return send_from_directory('../data', 'zipcode_border_grades.geojson')
+        if zoom is None:
+            return _payload_response('zip_geojson')
+        return _payload_response(f'zip_geometry_{level_for_zoom(zoom)}')
     
     except Exception as e:
         logging.error(f'Fetch error: {str(e)}')
         return jsonify({'error': 'Fetching geoms failed'}), 500
 
+@bp.route('/fetch_density')
+def fetch_density():
+    """Serve the restaurant density grid precomputed for ?zoom=."""
+    zoom = request.args.get('zoom', 0, type=float)
+    try:
+        return _payload_response(f'density_{density_level_for_zoom(zoom)}')
+    
+    except Exception as e:
+        logging.error(f'Fetch error: {str(e)}')
+        return jsonify({'error': 'Fetching density failed'}), 500
+
 @bp.route('/fetch_unique_restaurants', methods=['POST', 'GET'])
 def fetch_unique_restaurants():
     try:
-        return current_app.response_class(
-            response=current_app.json.dumps(current_app.data_service.unique_restaurants),
-            mimetype='application/json'
-        )
+        return _payload_response('unique_restaurants')
     
     except Exception as e:
         logging.error(f'Fetch error: {str(e)}')
@@ -90,59 +242,221 @@ def fetch_unique_restaurants():
 @bp.route('/fetch_means', methods=['POST', 'GET'])
 def fetch_means():
     try:
+        return _payload_response('zip_means')
+    
+    except Exception as e:
+        logging.error(f'Fetch error: {str(e)}')
+        return jsonify({'error': 'Fetching zipcode means failed'}), 500
+
+# Deepest zoom a web map requests; clusters scale with 2 ** zoom
+MAX_ZOOM = 24
+
+@bp.route('/viewport')
+def viewport():
+    """Return clusters or restaurants inside a map bounding box as GeoJSON."""
+    try:
+        south, west, north, east, zoom = (
+            float(request.args[key]) for key in ('south', 'west', 'north', 'east', 'zoom')
+        )
+        if not (south < north and west < east):
+            raise ValueError("Bounding box must have south < north and west < east")
+        if not (math.isfinite(south) and math.isfinite(north) and math.isfinite(west) and math.isfinite(east)):
+            raise ValueError("Bounding box must be finite")
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"Zoom must be between 0 and {MAX_ZOOM}")
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid viewport: {str(e)}'}), 400
+    
+    try:
+        features = current_data_service().viewport.query(south, west, north, east, zoom)
         return current_app.response_class(
-            response=current_app.json.dumps(current_app.data_service.mean_grades),
+            response=json.dumps(features),
             mimetype='application/json'
         )
     
     except Exception as e:
-        logging.error(f'Fetch error: {str(e)}')
-        return jsonify({'error': 'Fetching zipcode means failed'}), 500
+        logging.error(f'Viewport error: {str(e)}')
+        return jsonify({'error': 'Fetching viewport failed'}), 500
     
 
+# Charts of the graphs page and the functions that build their figures
+GRAPH_CHARTS = {
+    'grade_pie': create_grade_pie_chart,
+    'grade_bar': create_grade_bar_chart,
+    'boro_bar': create_grade_boro_bar_chart,
+    'cuisines_bar': create_cuisines_chart,
+    'cuisines_percentage': create_cuisines_percentage_chart,
+    'violations_per_cuisine': create_violations_per_cuisine_chart,
+    'latest_violations_per_cuisine': create_latest_violations_per_cuisine_chart,
+    'avg_violations_by_cuisine_and_borough': create_avg_violations_by_cuisine_and_borough_chart,
+    'avg_score_boro': create_average_score_boro,
+    'critical_boro': create_critical_boro_bar_chart,
+    'violation_code': create_violation_code_treemap,
+}
+
+# Headline numbers and tables of the graphs page
+GRAPH_VALUES = {
+    'all_inspections': lambda: "{:,}".format(total_inspections()),
+    'critical': lambda: "{:,}".format(critical_violations()),
+    'avg_score': average_score,
+    'bad_borough': worst_borough,
+    'worst_month': create_worst_month_for_violations,
+    'critical_violation': create_most_critical_violation,
+    'non_critical_violation': create_most_non_critical_violation,
+    'worst_restaurant_boro': create_worse_restaurant_boro_chart,
+    'top_5_safest_cuisines': create_top_5_safest_cuisines,
+}
+
+PLOTLY_JS_DIR = Path(plotly.__file__).parent / 'package_data'
+
+
+def _cached_response(name, render, mimetype, version=None, last_modified=None):
+    """Serve a chart cache entry with ETag/Last-Modified revalidation.
+    
+    version defaults to the cache version of the current dataset.
+    """
+    chart_cache = current_app.extensions['chart_cache']
+    if version is None:
+        data_version, last_modified = analytics.data_version()
+        version = chart_cache.versioned(data_version)
+    
+    response = make_response('', 304)
+    response.set_etag(version)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if request.if_none_match.contains(version):
+        return response
+    
+    response.set_data(chart_cache.get_or_render(name, version, lambda: render(chart_cache, version)))
+    response.status_code = 200
+    response.mimetype = mimetype
+    return response.make_conditional(request)
+
+
+def _chart_placeholder(name, version):
+    """Return a chart slot that graphs.js fills from the chart's figure JSON."""
+    return f'<div class="plotly-chart" data-chart="{name}" data-version="{version}" style="min-height: 450px"></div>'
+
+
+def _graph_entries(service, data_version, mode):
+    """Compute the graphs page values from the pinned dataset and list its charts for the warm-up pool."""
+    # The pinned snapshot must be the one analytics reads, or a newer one is on its way
+    if service is not None and service.version != data_version:
+        raise RuntimeError("Dataset changed while preparing charts")
+    cube = analytics.cube
+    if analytics.data_version()[0] != data_version:
+        raise RuntimeError("Dataset changed while preparing charts")
+    
+    entries = {name: render() for name, render in GRAPH_VALUES.items()}
+    suffix = 'json' if mode == 'json' else 'html'
+    jobs = {f"{name}.{suffix}": (render_chart, create, mode) for name, create in GRAPH_CHARTS.items()}
+    return entries, jobs, init_chart_worker, (cube,)
+
+
+def warm_up_graphs(app):
+    """Render the charts of the current dataset in the background unless they are published."""
+    data_version, _ = analytics.data_version()
+    version = app.extensions['chart_cache'].versioned(data_version)
+    mode = app.config['GRAPHS_MODE']
+    app.extensions['chart_warm_up'].start(version, lambda service: _graph_entries(service, data_version, mode))
+    return version
+
+
 # data visualization route
 @bp.route('/graphs')
 def graphs():
-    """Render the graphs page."""
-    grade_pie = create_grade_pie_chart()
-    grade_bar = create_grade_bar_chart()
-    boro_bar = create_grade_boro_bar_chart()
-    cuisines_bar = create_cuisines_chart()
-    cuisines_percentage = create_cuisines_percentage_chart()
-    violations_per_cuisine = create_violations_per_cuisine_chart()
-    latest_violations_per_cuisine = create_latest_violations_per_cuisine_chart()
-    avg_violations_by_cuisine_and_borough = create_avg_violations_by_cuisine_and_borough_chart()
-    avg_score_boro = create_average_score_boro()
-    critical_boro = create_critical_boro_bar_chart()
-    violation_code = create_violation_code_treemap()
-    all_inspections = "{:,}".format(total_inspections())
-    critical = "{:,}".format(critical_violations())
-    avg_score = average_score()
-    bad_borough = worst_borough()
-    worst_month = create_worst_month_for_violations()
-    critical_violation = create_most_critical_violation()
-    non_critical_violation = create_most_non_critical_violation()
-    worst_restaurant_boro = create_worse_restaurant_boro_chart()
-    top_5_safest_cuisines = create_top_5_safest_cuisines()
-    return render_template('graphs.html',
-                           all_inspections=all_inspections,
-                           critical=critical,
-                           avg_score=avg_score,
-                           bad_borough=bad_borough, 
-                           grade_pie=grade_pie, 
-                           grade_bar=grade_bar, 
-                           boro_bar=boro_bar,
-                           avg_score_boro=avg_score_boro,
-                           critical_boro=critical_boro,
-                           cuisines_bar=cuisines_bar,
-                           cuisines_percentage=cuisines_percentage,
-                           violations_per_cuisine=violations_per_cuisine,
-                           latest_violations_per_cuisine = latest_violations_per_cuisine,
-                           avg_violations_by_cuisine_and_borough=avg_violations_by_cuisine_and_borough,
-                           violation_code=violation_code,
-                           worst_month=worst_month,
-                           critical_violation=critical_violation,
-                           non_critical_violation=non_critical_violation,
-                           worst_restaurant_boro=worst_restaurant_boro,
-                           top_5_safest_cuisines=top_5_safest_cuisines
-                           )
+    """Render the graphs page from the newest complete set of rendered charts.
+    
+    While the charts of a new dataset render in the background, the page
+    shows the previous set, or placeholders that load each chart on its
+    own when no set is published yet. It never renders charts itself.
+    """
+    mode = current_app.config['GRAPHS_MODE']
+    chart_cache = current_app.extensions['chart_cache']
+    current = warm_up_graphs(current_app)
+    served = current if chart_cache.is_published(current) else chart_cache.latest_published()
+    if served is not None and served != current and not _has_page(chart_cache, served, mode):
+        # An older set without what this page shows is not completed from the current data
+        served = None
+    
+    if served is None:
+        content = {name: _chart_placeholder(name, current) for name in GRAPH_CHARTS}
+        response = make_response(render_template(
+            'graphs.html', chart_mode='json', plotly_version=plotly.__version__, warming=True, **content
+        ))
+        response.cache_control.no_store = True
+        return response
+    
+    def render_page(chart_cache, version):
+        content = {name: chart_cache.get(name, version) for name in GRAPH_VALUES}
+        for name, create in GRAPH_CHARTS.items():
+            if mode == 'json':
+                content[name] = _chart_placeholder(name, version)
+            elif version == current:
+                content[name] = chart_cache.get_or_render(
+                    f"{name}.html", version, lambda create=create: chart_html(create())
+                )
+            else:
+                content[name] = chart_cache.get(f"{name}.html", version)
+        return render_template(
+            'graphs.html', chart_mode=mode, plotly_version=plotly.__version__,
+            warming=version != current, **content
+        ).encode('utf-8')
+    
+    name = f"graphs_page_{mode}" if served == current else f"graphs_page_{mode}_stale"
+    return _cached_response(name, render_page, 'text/html', version=served)
+
+
+def _has_page(chart_cache, version, mode):
+    """Return whether the published set of version holds every entry the graphs page reads in mode."""
+    names = list(GRAPH_VALUES)
+    if mode != 'json':
+        names += [f"{name}.html" for name in GRAPH_CHARTS]
+    return all(chart_cache.get(name, version) is not None for name in names)
+
+
+@bp.route('/graphs/status')
+def graphs_status():
+    """Report whether the charts of the current dataset are published and the warm-up progress."""
+    data_version, _ = analytics.data_version()
+    chart_cache = current_app.extensions['chart_cache']
+    version = chart_cache.versioned(data_version)
+    return jsonify({
+        'version': version,
+        'ready': chart_cache.is_published(version),
+        'published': chart_cache.latest_published(),
+        'warm_up': current_app.extensions['chart_warm_up'].status(),
+    })
+
+
+@bp.route('/graphs/<chart_id>.json')
+def graph_json(chart_id):
+    """Return one chart of the graphs page as figure JSON.
+    
+    ?v= picks a published version, as the page it is embedded in shows,
+    and only serves what that version published: for a chart it lacks or
+    a version no longer published it redirects to the current chart.
+    Otherwise the chart of the current dataset is served, rendered on its
+    own if its set is not published yet.
+    """
+    create = GRAPH_CHARTS.get(chart_id)
+    if create is None:
+        return jsonify({'error': 'Unknown chart'}), 404
+    
+    chart_cache = current_app.extensions['chart_cache']
+    name = f"{chart_id}.json"
+    requested = request.args.get('v')
+    if requested and requested != chart_cache.versioned(analytics.data_version()[0]):
+        figure = chart_cache.get(name, requested) if chart_cache.is_published(requested) else None
+        if figure is None:
+            return redirect(url_for('main.graph_json', chart_id=chart_id))
+        return _cached_response(name, lambda chart_cache, version: figure, 'application/json', version=requested)
+    return _cached_response(
+        name, lambda chart_cache, version: render_chart(create, 'json'), 'application/json'
+    )
+
+
+@bp.route('/graphs/plotly.min.js')
+def plotly_js():
+    """Serve the plotly.js bundle once, cacheable for a year per plotly version."""
+    return send_from_directory(PLOTLY_JS_DIR, 'plotly.min.js', max_age=31536000)
@@ -0,0 +1,71 @@
+// render a chart placeholder from its figure JSON
+async function renderChart(element) {
+    try {
+        const version = element.dataset.version ? `?v=${encodeURIComponent(element.dataset.version)}` : '';
+        const response = await fetch(`/graphs/${element.dataset.chart}.json${version}`);
+
+        if (!response.ok) {
+            throw new Error(`Couldn't get chart ${element.dataset.chart} from graphs.js...`);
+        }
+        const figure = await response.json();
+
+        Plotly.newPlot(element, figure.data, figure.layout, { displayModeBar: false });
+    }
+    catch (error) {
+        console.error(error);
+    }
+}
+
+// reload the page once the charts of the latest data are published
+async function watchWarmUp(element) {
+    try {
+        const response = await fetch(element.dataset.statusUrl);
+
+        if (!response.ok) {
+            throw new Error(`Couldn't get chart status from graphs.js...`);
+        }
+        const status = await response.json();
+
+        if (status.ready) {
+            window.location.reload();
+            return;
+        }
+        const progress = status.warm_up;
+        if (progress.version === status.version && progress.state === 'running' && progress.total) {
+            element.textContent = `Charts are being updated with the latest data (${progress.done}/${progress.total}).`;
+        }
+        if (progress.version === status.version && progress.state === 'failed') {
+            return;
+        }
+    }
+    catch (error) {
+        console.error(error);
+    }
+    setTimeout(() => watchWarmUp(element), 3000);
+}
+
+// only fetch and draw charts as they get close to the screen
+document.addEventListener('DOMContentLoaded', () => {
+    const charts = document.querySelectorAll('.plotly-chart');
+    const warming = document.getElementById('graphs-warming');
+
+    if (warming) {
+        setTimeout(() => watchWarmUp(warming), 3000);
+    }
+
+    if (!('IntersectionObserver' in window)) {
+        charts.forEach(renderChart);
+        return;
+    }
+
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                renderChart(entry.target);
+            }
+        });
+    }, { rootMargin: '300px' });
+
+    charts.forEach(chart => observer.observe(chart));
+});
@@ -1,7 +1,9 @@
 import { updateZipcodes,
-         getUniqueRestaurants, 
-         calculateColorGrade,
-         getRestaurantsByZipcode 
+         getZipcodeMean,
+         fetchZipcodeGeometry,
+         fetchViewport,
+         fetchDensity,
+         calculateColorGrade
 } from "./utils.js";
 
 // Initialize Mapbox map
@@ -18,11 +20,12 @@ var map = new mapboxgl.Map({
 });
 
 // global variables
-let all_restaurant_markers = [];    // store all markers, each marker represents a restaurant
-let all_restaurant_popups = [];     // store all popups for restaurants
 let isHoveringMarker = false;       // if true, the map will allow you to hover over a marker 
 let currentZipcode = 0;             // keeps track of the current zipcode the user is hovering over
 let zoomedIn = false;
+let viewportRequest = null;         // in-flight viewport request, aborted when the map moves again
+let geometryZooms = null;           // zoom range the loaded zipcode geometry was simplified for
+let densityZooms = null;            // zoom range the loaded density grid was binned for
 
 // single popup to display overview, shows info about average grade
 const zipcode_popup = new mapboxgl.Popup({
@@ -30,14 +33,78 @@ const zipcode_popup = new mapboxgl.Popup({
     closeOnClick: false
 });
 
+// single popup for the restaurant under the mouse
+const restaurant_popup = new mapboxgl.Popup({
+    closeButton: false,
+    closeOnClick: false
+});
+
+
+// fetch the clusters or restaurants for what is on screen and draw them
+async function updateViewport() {
+    if (viewportRequest) {
+        viewportRequest.abort();
+    }
+    viewportRequest = new AbortController();
+
+    try {
+        const data = await fetchViewport(map.getBounds(), map.getZoom(), viewportRequest.signal);
+        map.getSource('restaurants').setData(data);
+    }
+    catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error(error);
+        }
+    }
+}
+
+
+// load zipcode borders simplified for the current zoom, only when it leaves the loaded level's range
+async function updateZipcodeGeometry() {
+    const zoom = map.getZoom();
+    if (geometryZooms && zoom >= geometryZooms.min_zoom &&
+        (geometryZooms.max_zoom === null || zoom < geometryZooms.max_zoom)) {
+        return;
+    }
+
+    try {
+        const geometry = await fetchZipcodeGeometry(zoom);
+        geometryZooms = geometry.simplification;
+        map.getSource('zipcodes').setData(geometry);
+    }
+    catch (error) {
+        console.error(error);
+    }
+}
+
+
+// load the restaurant density grid binned for the current zoom, only when it leaves the loaded grid's range
+async function updateDensity() {
+    const zoom = map.getZoom();
+    if (densityZooms && zoom >= densityZooms.min_zoom &&
+        (densityZooms.max_zoom === null || zoom < densityZooms.max_zoom)) {
+        return;
+    }
+
+    try {
+        const density = await fetchDensity(zoom);
+        densityZooms = density.zooms;
+        map.getSource('density').setData(density.geojson);
+    }
+    catch (error) {
+        console.error(error);
+    }
+}
+
 
 // run as the map gets loaded in (like a map constructor)
 map.on('load', async () => {
-    // load in geojson data called 'zipcodes'
+    // zipcode borders only, grades and colors come from /fetch_means
     map.addSource('zipcodes', {
         type: 'geojson',
-        data: '/fetch_geoms'
+        data: { type: 'FeatureCollection', features: [] }
     });
+    await updateZipcodeGeometry();
 
     // add a new layer for the zipcode shading
     map.addLayer({
@@ -66,6 +133,27 @@ map.on('load', async () => {
         }
     });       
 
+    // finer than zipcodes once zoomed in: grid cells colored by mean score, more opaque with more restaurants
+    map.addSource('density', {
+        type: 'geojson',
+        data: { type: 'FeatureCollection', features: [] }
+    });
+    await updateDensity();
+
+    map.addLayer({
+        id: 'density-fill',
+        type: 'fill',
+        source: 'density',
+        minzoom: 12,
+        paint: {
+            'fill-color': [
+                'case', ['==', ['get', 'mean_score'], null], '#d9d9d9',
+                ['interpolate', ['linear'], ['get', 'mean_score'], 7, 'blue', 20, 'green', 35, 'orange']
+            ],
+            'fill-opacity': ['interpolate', ['linear'], ['get', 'count'], 1, 0.25, 20, 0.75]
+        }
+    });
+
     // add the zoom in, zoom out, and compass buttons to the map
     map.addControl(new mapboxgl.NavigationControl());
 
@@ -73,10 +161,94 @@ map.on('load', async () => {
     map.setPaintProperty("settlement-major-label", "text-color", "#000000")     // set the titles to be black
     map.setPaintProperty("settlement-minor-label", "text-color", "#000000")     // set the smaller titles to be black
 
-    console.log(map.getStyle().layers);
+    // restaurants on screen: grid clusters when zoomed out, single restaurants when zoomed in
+    map.addSource('restaurants', {
+        type: 'geojson',
+        data: { type: 'FeatureCollection', features: [] }
+    });
+
+    // clusters are sized by how many restaurants they hold and colored by their average grade
+    map.addLayer({
+        id: 'restaurant-clusters',
+        type: 'circle',
+        source: 'restaurants',
+        filter: ['==', ['get', 'cluster'], true],
+        paint: {
+            'circle-color': [
+                'case', ['==', ['get', 'mean_grade'], null], '#d9d9d9',
+                ['interpolate', ['linear'], ['get', 'mean_grade'], 1, 'blue', 2, 'green', 3, 'orange']
+            ],
+            'circle-radius': ['interpolate', ['linear'], ['sqrt', ['get', 'count']], 1, 6, 30, 30],
+            'circle-opacity': 0.8,
+            'circle-stroke-color': '#ffffff',
+            'circle-stroke-width': 1
+        }
+    });
+
+    map.addLayer({
+        id: 'restaurant-cluster-count',
+        type: 'symbol',
+        source: 'restaurants',
+        filter: ['==', ['get', 'cluster'], true],
+        layout: {
+            'text-field': ['to-string', ['get', 'count']],
+            'text-size': 11
+        },
+        paint: {
+            'text-color': '#ffffff'
+        }
+    });
+
+    // single restaurants use the same colors as the search page markers
+    map.addLayer({
+        id: 'restaurant-points',
+        type: 'circle',
+        source: 'restaurants',
+        filter: ['==', ['get', 'cluster'], false],
+        paint: {
+            'circle-color': [
+                'match', ['get', 'GRADE'],
+                'A', calculateColorGrade('A'),
+                'B', calculateColorGrade('B'),
+                'C', calculateColorGrade('C'),
+                calculateColorGrade(null)
+            ],
+            'circle-radius': 6,
+            'circle-stroke-color': '#ffffff',
+            'circle-stroke-width': 1
+        }
+    });
 
-    // once ready, sets the restaurantByZipcode array found in helper.js
-    await getUniqueRestaurants();
+    await updateViewport();
+});
+
+// only ask for what is visible, once the map stops moving
+map.on('moveend', updateViewport);
+map.on('zoomend', updateZipcodeGeometry);
+map.on('zoomend', updateDensity);
+
+// show the name and grade of the restaurant under the mouse
+map.on('mousemove', 'restaurant-points', (e) => {
+    const restaurant = e.features[0].properties;
+    const gradeClass = restaurant.GRADE ? `grade-${restaurant.GRADE}` : '';
+
+    isHoveringMarker = true;
+    map.getCanvas().style.cursor = 'pointer';
+    restaurant_popup
+        .setLngLat(e.features[0].geometry.coordinates)
+        .setHTML(`
+            <div class="map-popup">
+                <h6>${restaurant.DBA}</h6>
+                <p class="mb-1">Grade: <span class="${gradeClass}">${restaurant.GRADE || 'N/A'}</span></p>
+            </div>
+        `)
+        .addTo(map);
+});
+
+map.on('mouseleave', 'restaurant-points', () => {
+    isHoveringMarker = false;
+    map.getCanvas().style.cursor = '';
+    restaurant_popup.remove();
 });
 
 map.on('zoom', () => {
@@ -97,14 +269,13 @@ map.on('mousemove', 'zipcode-fill', (e) => {
     // change the mouse cursor to a pointer 🤓☝
     map.getCanvas().style.cursor = 'pointer';
 
-    // query whatever data the mouse is on
-    const response = map.queryRenderedFeatures(e.point)[0];
+    // query whatever zipcode the mouse is on (restaurant circles are drawn above it)
+    const response = map.queryRenderedFeatures(e.point, { layers: ['zipcode-fill'] })[0];
 
     // these are the properties we care about
     const properties = {
         "zipcode": response.properties.postalCode,
-        "average_grade": response.properties.MEAN,
-        "color": response.properties.COLOR
+        "average_grade": getZipcodeMean(response.properties.postalCode)
     }
 
     console.log(properties)
@@ -119,58 +290,14 @@ map.on('mousemove', 'zipcode-fill', (e) => {
         zipcode_popup.remove();
         map.getCanvas().style.cursor = '';
 
-        // only load new information if a new zipcode is hovered over, else just keep the data how it is
+        // only restyle when a new zipcode is hovered over, else just keep it how it is
         if (properties.zipcode == currentZipcode) {
-            isHoveringMarker = true;
             return;
         }
         else {
 
-            // clear and reset all old markers
-            all_restaurant_markers.forEach(marker => marker.remove());
-            all_restaurant_markers = [];
-
-            // clear and reset all old popups
-            all_restaurant_popups.forEach(popup => popup.remove());
-            all_restaurant_popups = [];
-
-            // get an array of all restaruants in the zipcode pointed to (or nothing if it doesn't exist)
-            const nearbyRestaurants = getRestaurantsByZipcode()[properties.zipcode] || [];
-
             // set the current zipcode to ensure this block of code only gets ran ONCE per zipcode 
-            currentZipcode = nearbyRestaurants[0].ZIPCODE;
-
-            // do something for each restaurant in this zipcode
-            nearbyRestaurants.forEach(restaurant => {
-
-                const gradeClass = restaurant.GRADE ? `grade-${restaurant.GRADE}` : '';
-
-                // create a popup to show the restaurants name and grade
-                const popup = new mapboxgl.Popup({
-                    'closeOnMove': false,
-                    'closeButton': false,
-                    'closeOnClick': true
-                })
-                .setHTML(`
-                    <div class="map-popup">
-                        <h6>${restaurant.DBA}</h6>
-                        <p class="mb-1">Grade: <span class="${gradeClass}">${restaurant.GRADE || 'N/A'}</span></p>
-                    </div>
-                `);
-
-                // create a marker with the same color as its grade
-                const marker = new mapboxgl.Marker({
-                    'color': calculateColorGrade(restaurant.GRADE),
-                    'scale': 0.65
-                })
-                .setLngLat([restaurant.Longitude, restaurant.Latitude])
-                .setPopup(popup)
-                .addTo(map)
-
-                // put all markers and popups in an array, we need to keep track of them so we can delete them later
-                all_restaurant_markers.push(marker);
-                all_restaurant_popups.push(popup);
-            });
+            currentZipcode = properties.zipcode;
 
             // set the background of the zipcode to be actually visible
             map.setPaintProperty("zipcode-borders", "line-width", ["match", ["get", "postalCode"], properties.zipcode, 3, 1]);
@@ -183,17 +310,8 @@ map.on('mousemove', 'zipcode-fill', (e) => {
 
 }
 
-    // clear and reset all old markers
-    all_restaurant_markers.forEach(marker => marker.remove());
-    all_restaurant_markers = [];
-
-    // clear and reset all old popups
-    all_restaurant_popups.forEach(popup => popup.remove());
-    all_restaurant_popups = [];
-
-    // reset current zipcode and don't turn off marker hovering
+    // reset current zipcode
     currentZipcode = 0;
-    isHoveringMarker = false;
 
     console.log(properties.average_grade)
 
@@ -233,11 +351,7 @@ map.on('mouseleave', 'zipcode-fill', (e) => {
         map.setPaintProperty("zipcode-borders", "line-color", "#ffffff");
         map.setPaintProperty("zipcode-fill", "fill-opacity", 0.75);
     
-        // reset all markers, popups, and the current zipcode
-        all_restaurant_markers.forEach(marker => marker.remove());
-        all_restaurant_markers = [];
-        all_restaurant_popups.forEach(popup => popup.remove());
-        all_restaurant_popups = [];
+        // reset the current zipcode
         currentZipcode = 0;
     }
     
@@ -30,7 +30,9 @@ document.addEventListener('DOMContentLoaded', function() {
         currentPage: 1,
         perPage: 10,
         searchLocation: null,
-        totalPages: 1
+        totalPages: 1,
+        total: 0,
+        nextCursor: null
     };
     let restaurantMarkers = [];
     let currentPopup = null;
@@ -53,10 +55,54 @@ document.addEventListener('DOMContentLoaded', function() {
     document.getElementById('searchForm').addEventListener('submit', async function(e) {
         e.preventDefault();
         const address = document.getElementById('searchAddress').value.trim();
-        await handleSearch(address);
+        const radius = parseFloat(document.getElementById('searchRadius').value);
+        await handleSearch(address, radius);
     });
 
-    async function handleSearch(address) {
+    // request one page of results: a new search, or the continuation of one through its cursor
+    async function fetchResults(body) {
+        const response = await fetch('/', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({ error: 'Search failed' }));
+            throw new Error(error.error || 'Search failed');
+        }
+        
+        const data = await response.json();
+        
+        if (!data.restaurants) {
+            throw new Error('Invalid data received from server');
+        }
+        return data;
+    }
+
+    // fetch further pages of the current search until the given results page is loaded
+    async function loadResultsThrough(page) {
+        while (restaurantData.allRestaurants.length < page * restaurantData.perPage && restaurantData.nextCursor) {
+            const data = await fetchResults({ cursor: restaurantData.nextCursor });
+            restaurantData.allRestaurants = restaurantData.allRestaurants.concat(data.restaurants);
+            restaurantData.nextCursor = data.next_cursor;
+        }
+    }
+
+    // inspection history of one restaurant, fetched the first time it is opened
+    async function fetchInspections(camis) {
+        if (!restaurantData.inspectionHistory[camis]) {
+            const response = await fetch(`/restaurant/${encodeURIComponent(camis)}/history`);
+            if (!response.ok) {
+                throw new Error("Couldn't get the inspection history");
+            }
+            const data = await response.json();
+            restaurantData.inspectionHistory[camis] = data.inspections;
+        }
+        return restaurantData.inspectionHistory[camis];
+    }
+
+    async function handleSearch(address, radius) {
         
         const resultsDiv = document.getElementById('results');
         const errorDiv = document.getElementById('searchError');
@@ -65,33 +111,20 @@ document.addEventListener('DOMContentLoaded', function() {
         errorDiv.innerHTML = '';
         
         try {
-            const response = await fetch('/', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ address })
-            });
-            
-            if (!response.ok) {
-                const error = await response.json().catch(() => ({ error: 'Search failed' }));
-                throw new Error(error.error || 'Search failed');
-            }
-            
-            const data = await response.json();
-            
-            if (!data.restaurants || !data.inspection_history) {
-                throw new Error('Invalid data received from server');
-            }
+            const data = await fetchResults({ address, radius });
             
             restaurantData = {
                 allRestaurants: data.restaurants,
-                inspectionHistory: data.inspection_history,
+                inspectionHistory: {},
                 currentPage: 1,
                 perPage: 10,
                 searchLocation: data.search_location,
-                totalPages: Math.ceil(data.restaurants.length / 10)
+                totalPages: Math.ceil(data.total / 10),
+                total: data.total,
+                nextCursor: data.next_cursor
             };
             
-            displayResultsPage(1);
+            await displayResultsPage(1);
             updateMap();
             
         } catch (error) {
@@ -107,7 +140,8 @@ document.addEventListener('DOMContentLoaded', function() {
         return restaurantData.allRestaurants.slice(start, end);
     }
 
-    function displayResultsPage(page) {
+    async function displayResultsPage(page) {
+        await loadResultsThrough(page);
         restaurantData.currentPage = page;
         const currentRestaurants = getCurrentPageRestaurants();
         
@@ -157,7 +191,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 </li>
             </ul>
             <div class="text-center text-muted small">
-                Page ${restaurantData.currentPage} of ${restaurantData.totalPages} (${restaurantData.allRestaurants.length} total results)
+                Page ${restaurantData.currentPage} of ${restaurantData.totalPages} (${restaurantData.total} total results)
             </div>
         </nav>
         `;
@@ -174,12 +208,17 @@ document.addEventListener('DOMContentLoaded', function() {
 
         // Add click handlers to pagination buttons
         document.querySelectorAll('.page-link').forEach(link => {
-            link.addEventListener('click', function(e) {
+            link.addEventListener('click', async function(e) {
                 e.preventDefault();
                 const page = parseInt(this.getAttribute('data-page'));
                 if (page >= 1 && page <= restaurantData.totalPages) {
-                    displayResultsPage(page);
-                    updateMap();
+                    try {
+                        await displayResultsPage(page);
+                        updateMap();
+                    } catch (error) {
+                        document.getElementById('searchError').innerHTML = `<div class="alert alert-danger">${error.message}</div>`;
+                        console.error('Search error:', error);
+                    }
                 }
             });
         });
@@ -242,6 +281,91 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Handle inspection history button clicks in popups
+    document.addEventListener('click', async function(e) {
+        if (e.target.classList.contains('view-inspections')) {
+            e.preventDefault();
+            e.stopPropagation();
+
+            const camis = e.target.getAttribute('data-camis');
+            if (!camis) return;
+
+            // Remove any existing modal first
+            const existingModal = bootstrap.Modal.getInstance(document.getElementById('inspectionModal'));
+            if (existingModal) {
+                existingModal.hide();
+                document.getElementById('inspectionModalContainer')?.remove();
+            }
+
+            let inspections;
+            try {
+                inspections = await fetchInspections(camis);
+            } catch (error) {
+                console.error('Inspection history error:', error);
+                return;
+            }
+
+            const modalContainer = document.createElement('div');
+            modalContainer.id = 'inspectionModalContainer';
+            modalContainer.innerHTML = `
+                <div class="modal fade" id="inspectionModal" tabindex="-1" aria-hidden="true">
+                    <div class="modal-dialog modal-lg modal-dialog-scrollable">
+                        <div class="modal-content">
+                            <div class="modal-header">
+                                <h5 class="modal-title">Inspection History</h5>
+                                <button type="button" class="btn-close" data-bs-dismiss="modal" aria-label="Close"></button>
+                            </div>
+                            <div class="modal-body">
+                                <table class="table table-striped">
+                                    <thead>
+                                        <tr>
+                                            <th>Date</th>
+                                            <th>Grade</th>
+                                            <th>Score</th>
+                                            <th>Violations</th>
+                                        </tr>
+                                    </thead>
+                                    <tbody>
+                                        ${inspections.map(inspection => `
+                                            <tr>
+                                                <td>${inspection.DATE || 'N/A'}</td>
+                                                <td><span class="${inspection.GRADE ? `grade-${inspection.GRADE}` : ''}">
+                                                    ${inspection.GRADE || 'N/A'}
+                                                </span></td>
+                                                <td>${inspection.SCORE || 'N/A'}</td>
+                                                <td>${inspection.VIOLATIONS || 'No violations'}</td>
+                                            </tr>
+                                        `).join('')}
+                                    </tbody>
+                                </table>
+                            </div>
+                            <div class="modal-footer">
+                                <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Close</button>
+                            </div>
+                        </div>
+                    </div>
+                </div>
+            `;
+
+            document.body.appendChild(modalContainer);
+            
+            const modal = new bootstrap.Modal(document.getElementById('inspectionModal'));
+            
+            modal._element.addEventListener('hidden.bs.modal', function() {
+                modal.dispose();
+                modalContainer.remove();
+                
+                const backdrops = document.querySelectorAll('.modal-backdrop');
+                backdrops.forEach(backdrop => backdrop.remove());
+                
+                document.body.style.overflow = 'auto';
+                document.body.style.paddingRight = '0';
+            });
+
+            modal.show();
+        }
+    });
+
     function updateMap() {
         // Clear previous markers
         restaurantMarkers.forEach(marker => marker && marker.remove());
@@ -334,85 +458,5 @@ document.addEventListener('DOMContentLoaded', function() {
         } catch (e) {
             console.error('Error fitting map bounds:', e);
         }
-        
-        // Handle inspection history button clicks in popups
-        document.addEventListener('click', function(e) {
-            if (e.target.classList.contains('view-inspections')) {
-                e.preventDefault();
-                e.stopPropagation();
-
-                const camis = e.target.getAttribute('data-camis');
-                if (!camis) return;
-
-                // Remove any existing modal first
-                const existingModal = bootstrap.Modal.getInstance(document.getElementById('inspectionModal'));
-                if (existingModal) {
-                    existingModal.hide();
-                    document.getElementById('inspectionModalContainer')?.remove();
-                }
-
-                const inspections = restaurantData.inspectionHistory[camis];
-                if (!inspections) return;
-
-                const modalContainer = document.createElement('div');
-                modalContainer.id = 'inspectionModalContainer';
-                modalContainer.innerHTML = `
-                    <div class="modal fade" id="inspectionModal" tabindex="-1" aria-hidden="true">
-                        <div class="modal-dialog modal-lg modal-dialog-scrollable">
-                            <div class="modal-content">
-                                <div class="modal-header">
-                                    <h5 class="modal-title">Inspection History</h5>
-                                    <button type="button" class="btn-close" data-bs-dismiss="modal" aria-label="Close"></button>
-                                </div>
-                                <div class="modal-body">
-                                    <table class="table table-striped">
-                                        <thead>
-                                            <tr>
-                                                <th>Date</th>
-                                                <th>Grade</th>
-                                                <th>Score</th>
-                                                <th>Violations</th>
-                                            </tr>
-                                        </thead>
-                                        <tbody>
-                                            ${inspections.map(inspection => `
-                                                <tr>
-                                                    <td>${inspection.DATE || 'N/A'}</td>
-                                                    <td><span class="${inspection.GRADE ? `grade-${inspection.GRADE}` : ''}">
-                                                        ${inspection.GRADE || 'N/A'}
-                                                    </span></td>
-                                                    <td>${inspection.SCORE || 'N/A'}</td>
-                                                    <td>${inspection.VIOLATIONS || 'No violations'}</td>
-                                                </tr>
-                                            `).join('')}
-                                        </tbody>
-                                    </table>
-                                </div>
-                                <div class="modal-footer">
-                                    <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Close</button>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-                `;
-
-                document.body.appendChild(modalContainer);
-                
-                const modal = new bootstrap.Modal(document.getElementById('inspectionModal'));
-                
-                modal._element.addEventListener('hidden.bs.modal', function() {
-                    modal.dispose();
-                    modalContainer.remove();
-                    
-                    const backdrops = document.querySelectorAll('.modal-backdrop');
-                    backdrops.forEach(backdrop => backdrop.remove());
-                    
-                    document.body.style.overflow = 'auto';
-                    document.body.style.paddingRight = '0';
-                });
-
-                modal.show();
-            }
-        });
     }
 });
\ No newline at end of file
@@ -1,3 +1,6 @@
+// average grade of each zipcode, filled in by updateZipcodes
+let zipcodeMeans = {};
+
 // return a match statement for the layer styling
 export async function updateZipcodes() {
     try {
@@ -19,6 +22,7 @@ export async function updateZipcodes() {
             const color = entry.COLOR;
 
             matchExpression.push(zipcode, color);   // add it to the expression! (its just an array)
+            zipcodeMeans[zipcode] = entry.MEAN;
         });
 
         matchExpression.push("#cccccc"); // default color for a zipcode that doesn't exist 
@@ -31,40 +35,88 @@ export async function updateZipcodes() {
 }
 
 
-// retrieve all unique restaurants, this should only be ran ONCE
-let restaurantsByZipcode = {};  // we set this global variable and then the map.js requests it when needed
-export async function getUniqueRestaurants() {
-
-    try {
-        // get an object containing all unique restaurants
-        const response = await fetch("/fetch_unique_restaurants");
-        
-        if (!response.ok) {
-            throw new Error("Couldn't get all unique restaurants from utils.js...");
-        }
-        const restaurants = await response.json();
-        
-        restaurants.forEach(restaurant => {
+// average grade of a zipcode (undefined if it has no graded restaurants)
+export function getZipcodeMean(zipcode) {
+    return zipcodeMeans[zipcode];
+}
 
-            const zipcode = restaurant.ZIPCODE;     // get the current restaurant's zipcode
+// retrieve zipcode borders simplified for a zoom level, its simplification tells which zooms it covers
+export async function fetchZipcodeGeometry(zoom) {
+    const response = await fetch(`/fetch_geoms?zoom=${Math.floor(zoom)}`);
 
-            if (!restaurantsByZipcode[zipcode]) {   // if the zipcode doesn't exist in the array yet, add it!
-                restaurantsByZipcode[zipcode] = [];
-            }
+    if (!response.ok) {
+        throw new Error("Couldn't get zipcode borders from utils.js...");
+    }
+    return await response.json();
+}
 
-            restaurantsByZipcode[zipcode].push(restaurant); // add the restaurant to the zipcode array
-        });
+// retrieve the restaurant density grid precomputed for a zoom level, as geojson cells plus the zooms it covers
+export async function fetchDensity(zoom) {
+    const response = await fetch(`/fetch_density?zoom=${Math.floor(zoom)}`);
 
-        // we don't need to return anything, all data is referenced in the restaurantsByZipcode array and retrieved later
-    }
-    catch(error) {
-        console.error(error);
+    if (!response.ok) {
+        throw new Error("Couldn't get restaurant density from utils.js...");
     }
+    const grid = await response.json();
+
+    return {
+        zooms: { min_zoom: grid.min_zoom, max_zoom: grid.max_zoom },
+        geojson: densityCells(grid)
+    };
+}
+
+// longitude and latitude of a web mercator grid corner
+function gridCorner(x, y, cellsPerSide) {
+    const lng = x / cellsPerSide * 360 - 180;
+    const lat = Math.atan(Math.sinh(Math.PI * (1 - 2 * y / cellsPerSide))) * 180 / Math.PI;
+    return [lng, lat];
 }
 
-// this function just returns the zipcode array, its kinda dumb but it works
-export function getRestaurantsByZipcode() {
-    return restaurantsByZipcode;
+// turn the parallel arrays of a density grid into one square polygon per cell
+function densityCells(grid) {
+    const features = grid.count.map((count, i) => {
+        const x = grid.x0 + grid.x[i];
+        const y = grid.y0 + grid.y[i];
+        const [west, north] = gridCorner(x, y, grid.cells_per_side);
+        const [east, south] = gridCorner(x + 1, y + 1, grid.cells_per_side);
+
+        return {
+            type: 'Feature',
+            geometry: {
+                type: 'Polygon',
+                coordinates: [[[west, north], [east, north], [east, south], [west, south], [west, north]]]
+            },
+            properties: {
+                count: count,
+                mean_score: grid.mean_score[i],
+                grade_A: grid.grade_A[i],
+                grade_B: grid.grade_B[i],
+                grade_C: grid.grade_C[i],
+                grade_other: grid.grade_other[i],
+                critical_rate: grid.critical_rate[i]
+            }
+        };
+    });
+
+    return { type: 'FeatureCollection', features: features };
+}
+
+// retrieve the clusters (zoomed out) or restaurants (zoomed in) inside the map bounds as geojson
+export async function fetchViewport(bounds, zoom, signal) {
+    const params = new URLSearchParams({
+        south: bounds.getSouth(),
+        west: bounds.getWest(),
+        north: bounds.getNorth(),
+        east: bounds.getEast(),
+        zoom: zoom
+    });
+
+    const response = await fetch(`/viewport?${params}`, { signal });
+
+    if (!response.ok) {
+        throw new Error("Couldn't get restaurants in view from utils.js...");
+    }
+    return await response.json();
 }
 
 // map each grade to a color value for the markers
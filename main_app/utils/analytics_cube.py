@@ -0,0 +1,114 @@
+"""Inspection rows pre-aggregated into a cube for the graphs page."""
+import numpy as np
+import pandas as pd
+
+# Dimensions every cell of the cube is keyed by
+DIMENSIONS = ['GROUPED_CUISINE', 'BORO', 'MONTH', 'GRADE', 'CRITICAL FLAG']
+# Measures that add up when cells are combined
+ADDITIVE_MEASURES = ['ROWS', 'SCORED', 'SCORE_SUM', 'VIOLATIONS']
+# Keys of the violation breakdown
+VIOLATION_DIMENSIONS = ['CRITICAL FLAG', 'VIOLATION CODE', 'VIOLATION DESCRIPTION']
+
+
+class AnalyticsCube:
+    """Inspection rows aggregated by cuisine group, borough, month, grade and critical flag.
+
+    Each cell holds its row, scored row and violation counts with the
+    score sum, the latest inspection date and the violations recorded on
+    it, the worst scored row, and the distinct restaurants (CAMIS) as a
+    sorted posting list, so distinct counts stay exact when cells are
+    combined. Charts group the cells instead of the raw rows, and where()
+    slices the cube for filtered dashboards. A separate breakdown counts
+    rows per violation over the whole dataset.
+    """
+
+    def __init__(self, cells, camis, camis_offsets, violations):
+        """Wrap the cell table, its restaurant postings and the violation breakdown."""
+        self.cells = cells
+        # Restaurants of cell i are camis[camis_offsets[i]:camis_offsets[i + 1]]
+        self.camis = camis
+        self.camis_offsets = camis_offsets
+        self.violations = violations
+
+    @classmethod
+    def from_frame(cls, df):
+        """Aggregate inspection rows carrying every dimension but MONTH, in one pass."""
+        dates = df['INSPECTION DATE'].to_numpy(dtype='datetime64[ns]')
+        df = df.assign(MONTH=dates.astype('datetime64[M]').astype('datetime64[ns]'))
+        groups = df.groupby(DIMENSIONS, observed=True, dropna=False)
+        cell_ids = groups.ngroup().to_numpy()
+        cells = groups.agg(
+            ROWS=('CAMIS', 'size'),
+            SCORED=('SCORE', 'count'),
+            SCORE_SUM=('SCORE', 'sum'),
+            VIOLATIONS=('VIOLATION DESCRIPTION', 'count'),
+            LAST_DATE=('INSPECTION DATE', 'max'),
+        ).reset_index()
+
+        # Violations recorded on each cell's latest inspection date
+        violated = df['VIOLATION DESCRIPTION'].notna().to_numpy()
+        on_last = violated & (dates == cells['LAST_DATE'].to_numpy()[cell_ids])
+        cells['LAST_VIOLATIONS'] = np.bincount(cell_ids[on_last], minlength=len(cells))
+
+        # Highest scored row of each cell; ties go to the first row
+        scores = df['SCORE'].to_numpy(dtype=np.float64, na_value=np.nan)
+        scored = np.flatnonzero(~np.isnan(scores))
+        order = scored[np.lexsort((scored, -scores[scored], cell_ids[scored]))]
+        first = order[np.r_[True, cell_ids[order][1:] != cell_ids[order][:-1]]] if len(order) else order
+        worst = pd.DataFrame({
+            'WORST_SCORE': df['SCORE'].to_numpy()[first],
+            'WORST_DBA': df['DBA'].to_numpy(dtype=object)[first],
+            'WORST_ROW': first,
+        }, index=cell_ids[first])
+        cells = cells.join(worst)
+        cells['WORST_SCORE'] = cells['WORST_SCORE'].astype(df['SCORE'].dtype)
+
+        # Distinct restaurants per cell
+        camis_codes = pd.factorize(df['CAMIS'])[0]
+        known = camis_codes >= 0
+        pairs = np.unique(cell_ids[known].astype(np.int64) * (camis_codes.max() + 1) + camis_codes[known])
+        pair_cells, pair_camis = np.divmod(pairs, max(camis_codes.max() + 1, 1))
+        offsets = np.searchsorted(pair_cells, np.arange(len(cells) + 1))
+
+        violations = df.groupby(VIOLATION_DIMENSIONS, observed=True, dropna=False).size().reset_index(name='ROWS')
+        return cls(cells, pair_camis.astype(np.int32), offsets.astype(np.intp), violations)
+
+    def where(self, mask):
+        """Return the cube restricted to the cells where mask is true."""
+        mask = np.asarray(mask, dtype=bool)
+        lengths = np.diff(self.camis_offsets)
+        offsets = np.concatenate([[0], np.cumsum(lengths[mask])]).astype(np.intp)
+        return AnalyticsCube(
+            self.cells[mask].reset_index(drop=True),
+            self.camis[np.repeat(mask, lengths)],
+            offsets,
+            self.violations
+        )
+
+    def totals(self, by):
+        """Sum the additive measures per group, with the distinct RESTAURANTS of each."""
+        groups = self.cells.groupby(by, observed=True)
+        totals = groups[ADDITIVE_MEASURES].sum()
+
+        # Cells with a missing key belong to no group
+        owners = np.repeat(groups.ngroup().fillna(-1).to_numpy(dtype=np.int64), np.diff(self.camis_offsets))
+        known = owners >= 0
+        size = int(self.camis.max()) + 1 if len(self.camis) else 1
+        pairs = np.unique(owners[known] * size + self.camis[known])
+        totals['RESTAURANTS'] = np.bincount(pairs // size, minlength=len(totals))
+        return totals.reset_index()
+
+    def latest(self, by):
+        """Return the latest inspection date per group and the violations recorded on it."""
+        cells = self.cells.dropna(subset=['LAST_DATE'])
+        cells = cells[cells['LAST_DATE'] == cells.groupby(by, observed=True)['LAST_DATE'].transform('max')]
+        return cells.groupby(by, observed=True).agg(
+            LAST_DATE=('LAST_DATE', 'max'),
+            LAST_VIOLATIONS=('LAST_VIOLATIONS', 'sum'),
+        ).reset_index()
+
+    def worst(self, by):
+        """Return the worst scored row of each group, highest score first."""
+        cells = self.cells.dropna(subset=['WORST_SCORE'])
+        cells = cells.sort_values(by=['WORST_SCORE', 'WORST_ROW'], ascending=[False, True], kind='stable')
+        return cells.groupby(by, observed=True).head(1)[[*by, 'WORST_DBA', 'WORST_SCORE']].reset_index(drop=True)
@@ -0,0 +1,269 @@
+"""Offline build and loading of derived data artifacts.
+
+Workers only read artifacts; `flask build-artifacts` (or
+`python -m main_app.utils.artifacts`) writes them. Each build records a
+hash of its inputs in manifest.json so unchanged inputs are not rebuilt
+and stale artifacts are never loaded.
+
+Every build writes a new snapshot directory and only then replaces the
+manifest that points to it, so a published snapshot never changes and
+running workers can load it while the next one is being built.
+
+Tables are uncompressed Arrow IPC files and arrays are .npy files, so
+both can be memory mapped and shared by every worker through the page
+cache.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import logging
+from pathlib import Path
+import numpy as np
+import pyarrow as pa
+from pyarrow import feather
+from main_app.config import FlaskConfig
+from main_app.utils.density import DENSITY_LEVELS
+from main_app.utils.geometry import GEOMETRY_LEVELS
+
+# Bump when the layout or derivation of any artifact changes
+ARTIFACT_FORMAT = 9
+
+ARTIFACT_FILES = {
+    'restaurants': 'restaurants.arrow',
+    'unique_restaurants': 'unique_restaurants.arrow',
+    'zip_means': 'zip_means.arrow',
+    'unique_restaurants_json': 'unique_restaurants.json',
+    'zip_means_json': 'zip_means.json',
+    'zip_geojson': 'zipcode_border_grades.geojson',
+    **{f'zip_geometry_{level}': f'zip_geometry_{level}.geojson' for level in range(len(GEOMETRY_LEVELS))},
+    **{f'density_{level}': f'density_{level}.json' for level in range(len(DENSITY_LEVELS))},
+    'history_records': 'history_records.arrow',
+    'history_inspections': 'history_inspections.arrow',
+    'history_offsets': 'history_offsets.npy',
+    'index_camis': 'index_camis.npy',
+    'index_lats': 'index_lats.npy',
+    'index_lons': 'index_lons.npy',
+    'index_points': 'index_points.npy',
+    'name_names': 'name_names.arrow',
+    'name_suffixes': 'name_suffixes.arrow',
+    'name_grams': 'name_grams.arrow',
+    'name_positions': 'name_positions.npy',
+    'name_offsets': 'name_offsets.npy',
+    'name_gram_names': 'name_gram_names.npy',
+    'name_gram_offsets': 'name_gram_offsets.npy',
+}
+MANIFEST_FILE = 'manifest.json'
+SNAPSHOT_PREFIX = 'snapshot-'
+
+
+def file_sha256(path):
+    """Hash a file's contents in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def inputs_hash(inputs):
+    """Hash the artifact format and the contents of every input file."""
+    digest = hashlib.sha256(f"format:{ARTIFACT_FORMAT}".encode())
+    for path in inputs:
+        digest.update(f"{Path(path).name}:{file_sha256(path)}".encode())
+    return digest.hexdigest()
+
+
+def input_stats(inputs):
+    """Return size and mtime of each input file, used as a cheap staleness check."""
+    stats = {}
+    for path in inputs:
+        stat = Path(path).stat()
+        stats[Path(path).name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return stats
+
+
+def load_manifest(artifact_dir, inputs):
+    """Return the manifest if every artifact exists and the inputs are unchanged."""
+    artifact_dir = Path(artifact_dir)
+    try:
+        manifest = json.loads((artifact_dir / MANIFEST_FILE).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        return None
+    if manifest.get('inputs') != input_stats(inputs):
+        return None
+    if not _complete(artifact_dir, manifest):
+        return None
+    return manifest
+
+
+def snapshot_path(artifact_dir, manifest):
+    """Return the snapshot directory a manifest publishes."""
+    return Path(artifact_dir) / manifest['snapshot']
+
+
+def read_artifacts(snapshot_dir, mmap=False):
+    """Load every artifact of a snapshot into the tables dict used by DataService.
+
+    Arrow files load as pyarrow Tables and .npy files as arrays; with mmap
+    both are views onto the mapped files rather than private copies.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    tables = {}
+    for name, filename in ARTIFACT_FILES.items():
+        path = snapshot_dir / filename
+        if path.suffix == '.arrow':
+            tables[name] = feather.read_table(path, memory_map=mmap)
+        elif path.suffix == '.npy':
+            tables[name] = np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        else:
+            tables[name] = path.read_bytes()
+    return tables
+
+
+def write_artifacts(artifact_dir, tables, inputs, digest, keep=FlaskConfig.ARTIFACT_KEEP):
+    """Write every artifact into a new snapshot, then the manifest that publishes it.
+
+    Only the newest keep snapshots are retained, so workers still reading
+    the previous one are not cut off.
+    """
+    artifact_dir = Path(artifact_dir)
+    artifact_dir.mkdir(parents=True, exist_ok=True)
+
+    built_at = time.gmtime()
+    snapshot_dir = Path(tempfile.mkdtemp(
+        dir=artifact_dir, prefix=f"{SNAPSHOT_PREFIX}{time.strftime('%Y%m%dT%H%M%S', built_at)}-{digest[:12]}-"
+    ))
+    try:
+        os.chmod(snapshot_dir, 0o755)
+        for name, filename in ARTIFACT_FILES.items():
+            _write_table(snapshot_dir / filename, tables[name])
+    except Exception:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        raise
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'inputs_hash': digest,
+        'inputs': input_stats(inputs),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', built_at),
+        'snapshot': snapshot_dir.name,
+        'artifacts': {
+            name: file_sha256(snapshot_dir / filename) for name, filename in ARTIFACT_FILES.items()
+        },
+    }
+    _write_manifest(artifact_dir, manifest)
+    prune_snapshots(artifact_dir, keep)
+    return manifest
+
+
+def prune_snapshots(artifact_dir, keep):
+    """Delete all but the newest keep snapshots, never the published one."""
+    artifact_dir = Path(artifact_dir)
+    try:
+        current = json.loads((artifact_dir / MANIFEST_FILE).read_text()).get('snapshot')
+    except (FileNotFoundError, ValueError):
+        current = None
+
+    snapshots = sorted(
+        (path for path in artifact_dir.glob(f"{SNAPSHOT_PREFIX}*") if path.is_dir()),
+        key=lambda path: path.stat().st_mtime_ns, reverse=True
+    )
+    for path in snapshots[max(keep, 1):]:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+    # Artifacts of the flat layout used before snapshots
+    for filename in ARTIFACT_FILES.values():
+        (artifact_dir / filename).unlink(missing_ok=True)
+
+
+def build_artifacts(data_service, force=False):
+    """Build artifacts for a DataService unless its inputs are unchanged.
+
+    Returns (manifest, built) where built is False when the existing
+    artifacts already match the input contents.
+    """
+    inputs = data_service.artifact_inputs()
+    digest = inputs_hash(inputs)
+    artifact_dir = Path(data_service.artifact_dir)
+
+    try:
+        manifest = json.loads((artifact_dir / MANIFEST_FILE).read_text())
+    except (FileNotFoundError, ValueError):
+        manifest = None
+
+    up_to_date = (
+        manifest is not None and manifest.get('format') == ARTIFACT_FORMAT and
+        manifest.get('inputs_hash') == digest and _complete(artifact_dir, manifest)
+    )
+    if up_to_date and not force:
+        # Contents match; refresh the recorded stats in case only mtimes changed
+        manifest['inputs'] = input_stats(inputs)
+        _write_manifest(artifact_dir, manifest)
+        return manifest, False
+
+    tables = data_service.build_tables()
+    return write_artifacts(artifact_dir, tables, inputs, digest), True
+
+
+def _complete(artifact_dir, manifest):
+    """Return whether the snapshot a manifest points to has every artifact."""
+    if 'snapshot' not in manifest:
+        return False
+    snapshot_dir = snapshot_path(artifact_dir, manifest)
+    return all((snapshot_dir / name).exists() for name in ARTIFACT_FILES.values())
+
+
+def _write_manifest(artifact_dir, manifest):
+    """Atomically replace the manifest, publishing the snapshot it names."""
+    atomic_write(artifact_dir / MANIFEST_FILE, lambda path: Path(path).write_text(json.dumps(manifest, indent=2)))
+
+
+def _write_table(path, table):
+    """Write an Arrow table as uncompressed Arrow IPC, an array as .npy, or raw bytes."""
+    if isinstance(table, pa.Table):
+        feather.write_feather(table, path, compression='uncompressed')
+    elif isinstance(table, np.ndarray):
+        with open(path, 'wb') as f:
+            np.save(f, table, allow_pickle=False)
+    else:
+        Path(path).write_bytes(table)
+
+
+def atomic_write(path, write):
+    """Call write(tmp_path) and move the result into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def main(argv=None):
+    """Command line entry point for building artifacts."""
+    parser = argparse.ArgumentParser(description="Build derived data artifacts for Safe-Eats.")
+    parser.add_argument('--force', action='store_true', help="rebuild even if inputs are unchanged")
+    args = parser.parse_args(argv)
+
+    from main_app.utils.data_loader import DataService
+
+    logging.basicConfig(level=logging.INFO)
+    manifest, built = build_artifacts(DataService(load=False), force=args.force)
+    status = 'Built' if built else 'Up to date'
+    print(f"{status}: artifacts for inputs {manifest['inputs_hash'][:16]}")
+
+
+if __name__ == '__main__':
+    main()
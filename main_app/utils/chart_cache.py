@@ -0,0 +1,133 @@
+"""Cache of rendered charts keyed by dataset version."""
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import logging
+from pathlib import Path
+
+
+class ChartCache:
+    """Rendered chart output held in memory and on disk per data version.
+
+    A version's entries are published together: they are written to a
+    staging directory that is renamed to <cache_dir>/<version>/, so every
+    worker and restart sees either the complete set or none of it. The
+    previous set is kept beside the newest one for pages still showing
+    it, and removed when a newer set is published. Entries of an
+    unpublished version can still be rendered one at a time and are kept
+    in memory. The salt ties entries to the code that rendered them.
+    """
+
+    def __init__(self, cache_dir, salt=''):
+        """Initialize with the directory that holds on-disk entries."""
+        self.cache_dir = Path(cache_dir)
+        self.salt = salt
+        # Entries by version, for the most recently used versions only
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def versioned(self, data_version):
+        """Return the cache version for a dataset version."""
+        return f"{data_version}-{self.salt}" if self.salt else data_version
+
+    def is_published(self, version):
+        """Return whether the complete set of version is on disk."""
+        # Versions may come from requests; only plain names inside cache_dir count
+        if not version or version.startswith('.') or Path(version).name != version:
+            return False
+        return (self.cache_dir / version).is_dir()
+
+    def latest_published(self):
+        """Return the most recently published version rendered by this code, or None."""
+        if not self.cache_dir.exists():
+            return None
+        published = [
+            entry for entry in self.cache_dir.iterdir()
+            if entry.is_dir() and not entry.name.startswith('.') and entry.name.endswith(self.salt)
+        ]
+        if not published:
+            return None
+        return max(published, key=lambda entry: entry.stat().st_mtime_ns).name
+
+    def get(self, name, version):
+        """Return the entry for name at version, or None if it is neither in memory nor published."""
+        with self._lock:
+            entries = self._memory.get(version, {})
+            if name in entries:
+                return entries[name]
+
+        value = self._read(self.cache_dir / version / f"{name}.pkl")
+        if value is not None:
+            self._remember(version, {name: value})
+        return value
+
+    def get_or_render(self, name, version, render):
+        """Return the cached output for name at version, rendering it on a miss."""
+        value = self.get(name, version)
+        if value is None:
+            value = render()
+            self._remember(version, {name: value})
+        return value
+
+    def publish(self, version, entries):
+        """Write every entry of version and make the set visible at once.
+
+        Versions older than the previous set are removed once the new set
+        is in place. Returns whether this call published the set, which is
+        False if another process got there first.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=f".{version}.", suffix='.tmp'))
+        try:
+            for name, value in entries.items():
+                with open(staging / f"{name}.pkl", 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.chmod(staging, 0o755)
+            os.rename(staging, self.cache_dir / version)
+            published = True
+        except OSError:
+            if not self.is_published(version):
+                raise
+            published = False
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self._remember(version, entries)
+        # Staging directories of other processes start with a dot and are left alone
+        older = sorted(
+            (entry for entry in self.cache_dir.iterdir()
+             if entry.is_dir() and not entry.name.startswith('.') and entry.name != version),
+            key=lambda entry: entry.stat().st_mtime_ns, reverse=True
+        )
+        for entry in older[1:]:
+            shutil.rmtree(entry, ignore_errors=True)
+        return published
+
+    def _remember(self, version, entries):
+        """Keep entries in memory, dropping all but the two most recently used versions."""
+        with self._lock:
+            self._memory[version] = {**self._memory.pop(version, {}), **entries}
+            while len(self._memory) > 2:
+                del self._memory[next(iter(self._memory))]
+
+    def _read(self, path):
+        """Load an on-disk entry, or None if it is missing or unreadable."""
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Chart cache read failed: {str(e)}")
+            return None
+
+
+def source_fingerprint(*paths):
+    """Hash the contents of source files that shape rendered output."""
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()[:12]
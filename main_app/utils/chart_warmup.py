@@ -0,0 +1,218 @@
+"""Background rendering of every chart of a dataset version."""
+import json
+import multiprocessing
+import threading
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from main_app.config import FlaskConfig
+from main_app.utils.artifacts import atomic_write
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+def _try_lock(file):
+    """Lock an open file exclusively without waiting; return whether the lock is held.
+
+    Uses flock, or msvcrt on Windows; where neither exists nothing is
+    locked and renders in other processes are not excluded.
+    """
+    if fcntl is not None:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+    elif msvcrt is not None:
+        file.seek(0)
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+    return True
+
+
+def _unlock(file):
+    """Release a lock taken by _try_lock."""
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ChartWarmUp:
+    """Renders all charts of a version concurrently and publishes them as one set.
+
+    Rendering runs on a background thread, with the charts spread over a
+    pool of spawned processes that are initialized once with the data
+    they need. One process at a time renders, holding a lock file in the
+    cache directory, and progress goes to a status file next to it so
+    every worker reports the same state. A set with failed charts is not
+    published, and the version is tried again after a delay that doubles
+    with each failure. A render pins the current dataset snapshot, so it
+    is not closed while the charts are computed from it.
+    """
+
+    def __init__(self, chart_cache, workers=FlaskConfig.CHART_WARM_UP_WORKERS, snapshots=None,
+                 retry_delay=FlaskConfig.CHART_WARM_UP_RETRY_DELAY,
+                 max_retry_delay=FlaskConfig.CHART_WARM_UP_RETRY_MAX_DELAY):
+        """Publish into chart_cache, rendering on up to workers processes (0 renders on the thread).
+
+        Renders pin a snapshot of the snapshots manager when one is given.
+        """
+        self.chart_cache = chart_cache
+        self.workers = workers
+        self.snapshots = snapshots
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lock_path = chart_cache.cache_dir / 'warm-up.lock'
+        self.status_path = chart_cache.cache_dir / 'warm-up.json'
+        self._pending = None
+        self._running = False
+        # {version: (failed attempts, monotonic time of the next attempt)}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def start(self, version, prepare):
+        """Render version in the background unless it is published or waiting to be retried here.
+
+        prepare(service) is called on the background thread with the
+        DataService pinned for the render (None without snapshots) and
+        returns (entries, jobs, initializer, initargs): entries it computed
+        itself, and {name: (function, *args)} to render in the pool, whose
+        processes first call initializer(*initargs). A newer request
+        replaces one that has not started yet.
+        """
+        with self._lock:
+            if self._backing_off(version) or self.chart_cache.is_published(version):
+                return
+            self._pending = (version, prepare)
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._run, name='chart-warm-up', daemon=True).start()
+
+    def status(self):
+        """Return the state of the latest warm-up in any process."""
+        try:
+            return json.loads(Path(self.status_path).read_text())
+        except (FileNotFoundError, ValueError):
+            return {'state': 'idle'}
+
+    def _run(self):
+        """Render pending versions until none is left."""
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._running = False
+                    return
+                version, prepare = self._pending
+                self._pending = None
+            self._render_locked(version, prepare)
+
+    def _render_locked(self, version, prepare):
+        """Render version unless another process is rendering."""
+        self.chart_cache.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock:
+            if not _try_lock(lock):
+                return
+            try:
+                with self._lock:
+                    skip = self._backing_off(version)
+                if not skip and not self.chart_cache.is_published(version):
+                    snapshot = self.snapshots.acquire() if self.snapshots is not None else None
+                    try:
+                        rendered = self._render(version, prepare, snapshot.service if snapshot else None)
+                    finally:
+                        if snapshot is not None:
+                            self.snapshots.release(snapshot)
+                    self._record(version, rendered)
+            finally:
+                _unlock(lock)
+
+    def _backing_off(self, version):
+        """Return whether version failed here and its retry delay has not passed; call holding the lock."""
+        failure = self._failures.get(version)
+        return failure is not None and time.monotonic() < failure[1]
+
+    def _record(self, version, rendered):
+        """Forget the failures of a rendered version, or schedule the next attempt of a failed one."""
+        with self._lock:
+            if rendered:
+                self._failures.pop(version, None)
+                return
+            attempts = self._failures.get(version, (0, None))[0] + 1
+            delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+            self._failures[version] = (attempts, time.monotonic() + delay)
+        logging.warning(f"Chart warm-up of {version} failed {attempts} times, retrying in {delay:.0f}s")
+
+    def _render(self, version, prepare, service):
+        """Render every entry of version and publish the set if all succeeded; return whether it was."""
+        started = time.time()
+        failed = []
+        self._report(version, 'running', 0, None, started)
+        try:
+            entries, jobs, initializer, initargs = prepare(service)
+            total = len(entries) + len(jobs)
+            self._report(version, 'running', len(entries), total, started)
+
+            if self.workers > 0:
+                pool = ProcessPoolExecutor(
+                    max_workers=min(self.workers, max(len(jobs), 1)),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=initializer,
+                    initargs=initargs
+                )
+                with pool:
+                    futures = {pool.submit(*job): name for name, job in jobs.items()}
+                    for future in as_completed(futures):
+                        name = futures[future]
+                        try:
+                            entries[name] = future.result()
+                        except Exception as e:
+                            failed.append(name)
+                            logging.error(f"Rendering chart {name} failed: {str(e)}")
+                        self._report(version, 'running', len(entries), total, started, failed)
+            else:
+                for name, (function, *args) in jobs.items():
+                    try:
+                        entries[name] = function(*args)
+                    except Exception as e:
+                        failed.append(name)
+                        logging.error(f"Rendering chart {name} failed: {str(e)}")
+                    self._report(version, 'running', len(entries), total, started, failed)
+
+            if failed:
+                self._report(version, 'failed', len(entries), total, started, failed)
+                return False
+            self.chart_cache.publish(version, entries)
+            self._report(version, 'complete', len(entries), total, started)
+            logging.info(f"Rendered {total} charts for {version} in {time.time() - started:.2f}s")
+            return True
+        except Exception as e:
+            logging.error(f"Chart warm-up failed: {str(e)}")
+            self._report(version, 'failed', 0, None, started, failed)
+            return False
+
+    def _report(self, version, state, done, total, started, failed=()):
+        """Write the warm-up status where every process can read it."""
+        status = {
+            'version': version,
+            'state': state,
+            'done': done,
+            'total': total,
+            'failed': list(failed),
+            'started': started,
+            'updated': time.time(),
+        }
+        try:
+            atomic_write(Path(self.status_path), lambda tmp_path: Path(tmp_path).write_text(json.dumps(status)))
+        except OSError as e:
+            logging.error(f"Chart warm-up status write failed: {str(e)}")
@@ -1,12 +1,37 @@
 """Restaurant data loading and spatial operations."""
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import geopandas as gpd
 from matplotlib import colors
-from scipy.spatial import cKDTree
-from geopy.distance import geodesic
+from datetime import datetime, timezone
+from functools import cached_property
+import hashlib
+import json
 import logging
+import tempfile
 from pathlib import Path
 from main_app.config import FlaskConfig
+from main_app.utils.artifacts import input_stats, load_manifest, read_artifacts, snapshot_path
+from main_app.utils.density import DENSITY_LEVELS, density_levels
+from main_app.utils.filters import FilterIndex
+from main_app.utils.geometry import GEOMETRY_LEVELS, geometry_levels
+from main_app.utils.history import InspectionHistory
+from main_app.utils.json_encoder import encode_default
+from main_app.utils.name_index import NameIndex
+from main_app.utils.payloads import Payload
+from main_app.utils.spatial_index import RestaurantIndex
+from main_app.utils.viewport import ViewportIndex
+
+# Dictionary-encoded columns with few distinct values
+CATEGORY_COLUMNS = [
+    'BORO', 'CUISINE DESCRIPTION', 'GRADE', 'VIOLATION CODE', 'VIOLATION DESCRIPTION',
+    'CRITICAL FLAG', 'ACTION', 'INSPECTION TYPE'
+]
+TEXT_COLUMNS = ['CAMIS', 'DBA', 'BUILDING', 'STREET', 'ZIPCODE', 'PHONE']
+DATE_COLUMNS = ['INSPECTION DATE', 'GRADE DATE', 'RECORD DATE']
+UNUSED_COLUMNS = ['Community Board', 'Council District', 'Census Tract', 'BIN', 'BBL', 'NTA', 'Location Point1']
 
 
 class SpatialService:
@@ -21,14 +46,7 @@ class SpatialService:
     def load_data(self):
         """Load and preprocess zipcode geojson data"""
         try:
-            parquet_path = self.data_path.with_suffix('.parquet')
-            if parquet_path.exists():
-                gdf = gpd.read_parquet(parquet_path)
-
-            else:
-                gdf = gpd.read_file(self.data_path)
-                gdf.to_parquet(parquet_path)
-            
+            gdf = gpd.read_file(self.data_path)
             gdf = self._clean_data(gdf)
             self.data = gdf
                 
@@ -45,75 +63,333 @@ class SpatialService:
 class DataService:
     """Service for restaurant data loading and queries."""
     
-    def __init__(self, data_path=None):
-        """Initialize with optional data path override."""
+    # Frames converted from the Arrow tables on first use
+    LAZY_TABLES = ('data', 'unique_restaurants', 'mean_grades', 'viewport', '_history_rows')
+    
+    def __init__(self, data_path=None, artifact_dir=None, load=True, store=None):
+        """Initialize with optional data path, artifact directory and store overrides."""
         self.data_path = data_path or (FlaskConfig.DATA_DIR / "restaurant_data.csv")
-        self.data = None
-        self.unique_restaurants = None
-        self.mean_grades = None
+        self.zipcode_path = FlaskConfig.DATA_DIR / "zipcode_border_data.geojson"
+        self.artifact_dir = artifact_dir or FlaskConfig.ARTIFACT_DIR
+        self.delta_dir = FlaskConfig.DELTA_DIR
+        self.store = store or FlaskConfig.DATA_STORE
+        self.zip_geojson = None
+        self.payloads = {}
         self.spatial_index = None
-        self.load_data()
+        self.filter_index = None
+        self.name_index = None
+        self.history = None
+        self.version = None
+        self.last_modified = None
+        self._tables = None
+        if load:
+            self.load_data()
 
     def load_data(self):
-        """Load and preprocess restaurant data."""
+        """Load prebuilt artifacts, deriving the tables in memory if they are stale."""
         try:
-            parquet_path = self.data_path.with_suffix('.parquet')
-            if parquet_path.exists():
-                df = pd.read_parquet(parquet_path)
+            manifest = load_manifest(self.artifact_dir, self.artifact_inputs())
+            if manifest is not None:
+                tables = read_artifacts(snapshot_path(self.artifact_dir, manifest), mmap=self.store == 'mmap')
+                self.version = manifest['inputs_hash'][:16]
             else:
-                df = pd.read_csv(self.data_path, dtype=self._get_dtypes())
-                df.to_parquet(parquet_path)
-            
-            """Set Data"""
-            df = self._clean_data(df)
-            valid_coords = df[['Latitude', 'Longitude']].dropna().values
-            self.spatial_index = cKDTree(valid_coords)
-            self.data = df
-            
-            """Get the most recent record of each restaurant"""
-            df = self._get_unique(df)
-            self.unique_restaurants = df.to_dict(orient='records')
+                logging.warning("Data artifacts missing or stale, deriving in memory; run `flask build-artifacts`")
+                tables = self.build_tables()
+                stats = input_stats(self.artifact_inputs())
+                self.version = hashlib.sha1(json.dumps(stats, sort_keys=True).encode()).hexdigest()[:16]
             
-            """Get the mean restaurant grade of each zipcode"""
-            df = self._get_means(df)
-            self.mean_grades = df.to_dict(orient='records')
+            self.last_modified = datetime.fromtimestamp(
+                max(Path(path).stat().st_mtime for path in self.artifact_inputs()), timezone.utc
+            )
+            self._set_tables(tables)
             
         except Exception as e:
             logging.error(f"Data loading failed: {str(e)}")
             raise
 
-    def _get_dtypes(self):
-        """Return column dtype specifications."""
+    def artifact_inputs(self):
+        """Return the source files every derived artifact depends on."""
+        return [self.data_path, self.zipcode_path, *self.delta_paths()]
+
+    def delta_paths(self):
+        """Return ingested delta files in the order they apply."""
+        return sorted(Path(self.delta_dir).glob(f"{self.data_path.stem}.delta-*.csv"))
+
+    def read_source(self, path):
+        """Read a source or delta CSV into the normalized schema."""
+        return self._normalize(pd.read_csv(path, dtype=self._get_dtypes()))
+
+    def build_tables(self):
+        """Derive every table from the source files without writing anything."""
+        df = self.read_source(self.data_path)
+        for path in self.delta_paths():
+            df = self._merge_delta(df, self.read_source(path))
+        
+        searchable = self._clean_data(df)
+        history = InspectionHistory.from_frame(searchable)
+        unique = self._get_unique(searchable)
+        means = self._get_means(unique.copy())
+        zipcodes = SpatialService(self.zipcode_path).data
+        
+        return {
+            **self._derived_tables(pa.Table.from_pandas(df, preserve_index=False), history, unique, means, zipcodes),
+            **{f'zip_geometry_{level}': geojson for level, geojson in enumerate(geometry_levels(zipcodes))},
+        }
+
+    def apply_delta(self, tables, delta):
+        """Merge delta rows into previously derived tables.
+
+        Only the restaurants, names and zipcodes the delta touches are
+        derived again from pandas; everything else is carried over as Arrow
+        data. The per-restaurant indexes, density grids and JSON payloads
+        are then rebuilt from the merged history in one vectorized pass.
+        """
+        old = tables['restaurants']
+        restaurants = self._merge_table(old, delta)
+        
+        # Restaurants with new or replaced inspections
+        camis = set(delta['CAMIS'].dropna())
+        history = InspectionHistory(
+            tables['index_camis'], tables['history_offsets'],
+            tables['history_records'], tables['history_inspections']
+        ).updated(InspectionHistory.from_frame(self._clean_data(self._rows(restaurants, 'CAMIS', camis))), camis)
+        
+        # Names whose latest record may have changed
+        names = set(self._rows(old, 'CAMIS', camis)['DBA'].dropna()) | set(delta['DBA'].dropna())
+        unique = tables['unique_restaurants'].to_pandas()
+        changed = self._get_unique(self._clean_data(self._rows(restaurants, 'DBA', names)))
+        
+        # Zipcodes whose mean may have changed
+        zips = set(self._zip_keys(unique.loc[unique['DBA'].isin(names), 'ZIPCODE'])) | set(self._zip_keys(changed['ZIPCODE']))
+        unique = self._concat([unique[~unique['DBA'].isin(names)], changed]).sort_values(by='DBA', kind='stable')
+        means = tables['zip_means'].to_pandas()
+        means = self._concat([
+            means[~means['ZIPCODE'].isin(zips)],
+            self._get_means(unique[self._zip_keys(unique['ZIPCODE']).isin(zips)].copy())
+        ]).sort_values(by='ZIPCODE', kind='stable')
+        
+        return {
+            **tables,
+            **self._derived_tables(restaurants, history, unique, means, SpatialService(self.zipcode_path).data),
+        }
+
+    def _merge_delta(self, df, delta):
+        """Replace every inspection (CAMIS, INSPECTION DATE) present in delta with its rows."""
+        keys = pd.MultiIndex.from_frame(delta[['CAMIS', 'INSPECTION DATE']])
+        replaced = pd.MultiIndex.from_frame(df[['CAMIS', 'INSPECTION DATE']]).isin(keys)
+        return self._concat([df[~replaced], delta])
+
+    def _merge_table(self, table, delta):
+        """Replace every inspection present in delta with its rows in a restaurants Arrow table.
+
+        Only the rows of restaurants in delta are compared; the others are
+        carried over as Arrow data without converting them to pandas.
+        Dictionary indices are widened so merged categories cannot overflow.
+        """
+        camis = pa.array(delta['CAMIS'].dropna().unique(), type=table.schema.field('CAMIS').type)
+        positions = np.flatnonzero(pc.is_in(table.column('CAMIS'), value_set=camis).to_numpy(zero_copy_only=False))
+        candidates = table.select(['CAMIS', 'INSPECTION DATE']).take(positions).to_pandas()
+        keys = pd.MultiIndex.from_frame(delta[['CAMIS', 'INSPECTION DATE']].astype({'CAMIS': object}))
+        keep = np.ones(table.num_rows, dtype=bool)
+        keep[positions[pd.MultiIndex.from_frame(candidates.astype({'CAMIS': object})).isin(keys)]] = False
+        
+        schema = pa.schema([
+            field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+            if pa.types.is_dictionary(field.type) else field
+            for field in table.schema
+        ], metadata=table.schema.metadata)
+        added = pa.Table.from_pandas(delta.reindex(columns=table.column_names), schema=schema, preserve_index=False)
+        return pa.concat_tables([
+            table.filter(keep).cast(schema), added.replace_schema_metadata(schema.metadata)
+        ]).unify_dictionaries()
+
+    def _rows(self, table, column, values):
+        """Return the rows of an Arrow table whose column is one of values as a frame."""
+        value_set = pa.array(list(values), type=table.schema.field(column).type)
+        return table.filter(pc.is_in(table.column(column), value_set=value_set)).to_pandas()
+
+    def _concat(self, frames):
+        """Concatenate frames with the dtypes of the first, rebuilding categories from the values present.
+
+        Columns are aligned before concatenating so an all-NA column in a
+        later frame neither changes the result dtype nor warns.
+        """
+        first = frames[0].astype({column: object for column in CATEGORY_COLUMNS if column in frames[0].columns})
+        frames = [first] + [
+            frame.astype({column: first[column].dtype for column in frame.columns if column in first.columns})
+            for frame in frames[1:]
+        ]
+        merged = pd.concat(frames, ignore_index=True)
+        for column in CATEGORY_COLUMNS:
+            if column in merged.columns:
+                merged[column] = merged[column].astype('category')
+        return merged
+
+    def _derived_tables(self, restaurants, history, unique, means, zipcodes):
+        """Assemble the artifact tables that follow from the merged restaurants table."""
+        lats = history.records.column('Latitude').to_numpy()
+        lons = history.records.column('Longitude').to_numpy()
+        index = RestaurantIndex(history.camis, lats, lons)
+        names = NameIndex.from_names(history.records.column('DBA').to_numpy(zero_copy_only=False))
+        density = density_levels(
+            lats, lons, history.records.column('GRADE').to_numpy(zero_copy_only=False),
+            history.records.column('SCORE').to_numpy(zero_copy_only=False),
+            history.records.column('CRITICAL').to_numpy(zero_copy_only=False)
+        )
+        unique_table = pa.Table.from_pandas(unique, preserve_index=False)
+        means_table = pa.Table.from_pandas(means, preserve_index=False)
+        
         return {
-            'CAMIS': 'string', 'DBA': 'string', 'BORO': 'string',
-            'BUILDING': 'string', 'STREET': 'string', 'ZIPCODE': 'string',
-            'PHONE': 'string', 'CUISINE DESCRIPTION': 'string',
-            'VIOLATION DESCRIPTION': 'string', 'GRADE': 'string',
-            'SCORE': 'float32', 'Latitude': 'float32', 'Longitude': 'float32',
-            'INSPECTION DATE': 'string'
+            'restaurants': restaurants,
+            'unique_restaurants': unique_table,
+            'zip_means': means_table,
+            'unique_restaurants_json': self._to_json(self._records(unique_table)),
+            'zip_means_json': self._to_json(self._records(means_table)),
+            'zip_geojson': self._get_zip_geojson(means, zipcodes),
+            'history_records': history.records,
+            'history_inspections': history.inspection_rows,
+            'history_offsets': history.offsets,
+            'index_camis': history.camis,
+            'index_lats': lats,
+            'index_lons': lons,
+            'index_points': index.points,
+            'name_names': names.name_table,
+            'name_suffixes': names.suffix_table,
+            'name_grams': names.gram_table,
+            'name_positions': names.positions,
+            'name_offsets': names.offsets,
+            'name_gram_names': names.gram_names,
+            'name_gram_offsets': names.gram_offsets,
+            **{f'density_{level}': grid for level, grid in enumerate(density)},
         }
 
+    def _set_tables(self, tables):
+        """Publish loaded or derived tables on the service."""
+        for name in self.LAZY_TABLES:
+            self.__dict__.pop(name, None)
+        self._tables = tables
+        
+        self.history = InspectionHistory(
+            tables['index_camis'], tables['history_offsets'],
+            tables['history_records'], tables['history_inspections']
+        )
+        self.spatial_index = RestaurantIndex(
+            tables['index_camis'], tables['index_lats'], tables['index_lons'],
+            points=tables['index_points']
+        )
+        self.filter_index = FilterIndex(self.history)
+        self.name_index = NameIndex(
+            tables['name_names'], tables['name_suffixes'], tables['name_grams'],
+            tables['name_positions'], tables['name_offsets'],
+            tables['name_gram_names'], tables['name_gram_offsets']
+        )
+        self.zip_geojson = tables['zip_geojson']
+        self.payloads = {
+            name: Payload(tables[key], last_modified=self.last_modified)
+            for name, key in (
+                ('unique_restaurants', 'unique_restaurants_json'),
+                ('zip_means', 'zip_means_json'),
+                ('zip_geojson', 'zip_geojson'),
+                *((f'zip_geometry_{level}', f'zip_geometry_{level}') for level in range(len(GEOMETRY_LEVELS))),
+                *((f'density_{level}', f'density_{level}') for level in range(len(DENSITY_LEVELS))),
+            )
+        }
+
+    def close(self):
+        """Drop the tables so their memory and mapped files can be released."""
+        for name in self.LAZY_TABLES:
+            self.__dict__.pop(name, None)
+        self._tables = None
+        self.payloads = {}
+        self.history = None
+        self.spatial_index = None
+        self.filter_index = None
+        self.name_index = None
+        self.zip_geojson = None
+
+    @cached_property
+    def data(self):
+        """Full inspection table as a pandas frame."""
+        return self._tables['restaurants'].to_pandas()
+
+    @cached_property
+    def unique_restaurants(self):
+        """Most recent record of each restaurant as a list of dicts."""
+        return self._records(self._tables['unique_restaurants'])
+
+    @cached_property
+    def mean_grades(self):
+        """Mean grade and color per zipcode as a list of dicts."""
+        return self._records(self._tables['zip_means'])
+
+    @cached_property
+    def viewport(self):
+        """Viewport index over the unique restaurants for the heat map."""
+        return ViewportIndex(
+            self._tables['unique_restaurants'],
+            cluster_max_zoom=FlaskConfig.VIEWPORT_CLUSTER_MAX_ZOOM,
+            max_points=FlaskConfig.VIEWPORT_MAX_POINTS
+        )
+
+    @cached_property
+    def _history_rows(self):
+        """Searchable inspection rows in history order."""
+        return self._clean_data(self.data).sort_values(
+            by=['CAMIS', 'INSPECTION DATE'], ascending=[True, False], kind='stable'
+        ).reset_index(drop=True)
+
+    def _records(self, table):
+        """Convert a table to records with None for missing values."""
+        df = table.to_pandas().astype(object)
+        return df.where(df.notna(), None).to_dict(orient='records')
+
+    def _to_json(self, records):
+        """Serialize records once into response bytes."""
+        return json.dumps(records, default=encode_default).encode('utf-8')
+
+    def _get_dtypes(self):
+        """Return column dtype specifications for reading the CSV."""
+        dtypes = {column: 'string' for column in TEXT_COLUMNS + DATE_COLUMNS}
+        dtypes.update({column: 'string' for column in CATEGORY_COLUMNS})
+        dtypes.update({'SCORE': 'float32', 'Latitude': 'float32', 'Longitude': 'float32'})
+        return dtypes
+
+    def _normalize(self, df):
+        """Convert to the shared compact schema used by search and analytics."""
+        df = df.drop(columns=[column for column in UNUSED_COLUMNS if column in df.columns])
+        
+        for column in TEXT_COLUMNS + CATEGORY_COLUMNS:
+            if column in df.columns:
+                values = df[column].astype('string')
+                df[column] = values.mask(values.str.fullmatch(r'\s*', na=False))
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], errors='coerce')
+        
+        return df.astype({
+            **{column: 'category' for column in CATEGORY_COLUMNS if column in df.columns},
+            **{column: 'float32' for column in ('SCORE', 'Latitude', 'Longitude')}
+        })
+
     def _clean_data(self, df):
-        """Clean and filter raw data."""
-        df = df.replace(r'^\s*$', None, regex=True)
+        """Filter rows usable for location search."""
         df = df.dropna(subset=['Latitude', 'Longitude', 'DBA'])
         nyc_bbox = (40.4, -74.5, 41.0, -73.5)
         df = df[
             (df['Latitude'].between(nyc_bbox[0], nyc_bbox[2])) & 
             (df['Longitude'].between(nyc_bbox[1], nyc_bbox[3]))
         ]
-        df['INSPECTION DATE'] = pd.to_datetime(df['INSPECTION DATE'], errors='coerce')
         return df[df['INSPECTION DATE'] > pd.to_datetime('2000-01-01')]
     
     def _get_unique(self, df):
         """Get the most recent record of each restaurant"""
         df = df[['DBA', 'BORO', 'ZIPCODE', 'CUISINE DESCRIPTION', 'INSPECTION DATE', 'GRADE', 'Latitude', 'Longitude']]
-        df = df.sort_values(by='INSPECTION DATE', ascending=False)
+        df = df.sort_values(by='INSPECTION DATE', ascending=False, kind='stable')
         df = df.drop_duplicates(subset=['DBA'], keep='first')
-        return df.sort_values(by='DBA', ascending=True)
+        return df.sort_values(by='DBA', ascending=True, kind='stable')
     
     def _get_means(self, df: pd.DataFrame):
-        """Get mean restaurant grade per zipcode and update spatial data"""
+        """Get mean restaurant grade and color per zipcode"""
         grade_to_value = {
             'A': 1,
             'B': 2,
@@ -124,12 +400,7 @@ class DataService:
         df['GRADE'] = df['GRADE'].str.upper()
         df = df[df['GRADE'].isin(['A', 'B', 'C'])]
         means_df = df[['ZIPCODE', 'GRADE']].copy()
-        means_df['ZIPCODE'] = (
-            means_df['ZIPCODE']
-            .astype(str)
-            .str.extract(r'(\d+)')[0]
-            .str.zfill(5)
-        )
+        means_df['ZIPCODE'] = self._zip_keys(means_df['ZIPCODE'])
         means_df['MEAN'] = means_df['GRADE'].map(grade_to_value)
         means_df = means_df.groupby('ZIPCODE')['MEAN'].mean().reset_index()
         
@@ -143,31 +414,56 @@ class DataService:
         # Convert all to str to make types more consistent
         means_df = means_df.astype(str)
                 
-        # Merge with zipcode geoms and export
-        spatial_service = SpatialService()
-        spatial_df = spatial_service.data.merge(
+        return means_df
+    
+    def _zip_keys(self, zipcodes):
+        """Normalize zipcodes to the five-digit keys used for zip means"""
+        return zipcodes.astype(str).str.extract(r'(\d+)')[0].str.zfill(5)
+    
+    def _get_zip_geojson(self, means_df, zipcodes):
+        """Merge zip means into the zipcode geometries as GeoJSON bytes"""
+        spatial_df = zipcodes.merge(
             means_df, left_on='postalCode', right_on='ZIPCODE', how='left'
         )
         
         spatial_df.drop(columns=['ZIPCODE'], inplace=True)
-        spatial_df.to_file(FlaskConfig.DATA_DIR / "zipcode_border_grades.geojson", driver='GeoJSON')
-        
-        return means_df
-        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "zipcode_border_grades.geojson"
+            spatial_df.to_file(path, driver='GeoJSON')
+            return path.read_bytes()
+
+    def query_nearby(self, lat, lon, max_distance=1, filters=None):
+        """Return (positions, distances) of matching restaurants within max_distance miles."""
+        return self.spatial_index.query_radius(lat, lon, max_distance, mask=self.filter_index.mask(filters))
+
+    def query_nearest(self, lat, lon, k, filters=None):
+        """Return (positions, distances) of the k closest matching restaurants."""
+        return self.spatial_index.query_nearest(lat, lon, k, mask=self.filter_index.mask(filters))
+
+    def query_nearby_many(self, lats, lons, max_distance=1, filters=None):
+        """Return (positions, distances) of matching restaurants within max_distance miles of each origin."""
+        return self.spatial_index.query_radius_many(lats, lons, max_distance, mask=self.filter_index.mask(filters))
+
+    def query_nearest_many(self, lats, lons, k, filters=None):
+        """Return (positions, distances) of the k closest matching restaurants to each origin."""
+        return self.spatial_index.query_nearest_many(lats, lons, k, mask=self.filter_index.mask(filters))
+
+    def search_names(self, query, limit=10):
+        """Return (positions, similarities) of restaurants best matching a name."""
+        return self.name_index.search(query, limit=limit)
+
     def get_nearby_restaurants(self, lat, lon, max_distance=1):
         """Find restaurants within max_distance miles."""
-        # Get initial nearby restaurants
-        if self.spatial_index:
-            radius_deg = max_distance / 69  # Approximate degrees per mile
-            idx = self.spatial_index.query_ball_point([lat, lon], radius_deg)
-            nearby = self.data.iloc[idx].copy()
-        else:
-            nearby = self.data.copy()
-        
-        nearby['distance'] = [
-            geodesic((lat, lon), (row['Latitude'], row['Longitude'])).miles
-             for _, row in nearby.iterrows()
-         ]
-        
-        # Filter and return
-        return nearby[nearby['distance'] <= max_distance].copy()
\ No newline at end of file
+        return self._rows_for(*self.query_nearby(lat, lon, max_distance))
+
+    def get_nearest_restaurants(self, lat, lon, k):
+        """Find the k closest restaurants regardless of distance."""
+        return self._rows_for(*self.query_nearest(lat, lon, k))
+
+    def _rows_for(self, positions, distances):
+        """Return inspection rows for indexed restaurants with their distance."""
+        rows = self.history.row_positions(positions)
+        counts = self.history.offsets[positions + 1] - self.history.offsets[positions]
+        nearby = self._history_rows.iloc[rows].copy()
+        nearby['distance'] = np.repeat(distances, counts)
+        return nearby
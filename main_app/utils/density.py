@@ -0,0 +1,83 @@
+"""Restaurant density grids at several map resolutions."""
+import json
+import numpy as np
+from main_app.utils.viewport import CELLS_PER_TILE, web_mercator
+
+# (min zoom, grid zoom): cells are a quarter tile at the grid zoom, so
+# about 16px on screen at the level's min zoom and 64px two zooms later
+DENSITY_LEVELS = (
+    (0, 12),
+    (12, 14),
+    (14, 16),
+)
+# Grade distribution columns; any other grade or none counts as 'other'
+DENSITY_GRADES = ('A', 'B', 'C')
+
+
+def density_level_for_zoom(zoom):
+    """Return the index of the density grid to draw at a zoom."""
+    level = 0
+    for i, (min_zoom, _) in enumerate(DENSITY_LEVELS):
+        if zoom >= min_zoom:
+            level = i
+    return level
+
+
+def density_levels(lats, lons, grades, scores, critical):
+    """Aggregate restaurants into square Web Mercator grids, serialized once per level.
+
+    Each level is one JSON object of parallel arrays with an entry per
+    non-empty cell: its column and row relative to x0 and y0 on a grid of
+    cells_per_side cells across the world, the restaurant count, mean
+    score, grade counts and the share of restaurants whose latest
+    inspection had a critical violation. Payload size follows the number
+    of occupied cells, not the number of restaurants.
+    """
+    x, y = web_mercator(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+    grades = np.asarray(grades, dtype=object)
+    grade_codes = np.full(len(grades), len(DENSITY_GRADES), dtype=np.intp)
+    for code, grade in enumerate(DENSITY_GRADES):
+        grade_codes[grades == grade] = code
+    scores = np.asarray(scores, dtype=np.float64)
+    scored = ~np.isnan(scores)
+    critical = np.asarray(critical, dtype=bool)
+
+    levels = []
+    for i, (min_zoom, grid_zoom) in enumerate(DENSITY_LEVELS):
+        size = 2 ** grid_zoom * CELLS_PER_TILE
+        columns = np.clip(np.floor(x * size), 0, size - 1).astype(np.int64)
+        rows = np.clip(np.floor(y * size), 0, size - 1).astype(np.int64)
+        keys, cell = np.unique(rows * size + columns, return_inverse=True)
+        cell = cell.ravel()
+        n_cells = len(keys)
+
+        counts = np.bincount(cell, minlength=n_cells)
+        score_counts = np.bincount(cell[scored], minlength=n_cells)
+        score_sums = np.bincount(cell[scored], scores[scored], n_cells)
+        means = np.round(score_sums / np.maximum(score_counts, 1), 1)
+        grade_counts = np.bincount(
+            cell * (len(DENSITY_GRADES) + 1) + grade_codes, minlength=n_cells * (len(DENSITY_GRADES) + 1)
+        ).reshape(n_cells, len(DENSITY_GRADES) + 1)
+        critical_rates = np.round(np.bincount(cell[critical], minlength=n_cells) / np.maximum(counts, 1), 3)
+
+        cell_rows, cell_columns = np.divmod(keys, size)
+        x0 = int(cell_columns.min()) if n_cells else 0
+        y0 = int(cell_rows.min()) if n_cells else 0
+        max_zoom = DENSITY_LEVELS[i + 1][0] if i + 1 < len(DENSITY_LEVELS) else None
+        grid = {
+            'level': i,
+            'min_zoom': min_zoom,
+            'max_zoom': max_zoom,
+            'cells_per_side': size,
+            'x0': x0,
+            'y0': y0,
+            'x': (cell_columns - x0).tolist(),
+            'y': (cell_rows - y0).tolist(),
+            'count': counts.tolist(),
+            'mean_score': [mean if n else None for mean, n in zip(means.tolist(), score_counts.tolist())],
+            **{f'grade_{grade}': grade_counts[:, code].tolist() for code, grade in enumerate(DENSITY_GRADES)},
+            'grade_other': grade_counts[:, len(DENSITY_GRADES)].tolist(),
+            'critical_rate': critical_rates.tolist(),
+        }
+        levels.append(json.dumps(grid, separators=(',', ':')).encode('utf-8'))
+    return levels
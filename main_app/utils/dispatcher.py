@@ -0,0 +1,104 @@
+"""Rate-limited, coalescing dispatch of upstream geocoding calls."""
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import queue
+import sqlite3
+import threading
+import time
+import logging
+
+
+class GeocoderBusyError(Exception):
+    """Raised when a geocode cannot be answered within the allowed wait."""
+
+
+class SharedRateLimiter:
+    """Minimum delay between upstream calls across all worker processes."""
+
+    def __init__(self, path, min_delay=1.0, name='nominatim'):
+        """Coordinate call slots through a SQLite table at path."""
+        self.path = str(path)
+        self.min_delay = min_delay
+        self.name = name
+
+    def wait(self):
+        """Reserve the next call slot and sleep until it arrives."""
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_limits (name TEXT PRIMARY KEY, next_at REAL)')
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT next_at FROM rate_limits WHERE name = ?', (self.name,)).fetchone()
+            now = time.time()
+            slot = max(now, row[0] if row else 0.0)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits VALUES (?, ?)', (self.name, slot + self.min_delay)
+            )
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class GeocodeDispatcher:
+    """Single upstream queue with singleflight lookups and bounded waits.
+
+    All upstream calls run on one background thread behind the rate limiter,
+    so request threads only wait on a future. Concurrent lookups for the same
+    key share one in-flight call.
+    """
+
+    def __init__(self, fetch, rate_limiter, max_queue=32):
+        """Dispatch fetch(query) calls through rate_limiter."""
+        self._fetch = fetch
+        self._rate_limiter = rate_limiter
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def lookup(self, key, query, timeout):
+        """Return fetch(query), sharing any in-flight call for key."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                expected_wait = self._queue.qsize() * self._rate_limiter.min_delay
+                if expected_wait > timeout:
+                    raise GeocoderBusyError("Geocoding service is busy, please retry shortly")
+
+                future = Future()
+                try:
+                    self._queue.put_nowait((key, query, future))
+                except queue.Full:
+                    raise GeocoderBusyError("Geocoding service is busy, please retry shortly")
+                self._inflight[key] = future
+                self._ensure_worker()
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise GeocoderBusyError("Geocoding service is busy, please retry shortly")
+
+    def pending(self):
+        """Return the number of queued upstream calls."""
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        """Start the upstream thread, also after a fork into a new worker."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='geocode-dispatcher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Serve queued lookups one at a time behind the rate limiter."""
+        while True:
+            key, query, future = self._queue.get()
+            try:
+                self._rate_limiter.wait()
+                future.set_result(self._fetch(query))
+            except Exception as e:
+                logging.error(f"Geocode dispatch error: {str(e)}")
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
@@ -0,0 +1,47 @@
+"""Vectorized distance calculations for restaurant search."""
+import numpy as np
+from geopy.distance import geodesic
+
+EARTH_RADIUS_MILES = 3958.7613
+
+# Haversine on a sphere differs from the WGS-84 ellipsoid by at most ~0.5%
+BOUNDARY_TOLERANCE = 0.005
+
+
+def haversine_miles(lat, lon, lats, lons):
+    """Return great-circle miles from (lat, lon) to each point in the arrays.
+
+    lat and lon may also be arrays, one origin per point.
+    """
+    lat1 = np.radians(np.asarray(lat, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distances_within(lat, lon, lats, lons, max_distance, exact=True):
+    """Return (distances, mask) of points within max_distance miles.
+
+    With exact=True, points whose haversine distance lands within the
+    spherical error band around the radius are recomputed on the ellipsoid
+    so the cutoff matches geodesic results. lat and lon may be arrays
+    with one origin per point.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    distances = haversine_miles(lat, lon, lats, lons)
+
+    if exact and len(distances):
+        band = max_distance * BOUNDARY_TOLERANCE
+        boundary = np.flatnonzero(np.abs(distances - max_distance) <= band)
+        origin_lats = np.broadcast_to(lat, distances.shape)
+        origin_lons = np.broadcast_to(lon, distances.shape)
+        for i in boundary:
+            distances[i] = geodesic((origin_lats[i], origin_lons[i]), (lats[i], lons[i])).miles
+
+    return distances, distances <= max_distance
@@ -0,0 +1,108 @@
+"""Attribute filters for restaurant search backed by precomputed bitmaps."""
+import numpy as np
+import pandas as pd
+
+# Filters matching any of several values of a categorical record field
+CATEGORY_FILTERS = {
+    'cuisine': 'CUISINE_DESCRIPTION',
+    'grade': 'GRADE',
+    'boro': 'BORO',
+}
+FILTER_NAMES = [*CATEGORY_FILTERS, 'critical', 'min_score', 'max_score', 'inspected_since']
+
+
+def parse_filters(params):
+    """Validate request filter parameters, raising ValueError for bad ones."""
+    if not params:
+        return {}
+    if not isinstance(params, dict):
+        raise ValueError("filters must be an object")
+    unknown = sorted(set(params) - set(FILTER_NAMES))
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(unknown)}")
+
+    filters = {}
+    for name in CATEGORY_FILTERS:
+        values = params.get(name)
+        if values is None:
+            continue
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise ValueError(f"{name} must be a string or a list of strings")
+        filters[name] = values
+
+    if params.get('critical') is not None:
+        if not isinstance(params['critical'], bool):
+            raise ValueError("critical must be true or false")
+        filters['critical'] = params['critical']
+    for name in ('min_score', 'max_score'):
+        if params.get(name) is not None:
+            try:
+                # float() would take true and false as 1 and 0
+                if isinstance(params[name], bool):
+                    raise TypeError
+                filters[name] = float(params[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be a number")
+            if not np.isfinite(filters[name]):
+                raise ValueError(f"{name} must be a number")
+    if params.get('inspected_since') is not None:
+        try:
+            inspected_since = pd.Timestamp(params['inspected_since'])
+        except (TypeError, ValueError):
+            raise ValueError("inspected_since must be a date")
+        # Empty and missing-value strings parse to NaT, which no date compares to
+        if pd.isna(inspected_since):
+            raise ValueError("inspected_since must be a date")
+        filters['inspected_since'] = inspected_since.to_datetime64()
+    return filters
+
+
+class FilterIndex:
+    """Boolean masks over restaurant positions for every filterable value.
+
+    Masks line up with the inspection history and spatial index, so a
+    filtered search ANDs a few masks once and indexes the result with the
+    spatial candidates. Category values match case-insensitively.
+    """
+
+    def __init__(self, history):
+        """Precompute masks from each restaurant's latest record."""
+        records = history.records
+        self.size = len(history)
+        self.bitmaps = {}
+        for name, field in CATEGORY_FILTERS.items():
+            keys = pd.Series(records.column(field).to_numpy(zero_copy_only=False), dtype=object).str.casefold()
+            codes, values = pd.factorize(keys)
+            self.bitmaps[name] = {value: codes == code for code, value in enumerate(values)}
+
+        self.critical = records.column('CRITICAL').to_numpy(zero_copy_only=False).astype(bool)
+        self.scores = records.column('SCORE').to_numpy(zero_copy_only=False).astype(np.float64)
+        latest_dates = history.inspection_rows.column('DATE').take(history.offsets[:-1])
+        self.inspected = pd.to_datetime(latest_dates.to_numpy(zero_copy_only=False)).to_numpy()
+
+    def mask(self, filters):
+        """Return a mask of restaurants matching every filter, or None without filters."""
+        if not filters:
+            return None
+
+        mask = np.ones(self.size, dtype=bool)
+        for name in CATEGORY_FILTERS:
+            if name in filters:
+                selected = np.zeros(self.size, dtype=bool)
+                for value in filters[name]:
+                    bitmap = self.bitmaps[name].get(value.casefold())
+                    if bitmap is not None:
+                        selected |= bitmap
+                mask &= selected
+        if 'critical' in filters:
+            mask &= self.critical == filters['critical']
+        # Unscored restaurants (NaN) fail both bounds
+        if 'min_score' in filters:
+            mask &= self.scores >= filters['min_score']
+        if 'max_score' in filters:
+            mask &= self.scores <= filters['max_score']
+        if 'inspected_since' in filters:
+            mask &= self.inspected >= filters['inspected_since']
+        return mask
@@ -0,0 +1,127 @@
+"""Persistent geocode cache shared across worker processes."""
+import re
+import sqlite3
+import threading
+import time
+import logging
+
+
+def normalize_address(address):
+    """Normalize an address into a cache key."""
+    address = re.sub(r'[.,#]', ' ', str(address).lower())
+    return re.sub(r'\s+', ' ', address).strip()
+
+
+class GeocodeCache:
+    """SQLite-backed geocode cache with TTLs, negative entries and LRU size eviction.
+
+    Reads refresh an entry's accessed_at at most once per touch_interval
+    seconds, so hits rarely write. Expired and least recently used entries
+    are evicted every evict_every writes of a process rather than on each
+    one, so the table may briefly exceed max_entries by that many rows.
+    """
+
+    def __init__(self, path, hit_ttl=30 * 86400, miss_ttl=86400, max_entries=100000,
+                 evict_every=500, touch_interval=3600):
+        """Open (or create) the cache database at path."""
+        self.path = str(path)
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS geocodes ('
+            'key TEXT PRIMARY KEY, lat REAL, lon REAL, expires_at REAL, created_at REAL, accessed_at REAL)'
+        )
+        # Caches created before LRU eviction lack accessed_at
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(geocodes)')]
+        if 'accessed_at' not in columns:
+            try:
+                conn.execute('ALTER TABLE geocodes ADD COLUMN accessed_at REAL')
+                conn.execute('UPDATE geocodes SET accessed_at = created_at')
+            except sqlite3.OperationalError:
+                pass  # another worker added it first
+        conn.execute('DROP INDEX IF EXISTS geocodes_created')
+        conn.execute('CREATE INDEX IF NOT EXISTS geocodes_accessed ON geocodes (accessed_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS geocodes_expires ON geocodes (expires_at)')
+
+    def _conn(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, address):
+        """Return (found, (lat, lon)); a cached miss is found with (None, None)."""
+        key = normalize_address(address)
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                'SELECT lat, lon, accessed_at FROM geocodes WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row is not None and (row[2] or 0) < now - self.touch_interval:
+                conn.execute('UPDATE geocodes SET accessed_at = ? WHERE key = ?', (now, key))
+        except sqlite3.Error as e:
+            logging.error(f"Geocode cache read failed: {str(e)}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return False, (None, None)
+            self.hits += 1
+        return True, (row[0], row[1])
+
+    def set(self, address, coords):
+        """Store coords for an address; (None, None) records a negative result."""
+        lat, lon = coords
+        ttl = self.hit_ttl if lat is not None else self.miss_ttl
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                'INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?)',
+                (normalize_address(address), lat, lon, now + ttl, now, now)
+            )
+            with self._lock:
+                self._writes += 1
+                evicting = self._writes % self.evict_every == 0
+            if evicting:
+                self.evict(now)
+        except sqlite3.Error as e:
+            logging.error(f"Geocode cache write failed: {str(e)}")
+
+    def evict(self, now=None):
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        conn = self._conn()
+        now = time.time() if now is None else now
+        conn.execute('DELETE FROM geocodes WHERE expires_at <= ?', (now,))
+        (count,) = conn.execute('SELECT COUNT(*) FROM geocodes').fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM geocodes WHERE key IN '
+                '(SELECT key FROM geocodes ORDER BY accessed_at LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def stats(self):
+        """Return hit/miss counters for this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
@@ -1,23 +1,100 @@
 """Address geocoding with caching."""
 from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-from functools import lru_cache
+from main_app.config import FlaskConfig
+from main_app.utils.dispatcher import GeocodeDispatcher, GeocoderBusyError, SharedRateLimiter
+from main_app.utils.geocache import GeocodeCache, normalize_address
 import logging
+import time
 
 class GeoService:
     """Geocoding service with rate limiting and caching."""
     
-    def __init__(self):
-        """Initialize geocoder with rate limiter."""
+    def __init__(self, cache=None, local=None, fetch=None):
+        """Initialize geocoder with dispatcher, persistent cache and local resolver."""
         self.geolocator = Nominatim(user_agent="nyc_restaurant_locator")
-        self.geocode = RateLimiter(self.geolocator.geocode, min_delay_seconds=1)
+        self.cache = cache or GeocodeCache(
+            FlaskConfig.GEOCODE_CACHE_PATH,
+            hit_ttl=FlaskConfig.GEOCODE_CACHE_HIT_TTL,
+            miss_ttl=FlaskConfig.GEOCODE_CACHE_MISS_TTL,
+            max_entries=FlaskConfig.GEOCODE_CACHE_MAX_ENTRIES
+        )
+        self.local = local
+        self._upstream = fetch or self._nominatim
+        self.dispatcher = GeocodeDispatcher(
+            self._fetch,
+            SharedRateLimiter(self.cache.path, min_delay=FlaskConfig.GEOCODE_MIN_DELAY),
+            max_queue=FlaskConfig.GEOCODE_QUEUE_SIZE
+        )
 
-    @lru_cache(maxsize=1024)
     def geocode_address(self, address):
-        """Convert address to (lat, lon) with caching."""
+        """Convert address to (lat, lon), trying the local resolver first.
+        
+        Raises GeocoderBusyError if the upstream queue cannot answer in time.
+        """
+        if self.local is not None:
+            coords = self.local.resolve(address)
+            if coords is not None:
+                return coords
+        
+        found, coords = self.cache.get(address)
+        if found:
+            return coords
+        
         try:
-            location = self.geocode(f"{address}, New York, NY", timeout=10)
-            return (location.latitude, location.longitude) if location else (None, None)
+            return self.dispatcher.lookup(
+                normalize_address(address), address, timeout=FlaskConfig.GEOCODE_WAIT_TIMEOUT
+            )
+        except GeocoderBusyError:
+            raise
         except Exception as e:
             logging.error(f"Geocoding error: {str(e)}")
-            return None, None
\ No newline at end of file
+            return None, None
+
+    def geocode_many(self, addresses, budget=None):
+        """Geocode distinct addresses, yielding {address: (lat, lon)} batches as they resolve.
+        
+        Local and cached answers come first in one batch; the rest go
+        upstream one at a time and each is yielded as soon as it returns.
+        Once the dispatcher is busy or budget seconds have passed, a last
+        batch maps the remaining addresses to None so they can be retried.
+        """
+        resolved = {}
+        pending = []
+        for address in addresses:
+            coords = self.local.resolve(address) if self.local is not None else None
+            if coords is None:
+                found, coords = self.cache.get(address)
+                if not found:
+                    pending.append(address)
+                    continue
+            resolved[address] = coords
+        if resolved:
+            yield resolved
+        
+        deadline = time.monotonic() + budget if budget is not None else None
+        for i, address in enumerate(pending):
+            if deadline is not None and time.monotonic() > deadline:
+                yield dict.fromkeys(pending[i:])
+                return
+            try:
+                coords = self.dispatcher.lookup(
+                    normalize_address(address), address, timeout=FlaskConfig.GEOCODE_WAIT_TIMEOUT
+                )
+            except GeocoderBusyError:
+                yield dict.fromkeys(pending[i:])
+                return
+            except Exception as e:
+                logging.error(f"Geocoding error: {str(e)}")
+                coords = (None, None)
+            yield {address: coords}
+
+    def _fetch(self, address):
+        """Query upstream once and cache the outcome for every worker."""
+        coords = self._upstream(address)
+        self.cache.set(address, coords)
+        return coords
+
+    def _nominatim(self, address):
+        """Geocode an address with Nominatim."""
+        location = self.geolocator.geocode(f"{address}, New York, NY", timeout=10)
+        return (location.latitude, location.longitude) if location else (None, None)
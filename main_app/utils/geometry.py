@@ -0,0 +1,60 @@
+"""Simplified, quantized zipcode geometries per map zoom range."""
+import json
+import shapely
+
+# (min zoom, simplification tolerance in degrees, coordinate decimals);
+# tolerances are about one screen pixel at the level's min zoom
+GEOMETRY_LEVELS = (
+    (0, 0.001, 4),
+    (12, 0.00025, 5),
+    (14, 0.0, 6),
+)
+
+
+def level_for_zoom(zoom):
+    """Return the index of the geometry level to draw at a zoom."""
+    level = 0
+    for i, (min_zoom, _, _) in enumerate(GEOMETRY_LEVELS):
+        if zoom >= min_zoom:
+            level = i
+    return level
+
+
+def geometry_levels(gdf):
+    """Serialize zipcode geometries once per level as GeoJSON bytes.
+
+    Simplification runs over the whole coverage so neighbouring zipcodes
+    keep their shared borders, and rounding maps shared vertices to the
+    same quantized point. Features carry only postalCode; grades and
+    colors are served separately so they can change without resending
+    the polygons.
+    """
+    geoms = gdf.geometry.values
+    codes = gdf['postalCode'].astype(str).tolist()
+    levels = []
+    for i, (min_zoom, tolerance, decimals) in enumerate(GEOMETRY_LEVELS):
+        simplified = shapely.coverage_simplify(geoms, tolerance) if tolerance > 0 else geoms
+        max_zoom = GEOMETRY_LEVELS[i + 1][0] if i + 1 < len(GEOMETRY_LEVELS) else None
+        collection = {
+            'type': 'FeatureCollection',
+            'simplification': {'level': i, 'min_zoom': min_zoom, 'max_zoom': max_zoom},
+            'features': [{
+                'type': 'Feature',
+                'properties': {'postalCode': code},
+                'geometry': _quantize(shapely.geometry.mapping(geom), decimals)
+            } for code, geom in zip(codes, simplified)]
+        }
+        levels.append(json.dumps(collection, separators=(',', ':')).encode('utf-8'))
+    return levels
+
+
+def _quantize(geometry, decimals):
+    """Round every coordinate of a GeoJSON geometry mapping."""
+    def round_coords(coords):
+        if len(coords) == 0:
+            return []
+        if isinstance(coords[0], (int, float)):
+            return [round(c, decimals) for c in coords]
+        return [round_coords(c) for c in coords]
+
+    return {'type': geometry['type'], 'coordinates': round_coords(geometry['coordinates'])}
@@ -0,0 +1,199 @@
+"""Per-restaurant inspection history index."""
+import numpy as np
+import pyarrow as pa
+
+# Text fields of a search result record and their default when missing
+RECORD_TEXT_FIELDS = {
+    'DBA': ('DBA', 'Unknown'),
+    'BORO': ('BORO', ''),
+    'BUILDING': ('BUILDING', ''),
+    'STREET': ('STREET', ''),
+    'ZIPCODE': ('ZIPCODE', ''),
+    'PHONE': ('PHONE', ''),
+    'CUISINE_DESCRIPTION': ('CUISINE DESCRIPTION', ''),
+    'GRADE': ('GRADE', 'N/A'),
+}
+
+# Fields of a search result record, in response order
+RECORD_FIELDS = ['CAMIS', *RECORD_TEXT_FIELDS, 'SCORE', 'Latitude', 'Longitude']
+
+# Record fields the local geocoder reads back as a frame
+ADDRESS_FIELDS = ['BUILDING', 'STREET', 'ZIPCODE', 'BORO']
+
+
+class InspectionHistory:
+    """Inspection rows stored contiguously per CAMIS, newest first.
+
+    Restaurant i owns rows offsets[i]:offsets[i + 1]; the first of those is
+    its latest record. Positions line up with the spatial index built from
+    the same CAMIS order. Response fields live in Arrow tables so they can be
+    memory mapped from artifacts and converted only for the requested rows.
+    """
+
+    def __init__(self, camis, offsets, records, inspections):
+        """Wrap CAMIS and offset arrays with the records and inspections tables."""
+        self.camis = camis
+        self.offsets = offsets
+        self.records = records
+        self.inspection_rows = inspections
+
+    @classmethod
+    def from_frame(cls, df):
+        """Sort rows by (CAMIS, date desc) and precompute response fields."""
+        rows = df.sort_values(
+            by=['CAMIS', 'INSPECTION DATE'], ascending=[True, False], kind='stable'
+        ).reset_index(drop=True)
+        camis = rows['CAMIS'].to_numpy(dtype=object)
+
+        starts = np.flatnonzero(np.r_[True, camis[1:] != camis[:-1]]) if len(camis) else np.empty(0, dtype=np.intp)
+        latest = rows.iloc[starts].reset_index(drop=True)
+
+        records = {'CAMIS': latest['CAMIS'].astype(str).tolist()}
+        for field, (column, default) in RECORD_TEXT_FIELDS.items():
+            records[field] = _text(latest[column], default)
+        records['SCORE'] = _column(latest['SCORE'], float)
+        records['Latitude'] = latest['Latitude'].to_numpy(dtype=np.float64)
+        records['Longitude'] = latest['Longitude'].to_numpy(dtype=np.float64)
+
+        # Whether any violation of the latest inspection was critical
+        dates = rows['INSPECTION DATE'].to_numpy()
+        latest_dates = np.repeat(dates[starts], np.diff(np.append(starts, len(rows))))
+        critical = (rows['CRITICAL FLAG'] == 'Critical').to_numpy(dtype=bool) & (dates == latest_dates)
+        records['CRITICAL'] = np.logical_or.reduceat(critical, starts) if len(starts) else np.zeros(0, dtype=bool)
+
+        inspections = {
+            'DATE': _column(rows['INSPECTION DATE'].dt.strftime('%Y-%m-%d')),
+            'GRADE': _column(rows['GRADE'], str),
+            'SCORE': _column(rows['SCORE'], float),
+            'VIOLATIONS': _column(rows['VIOLATION DESCRIPTION'], str),
+        }
+        return cls(
+            camis[starts].astype(str),
+            np.append(starts, len(rows)).astype(np.intp),
+            pa.table(records),
+            pa.table(inspections, schema=pa.schema([
+                ('DATE', pa.string()), ('GRADE', pa.string()),
+                ('SCORE', pa.float64()), ('VIOLATIONS', pa.string())
+            ]))
+        )
+
+    def __len__(self):
+        return len(self.camis)
+
+    def updated(self, other, replaced):
+        """Return a history where other's restaurants replace those in replaced.
+
+        Blocks of untouched restaurants are copied as whole Arrow rows, so
+        only the replaced restaurants need rebuilding with from_frame.
+        """
+        kept = np.flatnonzero(~np.isin(self.camis, np.asarray(list(replaced), dtype=str)))
+        camis = np.concatenate([self.camis[kept], other.camis])
+        counts = np.concatenate([
+            self.offsets[kept + 1] - self.offsets[kept], np.diff(other.offsets)
+        ]).astype(np.intp)
+        records = pa.concat_tables([self.records.take(kept), other.records])
+        rows = pa.concat_tables([self.inspection_rows.take(self.row_positions(kept)), other.inspection_rows])
+
+        order = np.argsort(camis, kind='stable')
+        combined = InspectionHistory(camis, np.append(0, np.cumsum(counts)).astype(np.intp), records, rows)
+        return InspectionHistory(
+            camis[order],
+            np.append(0, np.cumsum(counts[order])).astype(np.intp),
+            records.take(order).combine_chunks(),
+            rows.take(combined.row_positions(order)).combine_chunks()
+        )
+
+    @property
+    def latest(self):
+        """Return the latest address and location of each restaurant as a frame."""
+        latest = self.records.select(ADDRESS_FIELDS + ['Latitude', 'Longitude']).to_pandas()
+        latest[ADDRESS_FIELDS] = latest[ADDRESS_FIELDS].replace('', None)
+        return latest
+
+    def position(self, camis):
+        """Return the position of a CAMIS, or None if it is unknown."""
+        pos = int(np.searchsorted(self.camis, str(camis)))
+        if pos < len(self.camis) and self.camis[pos] == str(camis):
+            return pos
+        return None
+
+    def latest_record(self, pos):
+        """Return the latest record dict for a position."""
+        return self.latest_records([pos])[0]
+
+    def latest_records(self, positions):
+        """Return latest record dicts for many positions in one conversion."""
+        columns = _columns(self.records.select(RECORD_FIELDS).take(np.asarray(positions, dtype=np.intp)))
+        return [{
+            'CAMIS': camis,
+            'DBA': dba,
+            'BORO': boro,
+            'BUILDING': building,
+            'STREET': street,
+            'ZIPCODE': zipcode,
+            'PHONE': phone,
+            'CUISINE_DESCRIPTION': cuisine,
+            'GRADE': grade,
+            'SCORE': score,
+            'Latitude': lat,
+            'Longitude': lon
+        } for camis, dba, boro, building, street, zipcode, phone, cuisine, grade, score, lat, lon in zip(*columns)]
+
+    def inspections(self, pos):
+        """Return the inspection history for a position, newest first."""
+        start, end = self.offsets[pos], self.offsets[pos + 1]
+        return _inspection_dicts(self.inspection_rows.slice(start, end - start))
+
+    def inspections_for(self, positions):
+        """Return the inspection history of each position, newest first."""
+        positions = np.asarray(positions, dtype=np.intp)
+        rows = _inspection_dicts(self.inspection_rows.take(self.row_positions(positions)))
+        counts = self.offsets[positions + 1] - self.offsets[positions]
+        bounds = np.r_[0, np.cumsum(counts)]
+        return [rows[bounds[i]:bounds[i + 1]] for i in range(len(positions))]
+
+    def row_positions(self, positions):
+        """Return row indices for all inspections of the given restaurants."""
+        positions = np.asarray(positions, dtype=np.intp)
+        starts = self.offsets[positions]
+        counts = self.offsets[positions + 1] - starts
+        shifts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return shifts + np.arange(counts.sum())
+
+
+def _inspection_dicts(table):
+    """Convert inspection rows to response dicts."""
+    return [{
+        'DATE': date,
+        'GRADE': grade,
+        'SCORE': score,
+        'VIOLATIONS': violations
+    } for date, grade, score, violations in zip(*_columns(table))]
+
+
+def _columns(table):
+    """Convert each column of an Arrow table to a list through NumPy."""
+    return [_values(column) for column in table.columns]
+
+
+def _values(column):
+    """Convert an Arrow column to a list with None for nulls."""
+    values = column.to_numpy(zero_copy_only=False).tolist()
+    # Strings come back as None already; numeric nulls come back as NaN
+    if column.null_count and not pa.types.is_string(column.type):
+        for i in np.flatnonzero(column.is_null().to_numpy(zero_copy_only=False)):
+            values[i] = None
+    return values
+
+
+def _text(series, default):
+    """Convert a series to strings with a default for missing values."""
+    return [str(v) if v is not None else default for v in _column(series)]
+
+
+def _column(series, cast=None):
+    """Convert a series to a list with None for missing values."""
+    values = series.to_numpy(dtype=object, na_value=None)
+    if cast is None:
+        return values.tolist()
+    return [cast(v) if v is not None else None for v in values]
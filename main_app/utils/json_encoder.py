@@ -4,21 +4,25 @@ import json
 import pandas as pd
 import numpy as np
 
+
+def encode_default(obj):
+    """Convert pandas/numpy values json cannot serialize natively."""
+    if pd.isna(obj) or obj is None:
+        return None
+    if isinstance(obj, (np.integer, np.floating)):
+        return float(obj)
+    if isinstance(obj, (pd.Timestamp, np.datetime64)):
+        return obj.strftime('%Y-%m-%d')
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+
 class SafeEncoder(JSONProvider):
     """Handles pandas/numpy types in JSON serialization."""
     
     def dumps(self, obj, **kwargs):
         """Serialize objects with custom type handling."""
-        def default_encoder(obj):
-            if pd.isna(obj) or obj is None:
-                return None
-            if isinstance(obj, (np.integer, np.floating)):
-                return float(obj)
-            if isinstance(obj, (pd.Timestamp, np.datetime64)):
-                return obj.strftime('%Y-%m-%d')
-            raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-        return json.dumps(obj, default=default_encoder, **kwargs)
+        return json.dumps(obj, default=encode_default, **kwargs)
 
     def loads(self, s, **kwargs):
         """Default JSON deserialization."""
-        return json.loads(s, **kwargs)
\ No newline at end of file
+        return json.loads(s, **kwargs)
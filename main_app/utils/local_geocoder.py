@@ -0,0 +1,126 @@
+"""Offline address resolution from restaurant locations."""
+import re
+import numpy as np
+import pandas as pd
+
+STREET_ABBREVIATIONS = {
+    'AVE': 'AVENUE', 'AV': 'AVENUE', 'ST': 'STREET', 'STR': 'STREET',
+    'RD': 'ROAD', 'BLVD': 'BOULEVARD', 'PL': 'PLACE', 'DR': 'DRIVE',
+    'PKWY': 'PARKWAY', 'LN': 'LANE', 'SQ': 'SQUARE', 'TER': 'TERRACE',
+    'HWY': 'HIGHWAY', 'EXPY': 'EXPRESSWAY', 'CT': 'COURT', 'TPKE': 'TURNPIKE',
+    'E': 'EAST', 'W': 'WEST', 'N': 'NORTH', 'S': 'SOUTH',
+}
+
+BOROUGH_NAMES = {
+    'MANHATTAN': 'Manhattan', 'NEW YORK': 'Manhattan', 'BROOKLYN': 'Brooklyn',
+    'QUEENS': 'Queens', 'BRONX': 'Bronx', 'THE BRONX': 'Bronx',
+    'STATEN ISLAND': 'Staten Island',
+}
+
+# Furthest a house number may sit past the known range of its street
+MAX_EXTRAPOLATION = 100
+
+
+def normalize_street(street):
+    """Normalize a street name: uppercase, expanded abbreviations, bare ordinals."""
+    tokens = re.sub(r'[^A-Z0-9 ]', ' ', str(street).upper()).split()
+    tokens = [re.sub(r'^(\d+)(ST|ND|RD|TH)$', r'\1', t) for t in tokens]
+    # A leading 'ST' is Saint, not Street
+    return ' '.join(
+        STREET_ABBREVIATIONS.get(t, t) if i or t != 'ST' else t
+        for i, t in enumerate(tokens)
+    )
+
+
+def parse_house_number(building):
+    """Parse a house number, folding Queens-style '37-02' into 3702."""
+    match = re.match(r'^\s*(\d+)(?:-(\d+))?', str(building))
+    if not match:
+        return None
+    number = int(match.group(1))
+    if match.group(2):
+        number = number * 100 + int(match.group(2))
+    return float(number)
+
+
+class LocalGeocoder:
+    """Street and zipcode index built from restaurant addresses."""
+
+    def __init__(self, df):
+        """Build the index from BUILDING, STREET, ZIPCODE, BORO and coordinates."""
+        df = df[['BUILDING', 'STREET', 'ZIPCODE', 'BORO', 'Latitude', 'Longitude']].dropna(
+            subset=['STREET', 'Latitude', 'Longitude']
+        )
+        zipcodes = df['ZIPCODE'].astype(str).str.extract(r'(\d{5})')[0]
+        frame = pd.DataFrame({
+            'street': df['STREET'].map(normalize_street).values,
+            'number': df['BUILDING'].map(parse_house_number).astype(float).values,
+            'zipcode': zipcodes.values,
+            'boro': df['BORO'].astype(str).values,
+            'lat': df['Latitude'].astype(np.float64).values,
+            'lon': df['Longitude'].astype(np.float64).values,
+        })
+
+        self.zip_centroids = {
+            zipcode: (float(group['lat'].mean()), float(group['lon'].mean()))
+            for zipcode, group in frame.dropna(subset=['zipcode']).groupby('zipcode')
+        }
+        self.streets = {}
+        frame = frame.dropna(subset=['number']).sort_values(by=['street', 'number'])
+        for street, group in frame.groupby('street', sort=False):
+            self.streets[street] = {
+                column: group[column].to_numpy() for column in group.columns if column != 'street'
+            }
+
+    def resolve(self, address):
+        """Return (lat, lon) for an NYC address, or None if it is not resolvable."""
+        number, street, zipcode, boro = self._parse(address)
+
+        entries = self.streets.get(street)
+        if entries is not None and number is not None:
+            coords = self._along_street(entries, number, zipcode, boro)
+            if coords is not None:
+                return coords
+
+        if zipcode in self.zip_centroids:
+            return self.zip_centroids[zipcode]
+        return None
+
+    def _parse(self, address):
+        """Split an address into (house number, street key, zipcode, borough)."""
+        parts = [p.strip() for p in str(address).split(',')]
+        zipcode = None
+        for part in parts[1:]:
+            match = re.search(r'\b(\d{5})\b', part)
+            if match:
+                zipcode = match.group(1)
+        boro = next(
+            (BOROUGH_NAMES[p.upper()] for p in parts[1:] if p.upper() in BOROUGH_NAMES), None
+        )
+
+        match = re.match(r'^\s*(\d+(?:-\d+)?)\s+(.+)$', parts[0])
+        if not match:
+            return None, normalize_street(parts[0]), zipcode, boro
+        return parse_house_number(match.group(1)), normalize_street(match.group(2)), zipcode, boro
+
+    def _along_street(self, entries, number, zipcode, boro):
+        """Interpolate a house number between known addresses on one street."""
+        keep = np.ones(len(entries['number']), dtype=bool)
+        if zipcode is not None and (entries['zipcode'] == zipcode).any():
+            keep = entries['zipcode'] == zipcode
+        elif boro is not None:
+            keep = entries['boro'] == boro
+        # The same street name in several boroughs is ambiguous without a hint
+        if len(set(entries['boro'][keep])) != 1:
+            return None
+
+        numbers = entries['number'][keep]
+        lats = entries['lat'][keep]
+        lons = entries['lon'][keep]
+        if number < numbers[0] - MAX_EXTRAPOLATION or number > numbers[-1] + MAX_EXTRAPOLATION:
+            return None
+
+        exact = numbers == number
+        if exact.any():
+            return float(lats[exact].mean()), float(lons[exact].mean())
+        return float(np.interp(number, numbers, lats)), float(np.interp(number, numbers, lons))
@@ -0,0 +1,154 @@
+"""Restaurant name search with prefix and trigram indexes."""
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Ranking bonus for names starting with the query, or with it at a word start
+FULL_PREFIX_BONUS = 1.0
+WORD_PREFIX_BONUS = 0.5
+
+# Upper bound of every string starting with a given prefix
+PREFIX_END = '\U0010ffff'
+
+
+def normalize_name(name):
+    """Normalize a name for matching: uppercase words without punctuation."""
+    return ' '.join(re.sub(r'[^0-9A-Z]+', ' ', str(name).upper()).split())
+
+
+def trigrams(key):
+    """Return the distinct trigrams of a normalized name, each word padded like pg_trgm."""
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """Name lookups over restaurant positions.
+
+    Distinct normalized names are kept sorted, with the restaurants of
+    each. Autocomplete binary-searches a sorted array of every word-start
+    suffix of every name, and typo-tolerant matching counts shared
+    trigrams through an inverted index, so a query touches only the
+    postings of its own trigrams. The tables and arrays are artifacts, so
+    loading only converts them for lookups.
+    """
+
+    def __init__(self, names, suffixes, grams, positions, offsets, gram_names, gram_offsets):
+        """Wrap the name, suffix and trigram tables with their index arrays."""
+        self.name_table = names
+        self.suffix_table = suffixes
+        self.gram_table = grams
+        # Restaurants of name i are positions[offsets[i]:offsets[i + 1]]
+        self.positions = positions
+        self.offsets = offsets
+        # Names containing trigram g are gram_names[gram_offsets[g]:gram_offsets[g + 1]]
+        self.gram_names = gram_names
+        self.gram_offsets = gram_offsets
+
+        self.names = names.column('name').to_numpy(zero_copy_only=False)
+        self.gram_counts = names.column('gram_count').to_numpy().astype(np.float64)
+        self.suffixes = suffixes.column('suffix').to_numpy(zero_copy_only=False)
+        self.suffix_names = suffixes.column('name').to_numpy()
+        self.suffix_full = suffixes.column('full').to_numpy(zero_copy_only=False)
+        self.grams = {gram: code for code, gram in enumerate(grams.column('gram').to_pylist())}
+
+    @classmethod
+    def from_names(cls, names):
+        """Index one name per restaurant position."""
+        # Normalize each distinct raw name once
+        raw_ids, raw_names = pd.factorize(pd.Series(names, dtype=object), use_na_sentinel=False)
+        keys = [normalize_name(name) for name in raw_names]
+        # Python's string sort is much faster than argsort on object arrays
+        distinct = sorted(set(keys))
+        key_ids = {key: i for i, key in enumerate(distinct)}
+        name_ids = np.array([key_ids[key] for key in keys], dtype=np.intp)[raw_ids]
+        positions = np.argsort(name_ids, kind='stable').astype(np.intp)
+        offsets = np.searchsorted(name_ids[positions], np.arange(len(distinct) + 1)).astype(np.intp)
+
+        words = [key.split() for key in distinct]
+        counts = np.array([len(name_words) for name_words in words], dtype=np.intp)
+        owners = np.repeat(np.arange(len(words)), counts)
+
+        # Every word-start suffix of every name, sorted for prefix lookups
+        suffixes = [' '.join(name_words[i:]) for name_words in words for i in range(len(name_words))]
+        order = np.array(sorted(range(len(suffixes)), key=suffixes.__getitem__), dtype=np.intp)
+        full = np.arange(len(owners)) == np.repeat(np.cumsum(counts) - counts, counts)
+
+        # Trigrams of each distinct word, expanded to (name, trigram) pairs
+        word_ids, vocabulary = pd.factorize(pd.Series([word for name_words in words for word in name_words], dtype=object))
+        grams = {}
+        word_grams = [
+            np.array([grams.setdefault(gram, len(grams)) for gram in sorted(trigrams(word))], dtype=np.intp)
+            for word in vocabulary
+        ]
+        lengths = np.array([len(codes) for codes in word_grams], dtype=np.intp)
+        flat = np.concatenate(word_grams) if word_grams else np.empty(0, dtype=np.intp)
+        starts, sizes = (np.cumsum(lengths) - lengths)[word_ids], lengths[word_ids]
+        pairs = np.unique(np.repeat(owners, sizes) * len(grams) + flat[
+            np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+        ])
+        pair_names, pair_grams = np.divmod(pairs, max(len(grams), 1))
+        by_gram = np.argsort(pair_grams, kind='stable')
+
+        return cls(
+            pa.table({
+                'name': pa.array(distinct, type=pa.string()),
+                'gram_count': np.bincount(pair_names, minlength=len(distinct)).astype(np.int32),
+            }),
+            pa.table({
+                'suffix': pa.array([suffixes[i] for i in order], type=pa.string()),
+                'name': owners[order].astype(np.int64),
+                'full': full[order],
+            }),
+            pa.table({'gram': pa.array(list(grams), type=pa.string())}),
+            positions,
+            offsets,
+            pair_names[by_gram].astype(np.intp),
+            np.searchsorted(pair_grams[by_gram], np.arange(len(grams) + 1)).astype(np.intp),
+        )
+
+    def search(self, query, limit=10, min_similarity=0.3):
+        """Return (positions, similarities) of up to limit best matching restaurants.
+
+        Names are ranked by trigram similarity plus a bonus when the query
+        is a prefix of the name or of one of its words; ties go to the
+        alphabetically first name.
+        """
+        key = normalize_name(query)
+        if not key or limit <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        grams = trigrams(key)
+        codes = [self.grams[gram] for gram in grams if gram in self.grams]
+        ids = np.concatenate([
+            self.gram_names[self.gram_offsets[code]:self.gram_offsets[code + 1]] for code in codes
+        ]) if codes else np.empty(0, dtype=np.intp)
+        shared = np.bincount(ids, minlength=len(self.names))
+        similarity = shared / (len(grams) + self.gram_counts - shared)
+
+        lo, hi = np.searchsorted(self.suffixes, [key, key + PREFIX_END])
+        bonus = np.zeros(len(self.names))
+        bonus[self.suffix_names[lo:hi]] = WORD_PREFIX_BONUS
+        bonus[self.suffix_names[lo:hi][self.suffix_full[lo:hi]]] = FULL_PREFIX_BONUS
+
+        candidates = np.flatnonzero((similarity >= min_similarity) | (bonus > 0))
+        scores = similarity[candidates] + bonus[candidates]
+        if len(candidates) > limit:
+            # Every name ranked in the top limit scores at least the limit-th best
+            threshold = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            keep = scores >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+        ranked = candidates[np.lexsort((candidates, -scores))]
+
+        positions, similarities = [], []
+        for name in ranked:
+            matches = self.positions[self.offsets[name]:self.offsets[name + 1]]
+            positions.extend(matches[:limit - len(positions)].tolist())
+            similarities.extend([similarity[name]] * min(len(matches), limit - len(similarities)))
+            if len(positions) >= limit:
+                break
+        return np.asarray(positions, dtype=np.intp), np.asarray(similarities)
@@ -0,0 +1,72 @@
+"""Pre-serialized response bodies with compressed variants."""
+import gzip
+import hashlib
+import threading
+from flask import make_response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings in server preference order
+ENCODINGS = ('br', 'gzip', 'identity') if brotli is not None else ('gzip', 'identity')
+
+
+class Payload:
+    """A fixed response body served with compression and strong ETags.
+
+    Compressed variants are produced once on first request and reused, so
+    repeat requests only copy bytes or answer 304.
+    """
+
+    def __init__(self, body, mimetype='application/json', last_modified=None):
+        """Wrap serialized body bytes."""
+        self.body = body
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self._variants = {'identity': body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """Return the body in a content coding, compressing it once."""
+        variant = self._variants.get(encoding)
+        if variant is None:
+            with self._lock:
+                variant = self._variants.get(encoding)
+                if variant is None:
+                    variant = _compress(self.body, encoding)
+                    self._variants[encoding] = variant
+        return variant
+
+    def respond(self, request, max_age=0):
+        """Build a response negotiated on Accept-Encoding with ETag revalidation."""
+        encoding = request.accept_encodings.best_match(ENCODINGS, default='identity')
+        # Each coding is a distinct representation and needs its own strong ETag
+        etag = self.etag if encoding == 'identity' else f"{self.etag}-{encoding}"
+
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.last_modified = self.last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.vary.add('Accept-Encoding')
+        if request.if_none_match.contains(etag):
+            return response
+
+        response.set_data(self.encoded(encoding))
+        response.status_code = 200
+        response.mimetype = self.mimetype
+        if encoding != 'identity':
+            response.content_encoding = encoding
+        return response.make_conditional(request)
+
+
+def _compress(body, encoding):
+    """Compress body bytes with gzip or brotli."""
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    raise ValueError(f"Unsupported content coding: {encoding}")
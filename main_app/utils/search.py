@@ -1,58 +1,214 @@
 """Core restaurant search functionality."""
 from flask import current_app
-import pandas as pd
+import numpy as np
+import base64
+import json
 import logging
+from main_app.config import FlaskConfig
+from main_app.utils.geocache import normalize_address
+from main_app.utils.snapshots import current_data_service
 
-def search_restaurants(address):
-    """Find nearby restaurants with complete details."""
-    """Find nearby restaurants using pre-initialized services."""
+def search_restaurants(address, nearest=None, filters=None, radius=FlaskConfig.SEARCH_DEFAULT_RADIUS,
+                       page_size=FlaskConfig.SEARCH_PAGE_SIZE, location=None, after=None):
+    """Find restaurants within radius miles, or the nearest N when given, one page at a time.
+    
+    Results are ordered by distance (then CAMIS) and filters (see
+    parse_filters) restrict them to matching restaurants. A page holds the
+    page_size closest restaurants after the (distance, CAMIS) pair in after;
+    'next' holds the location and after to continue from, or None on the
+    last page. location skips geocoding the address again. Inspection
+    histories are not included; see restaurant_history.
+    """
     try:
-        geo_service = current_app.extensions['geo_service']
-        
-        lat, lon = geo_service.geocode_address(address)
-        if not lat or not lon:
-            raise ValueError("Could not locate address")
-        
-        nearby = current_app.data_service.get_nearby_restaurants(lat, lon)
-        grouped = nearby.sort_values('INSPECTION DATE', ascending=False).groupby('CAMIS')
-        
-        results = []
-        inspection_history = {}
-        
-        for camis, group in grouped:
-            latest = group.iloc[0]
-            restaurant = {
-                'CAMIS': str(camis),
-                'DBA': str(latest['DBA']) if pd.notna(latest['DBA']) else 'Unknown',
-                'BORO': str(latest['BORO']) if pd.notna(latest['BORO']) else '',
-                'BUILDING': str(latest['BUILDING']) if pd.notna(latest['BUILDING']) else '',
-                'STREET': str(latest['STREET']) if pd.notna(latest['STREET']) else '',
-                'ZIPCODE': str(latest['ZIPCODE']) if pd.notna(latest['ZIPCODE']) else '',
-                'PHONE': str(latest['PHONE']) if pd.notna(latest['PHONE']) else '',
-                'CUISINE_DESCRIPTION': str(latest['CUISINE DESCRIPTION']) if pd.notna(latest['CUISINE DESCRIPTION']) else '',
-                'GRADE': str(latest['GRADE']) if pd.notna(latest['GRADE']) else 'N/A',
-                'SCORE': float(latest['SCORE']) if pd.notna(latest['SCORE']) else None,
-                'Latitude': float(latest['Latitude']),
-                'Longitude': float(latest['Longitude']),
-                'distance': round(float(latest['distance']), 2)
-            }
-            results.append(restaurant)
+        if location is None:
+            geo_service = current_app.extensions['geo_service']
             
-            inspections = [{
-                'DATE': row['INSPECTION DATE'].strftime('%Y-%m-%d') if pd.notna(row['INSPECTION DATE']) else None,
-                'GRADE': str(row['GRADE']) if pd.notna(row['GRADE']) else None,
-                'SCORE': float(row['SCORE']) if pd.notna(row['SCORE']) else None,
-                'VIOLATIONS': str(row['VIOLATION DESCRIPTION']) if pd.notna(row['VIOLATION DESCRIPTION']) else None
-            } for _, row in group.iterrows()]
-            
-            inspection_history[camis] = inspections
+            lat, lon = geo_service.geocode_address(address)
+            if not lat or not lon:
+                raise ValueError("Could not locate address")
+            location = {'lat': lat, 'lon': lon, 'label': address}
+        lat, lon = location['lat'], location['lon']
+        
+        data_service = current_data_service()
+        search_cache = current_app.extensions['search_cache']
+        if nearest:
+            positions, distances = search_cache.query_nearest(data_service, lat, lon, nearest, filters=filters)
+        else:
+            positions, distances = search_cache.query_nearby(data_service, lat, lon, radius, filters=filters)
+        total = len(positions)
+        results, last = _page(data_service.history, positions, distances, page_size, after)
         
         return {
-            'search_location': {'lat': lat, 'lon': lon, 'label': address},
-            'restaurants': sorted(results, key=lambda x: x['distance']),
-            'inspection_history': inspection_history
+            'search_location': location,
+            'restaurants': results,
+            'total': total,
+            'next': {'location': location, 'after': last} if last is not None else None
         }
         
     except Exception as e:
         logging.error(f"Search error: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+def restaurant_history(camis):
+    """Return the inspection history of a restaurant, newest first, or None if it is unknown."""
+    history = current_data_service().history
+    pos = history.position(camis)
+    if pos is None:
+        return None
+    return {'CAMIS': str(history.camis[pos]), 'inspections': history.inspections(pos)}
+
+
+def encode_cursor(state):
+    """Pack search parameters and where the next page starts into an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Unpack a cursor made by encode_cursor, raising ValueError for bad ones."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        location, (distance, camis) = state['location'], state['after']
+        if not isinstance(state['params'], dict):
+            raise ValueError
+        state['location'] = {
+            'lat': float(location['lat']), 'lon': float(location['lon']), 'label': str(location['label'])
+        }
+        state['after'] = (float(distance), str(camis))
+    except (TypeError, ValueError, KeyError, AttributeError):
+        raise ValueError("Invalid cursor")
+    return state
+
+
+def search_batch(items, nearest=None, filters=None, radius=FlaskConfig.SEARCH_DEFAULT_RADIUS):
+    """Search around many addresses or coordinates, yielding one JSON line per item as it completes.
+
+    Items are address strings or {'address': ...} / {'lat': ..., 'lon': ...}
+    objects. Lines are {'index': i, ...search result} or {'index': i,
+    'error': ...}. Invalid items and coordinates come first, then addresses
+    in the order they are geocoded, so clients match lines by index.
+    Repeated items are geocoded and searched once, and every group of
+    locations resolved together is searched in a single batched index call.
+    """
+    geo_service = current_app.extensions['geo_service']
+    data_service = current_data_service()
+    dumps = current_app.json.dumps
+    # Latest record and inspections of each restaurant, shared by every location it appears around
+    restaurants = {}
+
+    def results(points):
+        """Yield each distinct point's search results from one batched index query."""
+        lats = np.array([lat for lat, _ in points], dtype=np.float64)
+        lons = np.array([lon for _, lon in points], dtype=np.float64)
+        if nearest:
+            matches = data_service.query_nearest_many(lats, lons, nearest, filters=filters)
+        else:
+            matches = data_service.query_nearby_many(lats, lons, radius, filters=filters)
+
+        history = data_service.history
+        for point, (positions, distances) in zip(points, matches):
+            order = np.argsort(distances, kind='stable')
+            positions, distances = positions[order].tolist(), distances[order].tolist()
+            missing = [p for p in dict.fromkeys(positions) if p not in restaurants]
+            for p, record, inspections in zip(missing, history.latest_records(missing), history.inspections_for(missing)):
+                restaurants[p] = (record, inspections)
+            yield point, {
+                'restaurants': [_located(restaurants[p][0], d) for p, d in zip(positions, distances)],
+                'inspection_history': {restaurants[p][0]['CAMIS']: restaurants[p][1] for p in positions},
+            }
+
+    def lines(points):
+        """Yield the lines of every item searched around points, {(lat, lon): [(index, label)]}."""
+        for (lat, lon), result in results(list(points)):
+            for i, label in points[(lat, lon)]:
+                yield dumps({'index': i, 'search_location': {'lat': lat, 'lon': lon, 'label': label}, **result}) + '\n'
+
+    def error(i, message, retry=False):
+        """Return the line of an item that could not be searched."""
+        return dumps({'index': i, 'error': message, 'retry': retry}) + '\n'
+
+    def stream():
+        """Yield lines for invalid items and coordinates, then for addresses as they are geocoded."""
+        points, addresses = {}, {}
+        for i, query in enumerate(_batch_query(item) for item in items):
+            if query[0] == 'error':
+                yield error(i, query[1])
+            elif query[0] == 'point':
+                points.setdefault(query[1], []).append((i, query[2]))
+            else:
+                addresses.setdefault(query[1], []).append((i, query[2]))
+        if points:
+            yield from lines(points)
+        if not addresses:
+            return
+
+        # Each address is geocoded under the label it first appeared with
+        keys = {entries[0][1]: key for key, entries in addresses.items()}
+        for coords in geo_service.geocode_many(list(keys), budget=FlaskConfig.BATCH_SEARCH_GEOCODE_BUDGET):
+            points = {}
+            for address, point in coords.items():
+                entries = addresses[keys[address]]
+                if point is None:
+                    for i, _ in entries:
+                        yield error(i, "Geocoding service is busy, please retry shortly", retry=True)
+                elif not point[0] or not point[1]:
+                    for i, _ in entries:
+                        yield error(i, "Could not locate address")
+                else:
+                    points.setdefault(tuple(point), []).extend(entries)
+            if points:
+                yield from lines(points)
+
+    return stream()
+
+
+def search_names(query, limit=10):
+    """Find restaurants by name, best matches first, with their latest record."""
+    data_service = current_data_service()
+    positions, similarities = data_service.search_names(query, limit=limit)
+    results = data_service.history.latest_records(positions)
+    for restaurant, similarity in zip(results, similarities.tolist()):
+        restaurant['similarity'] = round(similarity, 3)
+    return {'query': query, 'restaurants': results}
+
+
+def _batch_query(item):
+    """Parse a batch item into ('address', key, label), ('point', (lat, lon), label) or ('error', message)."""
+    if isinstance(item, dict) and 'lat' in item and 'lon' in item:
+        try:
+            lat, lon = float(item['lat']), float(item['lon'])
+        except (TypeError, ValueError):
+            return ('error', "lat and lon must be numbers")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return ('error', "lat and lon are out of range")
+        return ('point', (lat, lon), item.get('label', f"{lat}, {lon}"))
+
+    address = item.get('address') if isinstance(item, dict) else item
+    if not isinstance(address, str) or not address.strip():
+        return ('error', "Each item needs an address or lat and lon")
+    address = address.strip()
+    return ('address', normalize_address(address), address)
+
+
+def _page(history, positions, distances, page_size, after=None):
+    """Return the records of the closest page_size results after the (distance, CAMIS) pair
+    in after, and the pair of the last one if more results follow (else None)."""
+    # History positions are in CAMIS order, so they break distance ties the same way
+    camis = history.camis[positions]
+    if after is not None:
+        later = (distances > after[0]) | ((distances == after[0]) & (camis > after[1]))
+        positions, distances, camis = positions[later], distances[later], camis[later]
+    order = np.lexsort((positions, distances))[:page_size]
+
+    results = [
+        _located(record, distance)
+        for record, distance in zip(history.latest_records(positions[order]), distances[order].tolist())
+    ]
+    if len(positions) <= page_size:
+        return results, None
+    return results, (float(distances[order[-1]]), str(camis[order[-1]]))
+
+
+def _located(record, distance):
+    """Return a restaurant's latest record with its distance in miles from the search location."""
+    return {**record, 'distance': round(distance, 2)}
@@ -0,0 +1,144 @@
+"""Search candidates cached per quantized location cell."""
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from main_app.utils.distance import distances_within
+from main_app.utils.spatial_index import PROJECTION_TOLERANCE
+
+# Bytes charged per entry on top of its candidate array, for the key and bookkeeping
+ENTRY_OVERHEAD = 256
+
+
+class SearchCache:
+    """LRU cache of the restaurants a search may return from anywhere in a grid cell.
+
+    Search origins are snapped to square cells of cell_miles in the
+    spatial index projection. An entry holds every matching restaurant
+    within reach of any point of its cell, found once from the cell
+    centre, so later searches from the cell only rank those candidates
+    by distance and return what an uncached search would. Entries are
+    keyed by dataset version, cell, radius or count and filters; the
+    least recently used go once the candidates exceed max_bytes.
+    """
+
+    def __init__(self, cell_miles, max_bytes):
+        """Initialize an empty cache of cell_miles cells holding up to max_bytes of candidates."""
+        self.cell_miles = cell_miles
+        self.max_bytes = max_bytes
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._half_diagonal = cell_miles * math.sqrt(2) / 2
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def query_nearby(self, data_service, lat, lon, max_distance=1, filters=None):
+        """Return (positions, distances) of matching restaurants within max_distance miles."""
+        index = data_service.spatial_index
+        point = index.project([lat], [lon])[0]
+        reach = max_distance * (1 + PROJECTION_TOLERANCE)
+
+        def fetch(center, mask):
+            return index.query_ball(center, reach + self._half_diagonal, mask=mask)
+
+        candidates = self._candidates(data_service, point, ('nearby', max_distance), filters, fetch)
+        # The candidates an uncached search would have taken from the tree
+        offsets = index.points[candidates] - point
+        candidates = candidates[np.einsum('ij,ij->i', offsets, offsets) <= reach * reach]
+
+        distances, within = distances_within(
+            lat, lon, index.lats[candidates], index.lons[candidates], max_distance
+        )
+        return candidates[within], distances[within]
+
+    def query_nearest(self, data_service, lat, lon, k, filters=None):
+        """Return (positions, distances) of the k closest matching restaurants."""
+        index = data_service.spatial_index
+        point = index.project([lat], [lon])[0]
+
+        def fetch(center, mask):
+            # Any point of the cell has its k closest within the centre's kth closest plus the diagonal
+            nearest, _ = index.query_nearest(*index.unproject(center), k, mask=mask)
+            if not len(nearest):
+                return nearest
+            kth = np.sqrt(np.einsum('ij,ij->i', index.points[nearest] - center, index.points[nearest] - center).max())
+            return index.query_ball(center, kth + 2 * self._half_diagonal, mask=mask)
+
+        candidates = self._candidates(data_service, point, ('nearest', k), filters, fetch)
+        k = min(int(k), len(candidates))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        offsets = index.points[candidates] - point
+        candidates = candidates[np.argpartition(np.einsum('ij,ij->i', offsets, offsets), k - 1)[:k]]
+        distances, _ = distances_within(
+            lat, lon, index.lats[candidates], index.lons[candidates], np.inf, exact=False
+        )
+        order = np.argsort(distances, kind='stable')
+        return candidates[order], distances[order]
+
+    def invalidate(self, version):
+        """Drop every entry of other dataset versions and only cache version from now on."""
+        with self._lock:
+            self.version = version
+            for key in [key for key in self._entries if key[0] != version]:
+                self.bytes -= self._entries.pop(key).nbytes + ENTRY_OVERHEAD
+
+    def stats(self):
+        """Return hit/miss counters and the memory held by this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'version': self.version,
+            }
+
+    def _candidates(self, data_service, point, query, filters, fetch):
+        """Return the cached candidates of point's cell, calling fetch(center, mask) on a miss."""
+        cell = (int(point[0] // self.cell_miles), int(point[1] // self.cell_miles))
+        key = (data_service.version, cell, query, _filters_key(filters))
+        with self._lock:
+            candidates = self._entries.get(key)
+            if candidates is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return candidates
+            self.misses += 1
+
+        center = (np.array(cell, dtype=np.float64) + 0.5) * self.cell_miles
+        candidates = fetch(center, data_service.filter_index.mask(filters))
+        self._store(key, candidates)
+        return candidates
+
+    def _store(self, key, candidates):
+        """Insert an entry, evicting the least recently used ones beyond max_bytes."""
+        size = candidates.nbytes + ENTRY_OVERHEAD
+        with self._lock:
+            if self.version is None:
+                self.version = key[0]
+            # Searches still reading a replaced snapshot don't refill the cache
+            if key[0] != self.version or size > self.max_bytes or key in self._entries:
+                return
+            self._entries[key] = candidates
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes + ENTRY_OVERHEAD
+                self.evictions += 1
+
+
+def _filters_key(filters):
+    """Return a hashable key equal for filters that select the same restaurants."""
+    return tuple(sorted(
+        (name, tuple(sorted({value.casefold() for value in values})) if isinstance(values, list) else values)
+        for name, values in (filters or {}).items()
+    ))
@@ -0,0 +1,171 @@
+"""Dataset snapshots swapped into running workers without downtime."""
+import os
+import signal
+import threading
+import time
+import logging
+from flask import current_app, g
+
+
+class Snapshot:
+    """A loaded DataService and the number of requests reading it."""
+
+    def __init__(self, service):
+        """Wrap a fully loaded DataService."""
+        self.service = service
+        self.readers = 0
+        self.retired = False
+
+
+class SnapshotManager:
+    """Publishes DataService snapshots with an atomic reference swap.
+
+    A request pins the snapshot that is current when it starts and reads
+    it to the end, even if a newer one is published meanwhile. A replaced
+    snapshot is closed once its last reader finishes. Replacements load on
+    a background thread, so requests never wait for a reload.
+    """
+
+    def __init__(self, service, loader):
+        """Publish service and load replacements with loader()."""
+        self.loader = loader
+        self.listeners = []
+        self.watch_path = None
+        self.watch_interval = 0
+        self._current = Snapshot(service)
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+
+    def init_app(self, app):
+        """Pin a snapshot to every request and release it at teardown."""
+        app.extensions['snapshots'] = self
+
+        @app.before_request
+        def pin_snapshot():
+            self._ensure_watcher()
+            g.data_snapshot = self.acquire()
+
+        @app.teardown_request
+        def release_snapshot(exc):
+            snapshot = g.pop('data_snapshot', None)
+            if snapshot is not None:
+                self.release(snapshot)
+
+    @property
+    def current(self):
+        """Return the DataService new readers get."""
+        return self._current.service
+
+    def acquire(self):
+        """Pin the current snapshot for one reader."""
+        with self._lock:
+            snapshot = self._current
+            snapshot.readers += 1
+        return snapshot
+
+    def release(self, snapshot):
+        """Unpin a snapshot, closing it if it was replaced and this was its last reader."""
+        with self._lock:
+            snapshot.readers -= 1
+            closing = snapshot.retired and snapshot.readers == 0
+        if closing:
+            self._close(snapshot)
+
+    def publish(self, service):
+        """Make a loaded service current; listeners see it just before readers do."""
+        for listener in self.listeners:
+            try:
+                listener(service)
+            except Exception as e:
+                logging.error(f"Snapshot listener failed: {str(e)}")
+
+        with self._lock:
+            old, self._current = self._current, Snapshot(service)
+            old.retired = True
+            closing = old.readers == 0
+        if closing:
+            self._close(old)
+
+    def reload(self):
+        """Load a new snapshot and publish it if its data version changed.
+
+        Returns whether a snapshot was published. A reload already in
+        progress makes this call a no-op.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            started = time.perf_counter()
+            service = self.loader()
+            if service.version == self.current.version:
+                service.close()
+                return False
+            self.publish(service)
+            logging.info(f"Published dataset {service.version} in {time.perf_counter() - started:.2f}s")
+            return True
+        except Exception as e:
+            logging.error(f"Dataset reload failed: {str(e)}")
+            return False
+        finally:
+            self._reload_lock.release()
+
+    def reload_async(self):
+        """Reload on a background thread."""
+        thread = threading.Thread(target=self.reload, name='dataset-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def watch(self, path, interval):
+        """Reload whenever the file at path changes, polling every interval seconds."""
+        self.watch_path = path
+        self.watch_interval = interval
+        self._ensure_watcher()
+
+    def handle_signal(self, name):
+        """Reload in the background when the process receives the named signal."""
+        try:
+            signal.signal(getattr(signal, name), lambda signum, frame: self.reload_async())
+        except (AttributeError, ValueError) as e:
+            # Unknown signal name, or not called from the main thread
+            logging.warning(f"Dataset reload on {name} unavailable: {str(e)}")
+
+    def _ensure_watcher(self):
+        """Start the watch thread, also after a fork into a new worker."""
+        if self.watch_interval > 0 and (self._watcher is None or not self._watcher.is_alive()):
+            with self._lock:
+                if self._watcher is None or not self._watcher.is_alive():
+                    self._watcher = threading.Thread(target=self._watch, name='dataset-watcher', daemon=True)
+                    self._watcher.start()
+
+    def _watch(self):
+        """Poll the watched file and reload when its identity or contents change."""
+        seen = _file_state(self.watch_path)
+        while True:
+            time.sleep(self.watch_interval)
+            state = _file_state(self.watch_path)
+            if state != seen:
+                seen = state
+                self.reload()
+
+    def _close(self, snapshot):
+        """Release a snapshot nobody reads anymore."""
+        snapshot.service.close()
+        logging.info(f"Released dataset {snapshot.service.version}")
+
+
+def current_data_service():
+    """Return the DataService pinned to this request, or the current one outside requests."""
+    snapshot = g.get('data_snapshot')
+    if snapshot is not None:
+        return snapshot.service
+    return current_app.extensions['snapshots'].current
+
+
+def _file_state(path):
+    """Return (inode, mtime, size) of a file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
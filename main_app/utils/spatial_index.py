@@ -0,0 +1,159 @@
+"""Spatial index over restaurant locations in projected miles."""
+import itertools
+import numpy as np
+from scipy.spatial import cKDTree
+from main_app.utils.distance import distances_within
+
+# Local equirectangular projection centred on NYC
+NYC_ORIGIN = (40.7128, -74.0060)
+MILES_PER_DEG_LAT = 69.055
+
+# Projection error across the five boroughs stays well under this fraction
+PROJECTION_TOLERANCE = 0.01
+
+
+class RestaurantIndex:
+    """KD-tree with one point per restaurant (CAMIS) in projected miles."""
+
+    def __init__(self, camis, lats, lons, origin=NYC_ORIGIN, points=None):
+        """Build the tree from parallel CAMIS, latitude and longitude arrays.
+
+        Precomputed projected points (e.g. a memory-mapped array) are used
+        in place without copying.
+        """
+        self.camis = np.asarray(camis)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.origin = origin
+        self._miles_per_deg_lon = MILES_PER_DEG_LAT * np.cos(np.radians(origin[0]))
+        self.points = points if points is not None else self.project(self.lats, self.lons)
+        self.tree = cKDTree(self.points, copy_data=False)
+
+    def __len__(self):
+        return len(self.camis)
+
+    def project(self, lats, lons):
+        """Project degrees to (x, y) miles from the origin."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        x = (lons - self.origin[1]) * self._miles_per_deg_lon
+        y = (lats - self.origin[0]) * MILES_PER_DEG_LAT
+        return np.column_stack([x, y])
+
+    def unproject(self, points):
+        """Return (lats, lons) of projected (x, y) miles."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        lons = points[:, 0] / self._miles_per_deg_lon + self.origin[1]
+        lats = points[:, 1] / MILES_PER_DEG_LAT + self.origin[0]
+        return lats, lons
+
+    def query_ball(self, point, radius, mask=None):
+        """Return sorted positions within radius projected miles of an (x, y) point, or of those in mask."""
+        candidates = np.asarray(self.tree.query_ball_point(point, radius, return_sorted=True), dtype=np.intp)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        return candidates
+
+    def query_radius(self, lat, lon, max_distance, mask=None):
+        """Return (positions, distances) of restaurants within max_distance miles.
+
+        A boolean mask over positions drops non-matching candidates before
+        any distance is computed.
+        """
+        point = self.project([lat], [lon])[0]
+        candidates = self.tree.query_ball_point(point, max_distance * (1 + PROJECTION_TOLERANCE))
+        candidates = np.asarray(candidates, dtype=np.intp)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+
+        distances, within = distances_within(
+            lat, lon, self.lats[candidates], self.lons[candidates], max_distance
+        )
+        return candidates[within], distances[within]
+
+    def query_nearest(self, lat, lon, k, mask=None):
+        """Return (positions, distances) of the k closest restaurants, or of those in mask."""
+        matching = np.flatnonzero(mask) if mask is not None else None
+        k = min(int(k), len(self) if matching is None else len(matching))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        point = self.project([lat], [lon])[0]
+        if matching is None:
+            _, candidates = self.tree.query(point, k=k)
+            candidates = np.atleast_1d(candidates).astype(np.intp)
+        else:
+            # Matching points are few enough to rank directly
+            offsets = self.points[matching] - point
+            candidates = matching[np.argpartition(np.einsum('ij,ij->i', offsets, offsets), k - 1)[:k]]
+
+        distances, _ = distances_within(
+            lat, lon, self.lats[candidates], self.lons[candidates], np.inf, exact=False
+        )
+        order = np.argsort(distances, kind='stable')
+        return candidates[order], distances[order]
+
+    def query_radius_many(self, lats, lons, max_distance, mask=None):
+        """Return (positions, distances) within max_distance miles of each origin.
+
+        All origins go through one KD-tree query and one distance pass.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        candidates = self.tree.query_ball_point(
+            self.project(lats, lons), max_distance * (1 + PROJECTION_TOLERANCE), return_sorted=True
+        )
+        counts = np.fromiter(map(len, candidates), dtype=np.intp, count=len(candidates))
+        flat = np.fromiter(itertools.chain.from_iterable(candidates), dtype=np.intp, count=counts.sum())
+        if mask is not None:
+            keep = mask[flat]
+            counts = np.bincount(np.repeat(np.arange(len(counts)), counts)[keep], minlength=len(counts))
+            flat = flat[keep]
+
+        distances, within = distances_within(
+            np.repeat(lats, counts), np.repeat(lons, counts), self.lats[flat], self.lons[flat], max_distance
+        )
+        bounds = np.r_[0, np.cumsum(counts)]
+        return [
+            (flat[start:end][within[start:end]], distances[start:end][within[start:end]])
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def query_nearest_many(self, lats, lons, k, mask=None):
+        """Return (positions, distances) of the k closest restaurants, or of those in mask, to each origin."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        matching = np.flatnonzero(mask) if mask is not None else None
+        k = min(int(k), len(self) if matching is None else len(matching))
+        if k <= 0 or not len(lats):
+            return [(np.empty(0, dtype=np.intp), np.empty(0)) for _ in range(len(lats))]
+
+        if matching is None:
+            _, candidates = self.tree.query(self.project(lats, lons), k=k)
+        else:
+            # One tree over the matching restaurants serves every origin
+            _, nearest = cKDTree(self.points[matching]).query(self.project(lats, lons), k=k)
+            candidates = matching[nearest]
+        candidates = candidates.reshape(len(lats), k).astype(np.intp)
+
+        distances, _ = distances_within(
+            lats[:, None], lons[:, None], self.lats[candidates], self.lons[candidates], np.inf, exact=False
+        )
+        order = np.argsort(distances, axis=1, kind='stable')
+        return list(zip(
+            np.take_along_axis(candidates, order, axis=1), np.take_along_axis(distances, order, axis=1)
+        ))
+
+    def query_bbox(self, south, west, north, east):
+        """Return positions of restaurants inside a lat/lon bounding box."""
+        corners = self.project([south, north], [west, east])
+        center = corners.mean(axis=0)
+        half_width = np.abs(corners[1] - corners[0]).max() / 2
+
+        candidates = self.tree.query_ball_point(center, half_width, p=np.inf)
+        candidates = np.asarray(candidates, dtype=np.intp)
+        inside = (
+            (self.lats[candidates] >= south) & (self.lats[candidates] <= north) &
+            (self.lons[candidates] >= west) & (self.lons[candidates] <= east)
+        )
+        return np.sort(candidates[inside])
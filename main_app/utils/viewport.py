@@ -0,0 +1,91 @@
+"""Map viewport queries over unique restaurants with grid clustering."""
+import numpy as np
+from main_app.utils.spatial_index import RestaurantIndex
+
+GRADE_VALUES = {'A': 1.0, 'B': 2.0, 'C': 3.0}
+
+# Cluster cells per 256px map tile, i.e. cells of roughly 64px on screen
+CELLS_PER_TILE = 4
+
+
+class ViewportIndex:
+    """Bounding box queries that cluster at low zoom and list restaurants at high zoom."""
+
+    def __init__(self, table, cluster_max_zoom=13, max_points=2000):
+        """Index the unique restaurants table by location."""
+        self.cluster_max_zoom = cluster_max_zoom
+        self.max_points = max_points
+        self.table = table.select(['DBA', 'GRADE', 'ZIPCODE', 'CUISINE DESCRIPTION'])
+
+        lats = table.column('Latitude').to_numpy().astype(np.float64)
+        lons = table.column('Longitude').to_numpy().astype(np.float64)
+        grades = table.column('GRADE').to_pandas().astype(object)
+        self.grades = grades.map(GRADE_VALUES).to_numpy(dtype=np.float64, na_value=np.nan)
+        self.index = RestaurantIndex(np.arange(len(lats)), lats, lons)
+        self._x, self._y = web_mercator(lats, lons)
+
+    def query(self, south, west, north, east, zoom):
+        """Return a GeoJSON FeatureCollection of what is visible in the box."""
+        positions = self.index.query_bbox(south, west, north, east)
+        if zoom > self.cluster_max_zoom and len(positions) <= self.max_points:
+            features = self._restaurants(positions)
+        else:
+            features = self._clusters(positions, zoom)
+        return {'type': 'FeatureCollection', 'features': features}
+
+    def _restaurants(self, positions):
+        """One feature per restaurant."""
+        rows = self.table.take(positions).to_pydict()
+        lats = self.index.lats[positions].tolist()
+        lons = self.index.lons[positions].tolist()
+        return [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(lon, 6), round(lat, 6)]},
+            'properties': {
+                'cluster': False,
+                'DBA': dba,
+                'GRADE': grade,
+                'ZIPCODE': zipcode,
+                'CUISINE': cuisine
+            }
+        } for lat, lon, dba, grade, zipcode, cuisine in zip(
+            lats, lons, rows['DBA'], rows['GRADE'], rows['ZIPCODE'], rows['CUISINE DESCRIPTION']
+        )]
+
+    def _clusters(self, positions, zoom):
+        """One feature per screen grid cell with its count, centroid and mean grade."""
+        scale = 2 ** int(zoom) * CELLS_PER_TILE
+        cells = np.column_stack([
+            np.floor(self._x[positions] * scale), np.floor(self._y[positions] * scale)
+        ])
+        _, cell = np.unique(cells, axis=0, return_inverse=True)
+        cell = cell.ravel()
+        n_cells = int(cell.max()) + 1 if len(cell) else 0
+
+        counts = np.bincount(cell, minlength=n_cells)
+        lats = np.bincount(cell, self.index.lats[positions], n_cells) / np.maximum(counts, 1)
+        lons = np.bincount(cell, self.index.lons[positions], n_cells) / np.maximum(counts, 1)
+
+        grades = self.grades[positions]
+        graded = ~np.isnan(grades)
+        grade_counts = np.bincount(cell[graded], minlength=n_cells)
+        grade_sums = np.bincount(cell[graded], grades[graded], n_cells)
+        means = np.where(grade_counts > 0, grade_sums / np.maximum(grade_counts, 1), np.nan)
+
+        return [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(lon, 6), round(lat, 6)]},
+            'properties': {
+                'cluster': True,
+                'count': count,
+                'mean_grade': round(mean, 2) if mean == mean else None
+            }
+        } for lat, lon, count, mean in zip(lats.tolist(), lons.tolist(), counts.tolist(), means.tolist())]
+
+
+def web_mercator(lats, lons):
+    """Project degrees to Web Mercator coordinates in [0, 1]."""
+    x = (lons + 180.0) / 360.0
+    sin = np.sin(np.radians(lats))
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * np.pi)
+    return x, y
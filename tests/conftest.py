@@ -0,0 +1,122 @@
+"""Synthetic inspection datasets and a fake upstream geocoder shared by the tests."""
+import json
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from main_app.config import FlaskConfig
+
+COLUMNS = [
+    'CAMIS', 'DBA', 'BORO', 'BUILDING', 'STREET', 'ZIPCODE', 'PHONE', 'CUISINE DESCRIPTION', 'INSPECTION DATE',
+    'ACTION', 'VIOLATION CODE', 'VIOLATION DESCRIPTION', 'CRITICAL FLAG', 'SCORE', 'GRADE', 'GRADE DATE',
+    'RECORD DATE', 'INSPECTION TYPE', 'Latitude', 'Longitude', 'Community Board', 'Council District',
+    'Census Tract', 'BIN', 'BBL', 'NTA', 'Location Point1'
+]
+BOROS = ['Manhattan', 'Brooklyn', 'Queens', 'Bronx', 'Staten Island']
+CUISINES = ['American', 'Pizza', 'Chinese', 'Italian', 'Mexican', 'Japanese', 'Bakery', 'Caribbean']
+STREETS = ['BROADWAY', 'MAIN STREET', 'AMSTERDAM AVENUE', 'CONVENT AVENUE', 'WALL STREET']
+# Synthetic restaurants lie in this box, split into a grid of zipcodes
+SOUTH, WEST, NORTH, EAST = 40.70, -74.00, 40.76, -73.90
+ZIP_ROWS, ZIP_COLS = 3, 4
+
+
+class FakeGeocoder:
+    """Upstream stand-in that counts calls and can be held until released."""
+
+    def __init__(self, delay=0.0, coords=None):
+        self.delay = delay
+        self.coords = coords
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self._lock = threading.Lock()
+
+    def __call__(self, address):
+        with self._lock:
+            self.calls.append((address, time.time()))
+        self.release.wait()
+        time.sleep(self.delay)
+        return self.coords or (40.0 + len(address) / 1000, -74.0)
+
+
+def inspection_rows(restaurants=200, rows_per=4, seed=0, camis_start=40000000, start='2018-01-01'):
+    """Return a frame of raw inspection rows in the source CSV layout."""
+    rng = np.random.default_rng(seed)
+    n = restaurants * rows_per
+    ids = np.repeat(np.arange(restaurants), rows_per)
+    lats = rng.uniform(SOUTH + 0.001, NORTH - 0.001, restaurants)[ids]
+    lons = rng.uniform(WEST + 0.001, EAST - 0.001, restaurants)[ids]
+    zip_index = (
+        np.minimum(((lats - SOUTH) / (NORTH - SOUTH) * ZIP_ROWS).astype(int), ZIP_ROWS - 1) * ZIP_COLS
+        + np.minimum(((lons - WEST) / (EAST - WEST) * ZIP_COLS).astype(int), ZIP_COLS - 1)
+    )
+    cuisines = np.array(CUISINES)[ids % len(CUISINES)]
+    scores = rng.integers(0, 40, n)
+    grades = np.select([scores < 14, scores < 28], ['A', 'B'], 'C')
+    dates = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, 2000, n), unit='D')
+    codes = rng.integers(1, 30, n)
+    return pd.DataFrame({
+        'CAMIS': (camis_start + ids).astype(str),
+        'DBA': [f"REST {i} {cuisine.upper()}" for i, cuisine in zip(ids, cuisines)],
+        'BORO': np.array(BOROS)[ids % len(BOROS)],
+        'BUILDING': (10 + ids % 500).astype(str),
+        'STREET': np.array(STREETS)[ids % len(STREETS)],
+        'ZIPCODE': (10001 + zip_index).astype(str),
+        'PHONE': (2125550000 + ids).astype(str),
+        'CUISINE DESCRIPTION': cuisines,
+        'INSPECTION DATE': dates.strftime('%m/%d/%Y'),
+        'ACTION': 'Violations were cited',
+        'VIOLATION CODE': [f"{code:02d}A" for code in codes],
+        'VIOLATION DESCRIPTION': [f"Violation {code}" for code in codes],
+        'CRITICAL FLAG': np.where(codes % 3 == 0, 'Critical', 'Not Critical'),
+        'SCORE': scores,
+        'GRADE': grades,
+        'GRADE DATE': dates.strftime('%m/%d/%Y'),
+        'RECORD DATE': '04/01/2025',
+        'INSPECTION TYPE': 'Cycle Inspection / Initial Inspection',
+        'Latitude': lats,
+        'Longitude': lons,
+        'Community Board': '1', 'Council District': '1', 'Census Tract': '1', 'BIN': '1', 'BBL': '1',
+        'NTA': 'x', 'Location Point1': '',
+    }, columns=COLUMNS)
+
+
+def write_zipcodes(path):
+    """Write a grid of zipcode polygons covering the synthetic restaurants."""
+    features = []
+    for row in range(ZIP_ROWS):
+        for col in range(ZIP_COLS):
+            south = SOUTH + (NORTH - SOUTH) * row / ZIP_ROWS
+            north = SOUTH + (NORTH - SOUTH) * (row + 1) / ZIP_ROWS
+            west = WEST + (EAST - WEST) * col / ZIP_COLS
+            east = WEST + (EAST - WEST) * (col + 1) / ZIP_COLS
+            features.append({
+                'type': 'Feature',
+                'properties': {'postalCode': str(10001 + row * ZIP_COLS + col)},
+                'geometry': {'type': 'Polygon', 'coordinates': [[
+                    [west, south], [east, south], [east, north], [west, north], [west, south]
+                ]]},
+            })
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the app at a temporary data directory holding a synthetic dataset."""
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    inspection_rows().to_csv(directory / 'restaurant_data.csv', index=False)
+    write_zipcodes(directory / 'zipcode_border_data.geojson')
+    for name, value in {
+        'DATA_DIR': directory,
+        'ARTIFACT_DIR': directory / 'artifacts',
+        'DELTA_DIR': directory / 'deltas',
+        'CHART_CACHE_DIR': directory / 'chart_cache',
+        'GEOCODE_CACHE_PATH': directory / 'geocode_cache.sqlite3',
+        'DATA_RELOAD_INTERVAL': 0,
+        'DATA_RELOAD_SIGNAL': None,
+        'ANALYTICS_WARM_UP': False,
+    }.items():
+        monkeypatch.setattr(FlaskConfig, name, value)
+    return directory
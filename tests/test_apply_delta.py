@@ -0,0 +1,49 @@
+"""Incremental delta merge against a full rebuild."""
+import warnings
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from main_app.config import FlaskConfig
+from main_app.utils.data_loader import DataService
+from tests.conftest import inspection_rows
+
+
+def _frame(table):
+    """Return an Arrow table as a frame with categories as plain values."""
+    df = table.to_pandas()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    return df
+
+
+def test_apply_delta_matches_full_build(data_dir):
+    service = DataService(load=False)
+    tables = service.build_tables()
+
+    # Replaced inspections of existing restaurants, with columns left empty, and a new restaurant
+    rows = inspection_rows()
+    delta = rows[rows['CAMIS'].isin(rows['CAMIS'].unique()[:5])].copy()
+    delta['INSPECTION DATE'] = '05/01/2026'
+    added = inspection_rows(restaurants=1, camis_start=50000000)
+    added['VIOLATION DESCRIPTION'] = 'A violation not seen before'
+    delta = pd.concat([delta, added])
+    delta[['GRADE', 'GRADE DATE', 'VIOLATION CODE']] = ''
+    FlaskConfig.DELTA_DIR.mkdir()
+    path = FlaskConfig.DELTA_DIR / 'restaurant_data.delta-20260501T000000.csv'
+    delta.to_csv(path, index=False)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', FutureWarning)
+        merged = service.apply_delta(tables, service.read_source(path))
+        rebuilt = service.build_tables()
+
+    assert merged.keys() == rebuilt.keys()
+    for name, expected in rebuilt.items():
+        actual = merged[name]
+        if isinstance(expected, pa.Table):
+            pd.testing.assert_frame_equal(_frame(actual), _frame(expected), obj=name)
+        elif isinstance(expected, np.ndarray):
+            np.testing.assert_array_equal(actual, expected, err_msg=name)
+        else:
+            assert actual == expected, name
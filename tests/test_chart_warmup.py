@@ -0,0 +1,145 @@
+"""Background chart rendering: retries after failures and the pinned dataset snapshot."""
+import gc
+import sys
+import time
+import types
+from pathlib import Path
+import pytest
+from flask import Flask
+from main_app.utils import chart_warmup
+from main_app.utils.chart_cache import ChartCache
+from main_app.utils.chart_warmup import ChartWarmUp
+from main_app.utils.snapshots import SnapshotManager
+
+
+class FakeService:
+    """DataService stand-in that records when it is closed."""
+
+    def __init__(self, version):
+        self.version = version
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _flask_apps():
+    """Return the number of Flask apps built in this process."""
+    return sum(isinstance(obj, Flask) for obj in gc.get_objects())
+
+
+def _wait_until_idle(warm_up, timeout=30):
+    deadline = time.time() + timeout
+    while warm_up._running:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ChartCache(tmp_path / 'chart_cache')
+
+
+def test_failed_version_is_retried_after_a_growing_delay(cache):
+    warm_up = ChartWarmUp(cache, workers=0, retry_delay=0.2, max_retry_delay=0.3)
+    calls = []
+
+    def prepare(service):
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise RuntimeError("dataset unavailable")
+        return {'total': '1'}, {'chart.json': (str.upper, 'figure')}, None, ()
+
+    warm_up.start('v1', prepare)
+    _wait_until_idle(warm_up)
+    assert warm_up.status()['state'] == 'failed'
+
+    # Within the delay nothing is attempted again
+    warm_up.start('v1', prepare)
+    _wait_until_idle(warm_up)
+    assert len(calls) == 1
+
+    for attempts in (2, 3):
+        deadline = time.time() + 5
+        while len(calls) < attempts:
+            assert time.time() < deadline
+            warm_up.start('v1', prepare)
+            _wait_until_idle(warm_up)
+            time.sleep(0.02)
+    assert calls[1] - calls[0] >= 0.2
+    assert calls[2] - calls[1] >= 0.3
+    assert cache.is_published('v1')
+    assert cache.get('chart.json', 'v1') == 'FIGURE'
+    assert warm_up.status()['state'] == 'complete'
+
+
+def test_render_pins_the_snapshot_it_reads(cache):
+    old, new = FakeService('a'), FakeService('b')
+    snapshots = SnapshotManager(old, loader=lambda: new)
+    warm_up = ChartWarmUp(cache, workers=0, snapshots=snapshots)
+    seen = {}
+
+    def check_open(name):
+        # The dataset is swapped while this render still reads the old one
+        seen[name] = old.closed
+        return name
+
+    def prepare(service):
+        seen['service'] = service
+        assert snapshots.reload()
+        return {}, {name: (check_open, name) for name in ('first', 'second')}, None, ()
+
+    warm_up.start('v-a', prepare)
+    _wait_until_idle(warm_up)
+
+    assert seen == {'service': old, 'first': False, 'second': False}
+    assert snapshots.current is new
+    assert old.closed and not new.closed
+    assert cache.is_published('v-a')
+
+
+def test_render_is_skipped_while_another_process_holds_the_lock(cache):
+    warm_up = ChartWarmUp(cache, workers=0)
+
+    def prepare(service):
+        return {'chart.json': 'figure'}, {}, None, ()
+
+    cache.cache_dir.mkdir(parents=True)
+    with open(warm_up.lock_path, 'a') as held:
+        assert chart_warmup._try_lock(held)
+        warm_up.start('v1', prepare)
+        _wait_until_idle(warm_up)
+        assert not cache.is_published('v1')
+        chart_warmup._unlock(held)
+
+    warm_up.start('v1', prepare)
+    _wait_until_idle(warm_up)
+    assert cache.is_published('v1')
+
+
+def test_renders_without_file_locking(cache, monkeypatch):
+    # Neither flock nor msvcrt is available
+    monkeypatch.setattr(chart_warmup, 'fcntl', None)
+    monkeypatch.setattr(chart_warmup, 'msvcrt', None)
+    warm_up = ChartWarmUp(cache, workers=0)
+
+    warm_up.start('v1', lambda service: ({'chart.json': 'figure'}, {}, None, ()))
+    _wait_until_idle(warm_up)
+
+    assert cache.is_published('v1')
+    assert cache.get('chart.json', 'v1') == 'figure'
+
+
+def test_workers_do_not_build_the_app(cache, monkeypatch):
+    # Run as `python wsgi.py`: spawned workers import wsgi.py again as __mp_main__
+    main = types.ModuleType('__main__')
+    main.__file__ = str(Path(__file__).resolve().parent.parent / 'wsgi.py')
+    main.__spec__ = None
+    monkeypatch.setitem(sys.modules, '__main__', main)
+    warm_up = ChartWarmUp(cache, workers=1)
+
+    warm_up.start('v1', lambda service: ({}, {'apps': (_flask_apps,)}, None, ()))
+    _wait_until_idle(warm_up, timeout=120)
+
+    assert warm_up.status()['state'] == 'complete'
+    assert cache.get('apps', 'v1') == 0
@@ -0,0 +1,38 @@
+"""Memory and fidelity of the compact normalized frame."""
+import pandas as pd
+from main_app.utils.data_loader import CATEGORY_COLUMNS, DataService
+from tests.conftest import inspection_rows
+
+
+def _frames(tmp_path):
+    """Return the CSV read as plain object columns and through DataService.read_source."""
+    path = tmp_path / 'restaurant_data.csv'
+    rows = inspection_rows(restaurants=1000, rows_per=5)
+    rows.loc[::7, 'GRADE'] = ''
+    rows.to_csv(path, index=False)
+    service = DataService(data_path=path, load=False)
+    return pd.read_csv(path, dtype=str), service.read_source(path)
+
+
+def test_compact_frame_uses_less_memory(tmp_path):
+    objects, compact = _frames(tmp_path)
+    before = objects.memory_usage(deep=True).sum()
+    after = compact.memory_usage(deep=True).sum()
+    print(f"object frame {before / 2**20:.2f} MiB, compact frame {after / 2**20:.2f} MiB ({after / before:.0%})")
+    assert after < before * 0.6
+
+    for column in CATEGORY_COLUMNS:
+        assert isinstance(compact[column].dtype, pd.CategoricalDtype), column
+        assert compact[column].memory_usage(deep=True) < objects[column].memory_usage(deep=True), column
+
+
+def test_category_columns_round_trip(tmp_path):
+    objects, compact = _frames(tmp_path)
+    for column in CATEGORY_COLUMNS:
+        expected = objects[column].where(objects[column].str.strip() != '')
+        restored = compact[column].astype(object).where(compact[column].notna())
+        pd.testing.assert_series_equal(
+            restored.reset_index(drop=True), expected.astype(object).reset_index(drop=True),
+            check_names=False
+        )
+    assert compact['GRADE'].isna().sum() == objects['GRADE'].isna().sum()
@@ -0,0 +1,148 @@
+"""Upstream geocode dispatch against a local fake geocoder."""
+import multiprocessing
+import threading
+import time
+import pytest
+from main_app.config import FlaskConfig
+from main_app.utils.dispatcher import GeocodeDispatcher, GeocoderBusyError, SharedRateLimiter
+from main_app.utils.geocache import GeocodeCache
+from main_app.utils.geocoder import GeoService
+from tests.conftest import FakeGeocoder
+
+
+def _lookups(dispatcher, keys, timeout=5):
+    """Look up keys from one thread each, returning results and errors in key order."""
+    results, errors = [None] * len(keys), [None] * len(keys)
+
+    def run(i, key):
+        try:
+            results[i] = dispatcher.lookup(key, key, timeout=timeout)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, key)) for i, key in enumerate(keys)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def _reserve_slots(path, min_delay, count, out):
+    """Take count rate-limited slots in a separate process, reporting when each arrived."""
+    limiter = SharedRateLimiter(path, min_delay=min_delay)
+    for _ in range(count):
+        limiter.wait()
+        out.put(time.time())
+
+
+def test_duplicate_lookups_share_one_upstream_call(tmp_path):
+    fake = FakeGeocoder(delay=0.2)
+    dispatcher = GeocodeDispatcher(fake, SharedRateLimiter(tmp_path / 'limits.sqlite3', min_delay=0))
+    results, errors = _lookups(dispatcher, ['160 convent ave'] * 20 + ['1 wall st'] * 5)
+
+    assert errors == [None] * 25
+    assert sorted(address for address, _ in fake.calls) == ['1 wall st', '160 convent ave']
+    assert len(set(results[:20])) == 1 and len(set(results[20:])) == 1
+
+
+def test_rate_limit_holds_across_processes(tmp_path):
+    min_delay, processes, slots = 0.1, 3, 4
+    context = multiprocessing.get_context('spawn')
+    out = context.Queue()
+    workers = [
+        context.Process(target=_reserve_slots, args=(str(tmp_path / 'limits.sqlite3'), min_delay, slots, out))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    arrivals = sorted(out.get(timeout=30) for _ in range(processes * slots))
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    # Sleeps never wake before their slot but may wake late, which can shorten
+    # the gap to the next arrival; the k-th arrival still comes k slots after the first
+    for k, arrival in enumerate(arrivals):
+        assert arrival - arrivals[0] >= min_delay * (k - 0.5)
+    assert arrivals[-1] - arrivals[0] >= min_delay * (processes * slots - 1) * 0.95
+
+
+def test_throughput_is_capped_by_the_rate_limit(tmp_path):
+    fake = FakeGeocoder()
+    dispatcher = GeocodeDispatcher(fake, SharedRateLimiter(tmp_path / 'limits.sqlite3', min_delay=0.05))
+    started = time.time()
+    results, errors = _lookups(dispatcher, [f"{i} broadway" for i in range(10)])
+
+    assert errors == [None] * 10
+    assert len(fake.calls) == 10
+    times = sorted(at for _, at in fake.calls)
+    assert times[-1] - started >= 0.05 * 9 * 0.95
+
+
+def test_full_queue_raises_busy(tmp_path):
+    fake = FakeGeocoder()
+    fake.release.clear()
+    dispatcher = GeocodeDispatcher(fake, SharedRateLimiter(tmp_path / 'limits.sqlite3', min_delay=0), max_queue=1)
+
+    # The first lookup occupies the upstream thread, the second fills the queue
+    first = threading.Thread(target=dispatcher.lookup, args=('a', 'a', 5))
+    first.start()
+    while not fake.calls:
+        time.sleep(0.01)
+    second = threading.Thread(target=dispatcher.lookup, args=('b', 'b', 5))
+    second.start()
+    while dispatcher.pending() < 1:
+        time.sleep(0.01)
+
+    started = time.time()
+    with pytest.raises(GeocoderBusyError):
+        dispatcher.lookup('c', 'c', timeout=5)
+    assert time.time() - started < 1
+    # A duplicate of an in-flight address still joins it instead of failing
+    joined = threading.Thread(target=dispatcher.lookup, args=('b', 'b', 5))
+    joined.start()
+
+    fake.release.set()
+    for thread in (first, second, joined):
+        thread.join(timeout=5)
+    assert [address for address, _ in fake.calls] == ['a', 'b']
+
+
+def test_expected_wait_over_timeout_raises_busy(tmp_path):
+    fake = FakeGeocoder()
+    fake.release.clear()
+    dispatcher = GeocodeDispatcher(fake, SharedRateLimiter(tmp_path / 'limits.sqlite3', min_delay=1), max_queue=8)
+    threads = [threading.Thread(target=dispatcher.lookup, args=(key, key, 5)) for key in 'abc']
+    for thread in threads:
+        thread.start()
+    while dispatcher.pending() < 2:
+        time.sleep(0.01)
+
+    with pytest.raises(GeocoderBusyError):
+        dispatcher.lookup('d', 'd', timeout=1.5)
+    fake.release.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+
+def test_geo_service_caches_the_merged_lookup(tmp_path, monkeypatch):
+    monkeypatch.setattr(FlaskConfig, 'GEOCODE_MIN_DELAY', 0)
+    fake = FakeGeocoder(delay=0.1)
+    cache = GeocodeCache(tmp_path / 'cache.sqlite3')
+    service = GeoService(cache=cache, fetch=fake)
+
+    results = [None] * 10
+    def run(i):
+        results[i] = service.geocode_address('160 Convent Ave.')
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fake.calls) == 1
+    assert len(set(results)) == 1
+    assert cache.get('160 convent ave') == (True, results[0])
+    assert service.geocode_address('160 CONVENT AVE') == results[0]
+    assert len(fake.calls) == 1
@@ -0,0 +1,79 @@
+"""Accuracy of the vectorized distances against geopy's geodesic."""
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+from main_app.utils.distance import BOUNDARY_TOLERANCE, distances_within, haversine_miles
+from main_app.utils.spatial_index import RestaurantIndex
+
+ORIGIN = (40.7580, -73.9855)
+
+
+def _points_around(origin, n, spread, seed=0):
+    """Random points within roughly spread degrees of origin."""
+    rng = np.random.default_rng(seed)
+    return origin[0] + rng.uniform(-spread, spread, n), origin[1] + rng.uniform(-spread, spread, n)
+
+
+def _geodesic_miles(origin, lats, lons):
+    return np.array([geodesic(origin, (lat, lon)).miles for lat, lon in zip(lats, lons)])
+
+
+def test_haversine_within_boundary_tolerance_of_geodesic():
+    lats, lons = _points_around(ORIGIN, 500, 0.3)
+    expected = _geodesic_miles(ORIGIN, lats, lons)
+    distances = haversine_miles(*ORIGIN, lats, lons)
+    assert np.all(np.abs(distances - expected) <= expected * BOUNDARY_TOLERANCE)
+
+
+def test_haversine_accepts_one_origin_per_point():
+    lats, lons = _points_around(ORIGIN, 50, 0.1)
+    origin_lats, origin_lons = _points_around(ORIGIN, 50, 0.1, seed=1)
+    expected = [haversine_miles(a, b, [c], [d])[0] for a, b, c, d in zip(origin_lats, origin_lons, lats, lons)]
+    np.testing.assert_allclose(haversine_miles(origin_lats, origin_lons, lats, lons), expected)
+
+
+@pytest.mark.parametrize('radius', [0.25, 1, 5])
+def test_exact_cutoff_matches_geodesic(radius):
+    lats, lons = _points_around(ORIGIN, 2000, radius / 40)
+    distances, within = distances_within(*ORIGIN, lats, lons, radius)
+    expected = _geodesic_miles(ORIGIN, lats, lons)
+    np.testing.assert_array_equal(within, expected <= radius)
+    # Distances whose haversine estimate lands in the boundary band are the geodesic ones
+    band = np.abs(haversine_miles(*ORIGIN, lats, lons) - radius) <= radius * BOUNDARY_TOLERANCE
+    assert band.any()
+    np.testing.assert_allclose(distances[band], expected[band], rtol=1e-12)
+
+
+@pytest.mark.parametrize('radius', [0.5, 1, 2])
+def test_points_on_the_radius(radius):
+    bearings = np.arange(0, 360, 15)
+    ring = [geodesic(miles=radius).destination(ORIGIN, bearing) for bearing in bearings]
+    # On the circle, and a hair (about 2 inches) inside and outside it
+    points = [*ring]
+    for scale in (1 - 3e-5 / radius, 1 + 3e-5 / radius):
+        points += [geodesic(miles=radius * scale).destination(ORIGIN, bearing) for bearing in bearings]
+    lats = np.array([point.latitude for point in points])
+    lons = np.array([point.longitude for point in points])
+
+    distances, within = distances_within(*ORIGIN, lats, lons, radius)
+    expected = _geodesic_miles(ORIGIN, lats, lons)
+    np.testing.assert_allclose(distances, expected, rtol=1e-12)
+    np.testing.assert_array_equal(within, expected <= radius)
+    n = len(bearings)
+    assert within[n:2 * n].all() and not within[2 * n:].any()
+
+
+def test_inexact_distances_are_haversine():
+    lats, lons = _points_around(ORIGIN, 100, 0.05)
+    distances, within = distances_within(*ORIGIN, lats, lons, 1, exact=False)
+    np.testing.assert_array_equal(distances, haversine_miles(*ORIGIN, lats, lons))
+    np.testing.assert_array_equal(within, distances <= 1)
+
+
+def test_radius_query_matches_geodesic_scan():
+    lats, lons = _points_around(ORIGIN, 3000, 0.05, seed=2)
+    index = RestaurantIndex(np.arange(len(lats)).astype(str), lats, lons)
+    positions, distances = index.query_radius(*ORIGIN, 1)
+    expected = _geodesic_miles(ORIGIN, lats, lons)
+    np.testing.assert_array_equal(np.sort(positions), np.flatnonzero(expected <= 1))
+    np.testing.assert_allclose(distances, expected[positions], rtol=BOUNDARY_TOLERANCE)
@@ -0,0 +1,36 @@
+"""Validation of search filter parameters."""
+import numpy as np
+import pytest
+from main_app.utils.filters import parse_filters
+
+
+def test_valid_filters():
+    filters = parse_filters({
+        'cuisine': 'Pizza', 'grade': ['A', 'B'], 'critical': False,
+        'min_score': '5', 'max_score': 20, 'inspected_since': '2024-01-31',
+    })
+    assert filters == {
+        'cuisine': ['Pizza'], 'grade': ['A', 'B'], 'critical': False,
+        'min_score': 5.0, 'max_score': 20.0, 'inspected_since': np.datetime64('2024-01-31'),
+    }
+    assert parse_filters(None) == {}
+
+
+@pytest.mark.parametrize('params', [
+    {'inspected_since': ''},
+    {'inspected_since': 'NaT'},
+    {'inspected_since': 'yesterday-ish'},
+    {'inspected_since': ['2024-01-01']},
+    {'min_score': True},
+    {'max_score': False},
+    {'min_score': 'nan'},
+    {'max_score': 'inf'},
+    {'min_score': 'ten'},
+    {'critical': 'yes'},
+    {'grade': ['A', 1]},
+    {'stars': 5},
+    ['cuisine'],
+])
+def test_invalid_filters_raise(params):
+    with pytest.raises(ValueError):
+        parse_filters(params)
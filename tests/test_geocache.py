@@ -0,0 +1,60 @@
+"""Geocode cache lookups, TTLs and LRU eviction."""
+import sqlite3
+from main_app.utils.geocache import GeocodeCache
+
+
+def test_hits_misses_and_negative_entries(tmp_path):
+    cache = GeocodeCache(tmp_path / 'cache.sqlite3')
+    cache.set('160 Convent Ave', (40.82, -73.95))
+    cache.set('Nowhere', (None, None))
+    assert cache.get('160  convent ave.') == (True, (40.82, -73.95))
+    assert cache.get('nowhere') == (True, (None, None))
+    assert cache.get('unknown') == (False, (None, None))
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3}
+
+
+def test_evicts_least_recently_used_every_few_writes(tmp_path):
+    cache = GeocodeCache(tmp_path / 'cache.sqlite3', max_entries=3, evict_every=4, touch_interval=0)
+    for i in range(3):
+        cache.set(f'address {i}', (40.0 + i, -74.0))
+    # Reading the oldest entry keeps it; the next write is the fourth and evicts
+    cache.get('address 0')
+    cache.set('address 3', (43.0, -74.0))
+    assert cache.get('address 0')[0]
+    assert not cache.get('address 1')[0]
+    assert all(cache.get(f'address {i}')[0] for i in (2, 3))
+
+
+def test_writes_between_evictions_leave_rows(tmp_path):
+    cache = GeocodeCache(tmp_path / 'cache.sqlite3', max_entries=2, evict_every=10)
+    for i in range(5):
+        cache.set(f'address {i}', (40.0, -74.0))
+    (count,) = cache._conn().execute('SELECT COUNT(*) FROM geocodes').fetchone()
+    assert count == 5
+    cache.evict()
+    (count,) = cache._conn().execute('SELECT COUNT(*) FROM geocodes').fetchone()
+    assert count == 2
+
+
+def test_expired_entries_are_misses_and_evicted(tmp_path):
+    cache = GeocodeCache(tmp_path / 'cache.sqlite3', hit_ttl=-1)
+    cache.set('expired', (40.0, -74.0))
+    assert cache.get('expired') == (False, (None, None))
+    cache.evict()
+    assert cache._conn().execute('SELECT COUNT(*) FROM geocodes').fetchone() == (0,)
+
+
+def test_upgrades_caches_without_accessed_at(tmp_path):
+    path = tmp_path / 'cache.sqlite3'
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'CREATE TABLE geocodes (key TEXT PRIMARY KEY, lat REAL, lon REAL, expires_at REAL, created_at REAL)'
+    )
+    conn.execute("INSERT INTO geocodes VALUES ('old', 40.0, -74.0, 9e99, 1.0)")
+    conn.commit()
+    conn.close()
+
+    cache = GeocodeCache(path)
+    assert cache.get('old') == (True, (40.0, -74.0))
+    cache.set('new', (41.0, -74.0))
+    assert cache.get('new') == (True, (41.0, -74.0))
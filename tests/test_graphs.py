@@ -0,0 +1,80 @@
+"""Serving the published chart sets of older dataset versions."""
+import pytest
+from main_app import create_app
+from main_app.plots import analytics
+from main_app.routes import GRAPH_CHARTS, GRAPH_VALUES
+from main_app.utils.artifacts import build_artifacts
+from main_app.utils.chart_cache import ChartCache
+from main_app.utils.data_loader import DataService
+
+FIRST, SECOND = list(GRAPH_CHARTS)[:2]
+
+
+@pytest.fixture
+def app(data_dir, monkeypatch):
+    build_artifacts(DataService(load=False))
+    app = create_app()
+    # Sets are published by the tests, not rendered in the background
+    monkeypatch.setattr(app.extensions['chart_warm_up'], 'start', lambda version, prepare: None)
+    return app
+
+
+def _values():
+    return {name: render() for name, render in GRAPH_VALUES.items()}
+
+
+def test_chart_json_serves_only_what_the_version_published(app):
+    chart_cache = app.extensions['chart_cache']
+    old = chart_cache.versioned('old')
+    chart_cache.publish(old, {**_values(), f"{FIRST}.json": b'{"old": true}'})
+    client = app.test_client()
+
+    response = client.get(f'/graphs/{FIRST}.json?v={old}')
+    assert response.status_code == 200
+    assert response.data == b'{"old": true}'
+
+    # A chart the old set lacks is not rendered from the current data under its version
+    response = client.get(f'/graphs/{SECOND}.json?v={old}')
+    assert response.status_code == 302
+    assert response.headers['Location'] == f'/graphs/{SECOND}.json'
+    assert chart_cache.get(f"{SECOND}.json", old) is None
+
+    response = client.get(f'/graphs/{FIRST}.json?v={chart_cache.versioned("removed")}')
+    assert response.status_code == 302
+    assert response.headers['Location'] == f'/graphs/{FIRST}.json'
+
+
+def test_stale_html_page_is_not_completed_from_current_data(app):
+    app.config['GRAPHS_MODE'] = 'html'
+    chart_cache = app.extensions['chart_cache']
+    old = chart_cache.versioned('old')
+    # Published while the page was served as JSON placeholders, so without chart HTML
+    chart_cache.publish(old, _values())
+    client = app.test_client()
+
+    page = client.get('/graphs').get_data(as_text=True)
+    current = chart_cache.versioned(analytics.data_version()[0])
+    assert f'data-chart="{FIRST}" data-version="{current}"' in page
+    assert all(chart_cache.get(f"{name}.html", old) is None for name in GRAPH_CHARTS)
+
+    # A complete older set is served as it was published
+    newer = chart_cache.versioned('newer')
+    chart_cache.publish(newer, {**_values(), **{f"{name}.html": f"<div>old {name}</div>" for name in GRAPH_CHARTS}})
+    page = client.get('/graphs').get_data(as_text=True)
+    assert f"<div>old {FIRST}</div>" in page
+    assert 'plotly-chart' not in page
+
+
+def test_publish_keeps_the_previous_set(tmp_path):
+    chart_cache = ChartCache(tmp_path / 'chart_cache')
+    for version in ('v1', 'v2'):
+        chart_cache.publish(version, {'chart.json': version})
+    staging = chart_cache.cache_dir / '.v4.abc.tmp'
+    staging.mkdir()
+
+    assert chart_cache.is_published('v1') and chart_cache.is_published('v2')
+    chart_cache.publish('v3', {'chart.json': 'v3'})
+    assert not chart_cache.is_published('v1')
+    assert chart_cache.is_published('v2') and chart_cache.is_published('v3')
+    # Another process's set being written is left alone
+    assert staging.is_dir()
@@ -0,0 +1,118 @@
+"""Ingesting paged Socrata records as a delta merged into the artifacts."""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from main_app.config import FlaskConfig
+from main_app.utils.artifacts import build_artifacts, inputs_hash, read_artifacts, snapshot_path
+from main_app.utils.data_loader import DataService
+from main_app.utils.ingest import FIELD_COLUMNS, SocrataSource, ingest
+from tests.conftest import inspection_rows
+
+PAGE_SIZE = 16
+DATE_COLUMNS = ('INSPECTION DATE', 'GRADE DATE', 'RECORD DATE')
+
+
+class FakeClient:
+    """sodapy stand-in serving fixed records a page at a time and recording each call."""
+
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def get(self, dataset_identifier, **params):
+        self.calls.append((dataset_identifier, params))
+        return self.records[params['offset']:params['offset'] + params['limit']]
+
+
+def _frame(table):
+    """Return an Arrow table as a frame with categories as plain values."""
+    df = table.to_pandas()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    return df
+
+
+def _records(rows):
+    """Return rows as API records: Socrata field names, ISO dates and no key for empty values."""
+    records = []
+    for row in rows.to_dict('records'):
+        record = {}
+        for field, column in FIELD_COLUMNS.items():
+            value = str(row[column])
+            if column in DATE_COLUMNS and value:
+                value = pd.Timestamp(value).strftime('%Y-%m-%dT00:00:00.000')
+            if value:
+                record[field] = value
+        records.append(record)
+    return records
+
+
+def _delta_rows():
+    """Return re-inspections of existing restaurants, some fields left empty, and a new restaurant."""
+    rows = inspection_rows()
+    delta = rows[rows['CAMIS'].isin(rows['CAMIS'].unique()[:5])].copy()
+    delta['INSPECTION DATE'] = '05/01/2026'
+    delta['SCORE'] = 7
+    delta[['GRADE', 'GRADE DATE']] = ''
+    added = inspection_rows(restaurants=1, camis_start=50000000)
+    added['VIOLATION DESCRIPTION'] = 'A violation not seen before'
+    return pd.concat([delta, added], ignore_index=True)
+
+
+def test_ingest_pages_records_into_a_delta(data_dir):
+    manifest, _ = build_artifacts(DataService(load=False))
+    stored = read_artifacts(snapshot_path(FlaskConfig.ARTIFACT_DIR, manifest))
+    latest = stored['restaurants'].column('INSPECTION DATE').to_pandas().max()
+    rows = _delta_rows()
+    client = FakeClient(_records(rows))
+    assert PAGE_SIZE < len(rows) < 2 * PAGE_SIZE
+
+    manifest, count = ingest(DataService(load=False), SocrataSource(client, 'abcd-1234', page_size=PAGE_SIZE),
+                             lookback_days=7)
+
+    # Paged by offset until a short page, from the newest stored inspection less the lookback
+    assert count == len(rows)
+    assert [params['offset'] for _, params in client.calls] == [0, PAGE_SIZE]
+    since = latest - pd.Timedelta(days=7)
+    for dataset, params in client.calls:
+        assert dataset == 'abcd-1234'
+        assert params['limit'] == PAGE_SIZE
+        assert params['where'] == f"inspection_date >= '{since:%Y-%m-%dT00:00:00}'"
+
+    # Saved in the source CSV layout next to the base dataset
+    deltas = list(FlaskConfig.DELTA_DIR.glob('restaurant_data.delta-*.csv'))
+    assert len(deltas) == 1
+    written = pd.read_csv(deltas[0], dtype=str, keep_default_na=False)
+    expected = rows[list(FIELD_COLUMNS.values())].astype(str)
+    pd.testing.assert_frame_equal(written, expected)
+
+    # Merged artifacts match a full build over the base dataset and the delta
+    service = DataService(load=False)
+    assert manifest['inputs_hash'] == inputs_hash(service.artifact_inputs())
+    merged = read_artifacts(snapshot_path(FlaskConfig.ARTIFACT_DIR, manifest))
+    rebuilt = service.build_tables()
+    assert merged.keys() == rebuilt.keys()
+    for name, expected in rebuilt.items():
+        actual = merged[name]
+        if isinstance(expected, pa.Table):
+            pd.testing.assert_frame_equal(_frame(actual), _frame(expected), obj=name)
+        elif isinstance(expected, np.ndarray):
+            np.testing.assert_array_equal(actual, expected, err_msg=name)
+        else:
+            assert actual == expected, name
+
+    restaurants = _frame(merged['restaurants'])
+    assert '50000000' in set(restaurants['CAMIS'].astype(str))
+
+
+def test_ingest_without_new_records(data_dir):
+    build_artifacts(DataService(load=False))
+    client = FakeClient([])
+
+    manifest, count = ingest(DataService(load=False), SocrataSource(client, 'abcd-1234', page_size=PAGE_SIZE),
+                             since=pd.Timestamp('2026-05-01'))
+
+    assert (manifest, count) == (None, 0)
+    assert client.calls[0][1]['where'] == "inspection_date >= '2026-05-01T00:00:00'"
+    assert not FlaskConfig.DELTA_DIR.exists() or not any(FlaskConfig.DELTA_DIR.iterdir())
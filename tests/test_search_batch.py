@@ -0,0 +1,77 @@
+"""Streaming batch search over coordinates and geocoded addresses."""
+import json
+import pytest
+from main_app import create_app
+from main_app.config import FlaskConfig
+from main_app.utils.artifacts import build_artifacts
+from main_app.utils.data_loader import DataService
+from main_app.utils.geocoder import GeoService
+from tests.conftest import FakeGeocoder
+
+POINT = {'lat': 40.73, 'lon': -73.95}
+# Resolved by the local geocoder from the zipcode, and not resolvable without upstream
+LOCAL_ADDRESS = '120 Broadway, 10005'
+UPSTREAM_ADDRESS = '1 Nowhere Lane'
+UPSTREAM_COORDS = (40.72, -73.98)
+
+
+@pytest.fixture
+def fake(data_dir, monkeypatch):
+    fake = FakeGeocoder(coords=UPSTREAM_COORDS)
+    monkeypatch.setattr(FlaskConfig, 'GEOCODE_MIN_DELAY', 0)
+    monkeypatch.setattr(GeoService, '_nominatim', lambda self, address: fake(address))
+    return fake
+
+
+@pytest.fixture
+def app(fake):
+    build_artifacts(DataService(load=False))
+    return create_app()
+
+
+def _expected(app, lat, lon, radius=1):
+    """Return the CAMIS within radius miles of a point, closest first."""
+    service = app.extensions['snapshots'].current
+    positions, distances = service.query_nearby(lat, lon, radius)
+    return [str(camis) for _, camis in sorted(zip(distances.tolist(), service.history.camis[positions].tolist()))]
+
+
+def test_lines_stream_before_upstream_geocoding(app, fake):
+    fake.release.clear()
+    response = app.test_client().post('/search/batch', json={'items': [
+        UPSTREAM_ADDRESS, POINT, LOCAL_ADDRESS, {'lat': 'north', 'lon': 0}, POINT,
+    ]}, buffered=False)
+    lines = (json.loads(line) for line in response.response)
+
+    # Invalid items, coordinates and locally resolved addresses arrive while upstream is held
+    first = [next(lines) for _ in range(4)]
+    assert [line['index'] for line in first] == [3, 1, 4, 2]
+    assert first[0]['retry'] is False
+    assert fake.calls == []
+
+    fake.release.set()
+    last = next(lines)
+    assert last['index'] == 0
+    assert [address for address, _ in fake.calls] == [UPSTREAM_ADDRESS]
+    assert list(lines) == []
+
+    for line in (first[1], last):
+        location = line['search_location']
+        camis = [restaurant['CAMIS'] for restaurant in line['restaurants']]
+        assert camis and camis == _expected(app, location['lat'], location['lon'])
+        assert sorted(line['inspection_history']) == sorted(camis)
+        distances = [restaurant['distance'] for restaurant in line['restaurants']]
+        assert distances == sorted(distances) and distances[-1] <= 1
+    assert first[1]['restaurants'] == first[2]['restaurants']
+    assert last['search_location'] == {'lat': UPSTREAM_COORDS[0], 'lon': UPSTREAM_COORDS[1], 'label': UPSTREAM_ADDRESS}
+
+
+def test_addresses_past_the_budget_are_retryable(app, fake, monkeypatch):
+    monkeypatch.setattr(FlaskConfig, 'BATCH_SEARCH_GEOCODE_BUDGET', 0)
+    response = app.test_client().post('/search/batch', json={'items': [UPSTREAM_ADDRESS, LOCAL_ADDRESS]})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert [line['index'] for line in lines] == [1, 0]
+    assert 'restaurants' in lines[0]
+    assert lines[1]['retry'] is True
+    assert fake.calls == []
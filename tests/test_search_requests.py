@@ -0,0 +1,47 @@
+"""Malformed search requests are rejected before anything is searched."""
+import json
+import pytest
+from main_app import create_app
+from main_app.utils.artifacts import build_artifacts
+from main_app.utils.data_loader import DataService
+
+ADDRESS = '120 Broadway, 10005'
+
+
+@pytest.fixture
+def client(data_dir):
+    build_artifacts(DataService(load=False))
+    return create_app().test_client()
+
+
+@pytest.mark.parametrize('body', [[], ['120 Broadway'], 'x', 5, None])
+def test_non_object_body_is_rejected(client, body):
+    response = client.post('/', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Request body must be a JSON object'}
+
+
+@pytest.mark.parametrize('fields', [
+    {'nearest': [5]},
+    {'nearest': {'n': 5}},
+    {'nearest': True},
+    {'nearest': 'five'},
+    {'nearest': 0},
+    {'page_size': [10]},
+    {'page_size': {}},
+    {'page_size': 0},
+    {'page_size': 10 ** 6},
+    {'radius': [1]},
+    {'radius': False},
+    {'radius': 'far'},
+])
+def test_invalid_fields_are_rejected(client, fields):
+    response = client.post('/', json={'address': ADDRESS, **fields})
+    assert response.status_code == 400
+    assert next(iter(fields)) in response.get_json()['error']
+
+
+def test_valid_request(client):
+    response = client.post('/', json={'address': ADDRESS, 'nearest': '3', 'page_size': 2})
+    assert response.status_code == 200
+    assert len(response.get_json()['restaurants']) == 2
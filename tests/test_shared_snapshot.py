@@ -0,0 +1,97 @@
+"""Workers mapping one artifact snapshot share its pages instead of copying them."""
+import multiprocessing
+import numpy as np
+import pyarrow as pa
+from main_app.config import FlaskConfig
+from main_app.utils.artifacts import build_artifacts, snapshot_path
+from main_app.utils.data_loader import DataService
+from tests.conftest import inspection_rows
+
+WORKERS = 3
+
+
+def _mapping_totals(prefix):
+    """Sum the smaps counters (in bytes) of this process's mappings of files under prefix."""
+    totals, current = {}, False
+    with open('/proc/self/smaps') as smaps:
+        for line in smaps:
+            fields = line.split()
+            if '-' in fields[0] and not fields[0].endswith(':'):
+                current = len(fields) >= 6 and fields[5].startswith(prefix)
+            elif current and len(fields) == 3 and fields[2] == 'kB':
+                totals[fields[0].rstrip(':')] = totals.get(fields[0].rstrip(':'), 0) + int(fields[1]) * 1024
+    return totals
+
+
+def _anonymous_bytes():
+    """Return this process's resident anonymous memory in bytes."""
+    with open('/proc/self/status') as status:
+        line = next(line for line in status if line.startswith('RssAnon:'))
+    return int(line.split()[1]) * 1024
+
+
+def _touch(value):
+    """Read every byte of a mapped table or array so its pages become resident."""
+    if isinstance(value, pa.Table):
+        for column in value.columns:
+            for chunk in column.chunks:
+                for buffer in chunk.buffers():
+                    if buffer is not None:
+                        np.frombuffer(buffer, dtype=np.uint8).sum()
+    elif isinstance(value, np.ndarray):
+        np.asarray(value).view(np.uint8).sum()
+
+
+def _load_snapshot(directory, snapshot, store, ready, done, out):
+    """Load the snapshot as a worker would, read all of it and report its memory while the others hold theirs."""
+    FlaskConfig.DATA_DIR = directory
+    FlaskConfig.ARTIFACT_DIR = directory / 'artifacts'
+    FlaskConfig.DELTA_DIR = directory / 'deltas'
+    anonymous = _anonymous_bytes()
+    service = DataService(store=store)
+    for value in service._tables.values():
+        _touch(value)
+    ready.wait(timeout=120)
+    out.put({**_mapping_totals(str(snapshot)), 'anonymous': _anonymous_bytes() - anonymous})
+    done.wait(timeout=120)
+
+
+def _run_workers(directory, snapshot, store, count):
+    """Run count workers over the snapshot at once and return their reports."""
+    context = multiprocessing.get_context('spawn')
+    ready, done, out = context.Barrier(count), context.Barrier(count + 1), context.Queue()
+    workers = [
+        context.Process(target=_load_snapshot, args=(directory, snapshot, store, ready, done, out))
+        for _ in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    reports = [out.get(timeout=300) for _ in workers]
+    done.wait(timeout=60)
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+    return reports
+
+
+def test_workers_share_mapped_snapshot_pages(data_dir):
+    inspection_rows(restaurants=20000, rows_per=5).to_csv(data_dir / 'restaurant_data.csv', index=False)
+    manifest, _ = build_artifacts(DataService(load=False))
+    snapshot = snapshot_path(FlaskConfig.ARTIFACT_DIR, manifest)
+    mapped = sum(path.stat().st_size for path in snapshot.iterdir() if path.suffix in ('.arrow', '.npy'))
+
+    copied = _run_workers(data_dir, snapshot, 'memory', 1)[0]
+    reports = _run_workers(data_dir, snapshot, 'mmap', WORKERS)
+
+    print(f"snapshot {mapped / 2**20:.1f} MiB, in-memory worker anonymous growth {copied['anonymous'] / 2**20:.1f} MiB")
+    for report in reports:
+        print(f"mmap worker: Rss {report['Rss'] / 2**20:.1f} MiB, Pss {report['Pss'] / 2**20:.1f} MiB, "
+              f"anonymous growth {report['anonymous'] / 2**20:.1f} MiB")
+        # Every worker has the whole snapshot resident through pages shared with the others
+        assert report['Rss'] >= mapped * 0.9
+        assert report['Shared_Clean'] + report['Shared_Dirty'] >= report['Rss'] * 0.95
+        assert report['Private_Clean'] + report['Private_Dirty'] <= report['Rss'] * 0.05
+        # so each is charged about its share of it
+        assert report['Pss'] <= report['Rss'] / WORKERS * 1.2
+        # and none holds a private copy the way an in-memory worker does
+        assert report['anonymous'] <= copied['anonymous'] - mapped * 0.5
@@ -0,0 +1,81 @@
+"""Publishing a new dataset snapshot while requests are reading the old one."""
+import threading
+import time
+from main_app import create_app
+from main_app.utils.artifacts import build_artifacts
+from main_app.utils.data_loader import DataService
+from tests.conftest import inspection_rows
+
+# Resolved by the local geocoder (street or zipcode centroid), so no upstream calls
+ADDRESSES = ['120 Broadway, 10005', '20 Main Street, 10003', '300 Amsterdam Avenue, 10010']
+THREADS = 4
+NEW_CAMIS_START = 41000000
+
+
+def _search_loop(app, stop, errors, seen):
+    """Search until stop is set, recording failed responses and the CAMIS returned."""
+    client = app.test_client()
+    i = 0
+    while not stop.is_set():
+        response = client.post('/', json={'address': ADDRESSES[i % len(ADDRESSES)], 'radius': 1})
+        body = response.get_json()
+        if response.status_code != 200 or not body.get('restaurants'):
+            errors.append((response.status_code, body))
+        else:
+            seen.update(int(restaurant['CAMIS']) for restaurant in body['restaurants'])
+        i += 1
+
+
+def _wait_for(condition, timeout=60):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_publish_during_searches(data_dir):
+    build_artifacts(DataService(load=False))
+    app = create_app()
+    snapshots = app.extensions['snapshots']
+
+    # A long request holding the first snapshot across the swap
+    pinned = snapshots.acquire()
+    old = pinned.service
+    closes = []
+    close = old.close
+
+    def record_close():
+        closes.append(pinned.readers)
+        close()
+    old.close = record_close
+
+    stop, errors, seen = threading.Event(), [], set()
+    threads = [threading.Thread(target=_search_loop, args=(app, stop, errors, seen)) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    try:
+        _wait_for(lambda: len(seen) > 0)
+
+        inspection_rows(restaurants=250, seed=1, camis_start=NEW_CAMIS_START).to_csv(
+            data_dir / 'restaurant_data.csv', index=False
+        )
+        build_artifacts(DataService(load=False))
+        assert snapshots.reload()
+        assert snapshots.current is not old and snapshots.current.version != old.version
+
+        # Searches move to the new snapshot while the pinned one stays open
+        _wait_for(lambda: any(camis >= NEW_CAMIS_START for camis in seen))
+        assert closes == []
+        assert old.history is not None
+
+        snapshots.release(pinned)
+        _wait_for(lambda: closes)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=60)
+
+    assert errors == []
+    # Closed once, by whichever reader was last, after every reader released it
+    assert closes == [0]
+    assert old.history is None
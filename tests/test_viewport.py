@@ -0,0 +1,30 @@
+"""Viewport route input validation."""
+import pytest
+from main_app import create_app
+
+BBOX = {'south': 40.70, 'west': -74.00, 'north': 40.76, 'east': -73.90}
+
+
+@pytest.fixture
+def client(data_dir):
+    return create_app().test_client()
+
+
+@pytest.mark.parametrize('zoom', ['12', '0', '24', '15.5'])
+def test_valid_zoom(client, zoom):
+    response = client.get('/viewport', query_string={**BBOX, 'zoom': zoom})
+    assert response.status_code == 200
+    assert response.get_json()['type'] == 'FeatureCollection'
+
+
+@pytest.mark.parametrize('zoom', ['nan', 'inf', '-inf', '-1', '25', '1e308', 'x', ''])
+def test_invalid_zoom_is_rejected(client, zoom):
+    response = client.get('/viewport', query_string={**BBOX, 'zoom': zoom})
+    assert response.status_code == 400
+    assert 'Invalid viewport' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('field, value', [('south', 'nan'), ('north', 'inf'), ('west', '-inf'), ('east', '-75')])
+def test_invalid_bbox_is_rejected(client, field, value):
+    response = client.get('/viewport', query_string={**BBOX, field: value, 'zoom': 12})
+    assert response.status_code == 400
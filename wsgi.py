@@ -1,6 +1,9 @@
 from main_app import create_app
 
-app = create_app()
+# Chart warm-up processes are spawned and import the main module again as
+# __mp_main__; only the serving process builds the app.
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)